@@ -0,0 +1,209 @@
+"""
+Admission Control
+=================
+
+This module sheds load in front of the diagnosis pipeline so overload degrades
+into fast rejections instead of every request timing out together:
+1. At most max_in_flight diagnosis requests run at once
+2. Up to max_queued more wait in FIFO order, each for at most queue_timeout
+3. Anything beyond that is rejected immediately with a Retry-After estimate
+   derived from the observed service time
+
+Time spent queued is reported per request and as a histogram.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Union
+
+from metrics import ADMISSION_QUEUE_WAIT, ADMISSION_REJECTED
+
+logger = logging.getLogger(__name__)
+
+# Assumed diagnosis duration until one has been observed
+INITIAL_SERVICE_SECONDS = 2.0
+
+# Weight of each finished request in the running service time
+SERVICE_TIME_SMOOTHING = 0.1
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is shed instead of queued.
+
+    Attributes:
+        retry_after (int): Suggested seconds before retrying
+        reason (str): "queue_full" or "queue_timeout"
+    """
+
+    def __init__(self, message: str, retry_after: int, reason: str):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class Admission:
+    """
+    An admitted request's slot.
+
+    Attributes:
+        queue_wait (float): Seconds the request waited before admission
+        admitted_at (float): Monotonic admission time
+    """
+
+    def __init__(self, queue_wait: float):
+        self.queue_wait = queue_wait
+        self.admitted_at = time.monotonic()
+        self.released = False
+
+
+class AdmissionController:
+    """
+    Bounded in-flight limit with a bounded FIFO wait queue.
+
+    Must be used from a single event loop.
+
+    Example:
+        >>> admission = AdmissionController(max_in_flight=32, max_queued=64, queue_timeout=5.0)
+        >>> slot = await admission.acquire()   # may raise AdmissionRejected
+        >>> try:
+        ...     result = await run_safe_diagnose(registry, contents)
+        ... finally:
+        ...     admission.release(slot)
+    """
+
+    def __init__(self, max_in_flight: int = 32, max_queued: int = 64, queue_timeout: Optional[float] = 5.0):
+        """
+        Initialize an idle controller.
+
+        Args:
+            max_in_flight (int): Requests admitted concurrently
+            max_queued (int): Requests waiting for a slot before new ones are rejected
+            queue_timeout (Optional[float]): Longest wait in seconds for a slot (None waits indefinitely)
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_queue_wait = 0.0
+        self.service_seconds = INITIAL_SERVICE_SECONDS
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> Admission:
+        """
+        Wait for a slot, or fail fast when the queue is full.
+
+        Returns:
+            Admission: The request's slot, to be passed to release
+
+        Raises:
+            AdmissionRejected: If the queue is full or no slot freed up within queue_timeout
+        """
+        start = time.monotonic()
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return self._admit(start)
+
+        if len(self._waiters) >= self.max_queued:
+            self.rejected += 1
+            ADMISSION_REJECTED.labels(reason="queue_full").inc()
+            raise AdmissionRejected(
+                f"Server busy: {self.in_flight} diagnoses running and {len(self._waiters)} queued",
+                self.retry_after(), "queue_full"
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # release() hands its slot straight to the first waiter
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self.timed_out += 1
+            ADMISSION_REJECTED.labels(reason="queue_timeout").inc()
+            raise AdmissionRejected(
+                f"Server busy: no diagnosis slot freed up within {self.queue_timeout:g}s",
+                self.retry_after(), "queue_timeout"
+            )
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot just as the client went away
+                self._hand_off()
+            else:
+                self._discard(waiter)
+            raise
+        return self._admit(start)
+
+    def release(self, admission: Optional[Admission]) -> None:
+        """
+        Free a slot, handing it to the longest-waiting request if any.
+
+        Args:
+            admission (Admission): Slot returned by acquire (releasing twice is a no-op)
+        """
+        if admission is None or admission.released:
+            return
+        admission.released = True
+        elapsed = time.monotonic() - admission.admitted_at
+        self.service_seconds += SERVICE_TIME_SMOOTHING * (elapsed - self.service_seconds)
+        self._hand_off()
+
+    def _hand_off(self) -> None:
+        """Pass a freed slot to the first live waiter, or return it to the pool."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def retry_after(self) -> int:
+        """
+        Estimate when a rejected request could be admitted.
+
+        Returns:
+            int: Seconds for the Retry-After header (at least 1)
+        """
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(self.service_seconds * backlog / max(1, self.max_in_flight)))
+
+    def _admit(self, start: float) -> Admission:
+        """Record an admission and its queue wait."""
+        queue_wait = time.monotonic() - start
+        self.admitted += 1
+        self.total_queue_wait += queue_wait
+        ADMISSION_QUEUE_WAIT.observe(queue_wait)
+        return Admission(queue_wait)
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        """Remove a waiter that gave up from the queue."""
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def get_stats(self) -> Dict[str, Union[int, float]]:
+        """
+        Get admission statistics.
+
+        Returns:
+            Dict[str, Union[int, float]]: Limits, current load, counters, average
+                                          queue wait and observed service time
+        """
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queued": self.max_queued,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_queue_wait_ms": round(self.total_queue_wait / self.admitted * 1000, 1) if self.admitted else 0.0,
+            "service_time_ms": round(self.service_seconds * 1000, 1)
+        }
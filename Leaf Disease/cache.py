@@ -0,0 +1,128 @@
+"""
+Diagnosis Result Cache
+======================
+
+This module provides an in-process, content-addressed cache for diagnosis
+results. Re-uploads of the same photo (retries, double-clicks, Streamlit
+reruns) are answered from memory instead of re-billing Roboflow and Groq.
+"""
+
+import copy
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DiagnosisCache:
+    """
+    Thread-safe LRU cache with a per-entry time-to-live.
+
+    Keys are built from the SHA-256 of the uploaded image bytes plus the
+    model identifiers and prompt version, so changing any model or the
+    analysis prompt naturally invalidates old entries.
+
+    Example:
+        >>> cache = DiagnosisCache(max_entries=256, ttl_seconds=3600)
+        >>> key = cache.make_key(image_bytes, "diagnose", "identify-plant-zvd1y/1")
+        >>> result = cache.get(key)
+        >>> if result is None:
+        ...     result = safe_diagnose(base64_image)
+        ...     cache.set(key, result)
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600.0):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_entries (int): Maximum number of cached results (0 disables caching)
+            ttl_seconds (float): Seconds a cached result stays valid
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(image_bytes: bytes, *parts: str) -> str:
+        """
+        Build a content-addressed cache key.
+
+        Args:
+            image_bytes (bytes): Raw uploaded image bytes
+            *parts (str): Result namespace and model/prompt identifiers
+
+        Returns:
+            str: Cache key
+        """
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        return "|".join((digest,) + tuple(str(part) for part in parts))
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result.
+
+        Args:
+            key (str): Cache key from make_key
+
+        Returns:
+            Optional[Dict[str, Any]]: A copy of the cached result, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """
+        Store a result, evicting the least recently used entry when full.
+
+        Args:
+            key (str): Cache key from make_key
+            value (Dict[str, Any]): Diagnosis result to cache
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached results (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+        logger.info("Diagnosis cache cleared")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dict[str, Any]: Hit/miss counters, hit ratio and current size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds
+            }
@@ -8,6 +8,7 @@ default values.
 
 Classes:
     AppConfig: Main configuration dataclass containing all application settings
+    PipelineConfig: Runtime settings for the diagnosis pipeline and API server
 
 Usage:
     >>> config = AppConfig.from_env()
@@ -16,7 +17,7 @@ Usage:
 
 import os
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Tuple
 
 
 @dataclass
@@ -113,3 +114,259 @@ class AppConfig:
             log_level=os.getenv("LOG_LEVEL", cls.log_level),
             log_file=os.getenv("LOG_FILE", cls.log_file)
         )
+
+
+@dataclass
+class PipelineConfig:
+    """
+    Runtime settings for the diagnosis pipeline and API server.
+
+    Unlike AppConfig, every field has a default so the pipeline can start
+    without any environment configuration; upstream API keys are still read
+    by the individual clients.
+
+    Attributes:
+        stage_workers (int): Threads for concurrent upstream stage calls
+        blocking_workers (int): Threads for blocking work offloaded from async endpoints
+        async_clients (bool): Use native async Groq/Roboflow clients in the API
+        batch_concurrency (int): Images diagnosed concurrently per batch request
+        batch_max_files (int): Maximum number of images accepted per batch request
+        max_upload_bytes (int): Largest accepted image upload in bytes
+        job_workers (int): Background diagnosis jobs run concurrently
+        job_queue_size (int): Jobs waiting to run before POST /jobs is refused
+        job_ttl_seconds (float): Seconds a finished job stays available for polling
+        admission_max_in_flight (int): Diagnosis requests served concurrently (0 disables admission control)
+        admission_max_queued (int): Diagnosis requests waiting for a slot before new ones get 503
+        admission_queue_timeout_seconds (float): Longest wait for a slot before a queued request gets 503
+        compress_responses (bool): Compress complete responses for clients that accept brotli or gzip
+        compression_min_bytes (int): Smallest response body worth compressing
+        gzip_level (int): gzip compression level (1-9)
+        brotli_quality (int): brotli quality (0-11)
+        trace_file (Optional[str]): JSON Lines file receiving per-stage diagnosis spans
+        deadline_seconds (float): End-to-end time allowed per diagnosis (0 disables it)
+        roboflow_timeout_seconds (float): Budget for the Roboflow classification call
+        groq_timeout_seconds (float): Budget for the Groq disease detection call
+        circuit_failure_threshold (int): Consecutive upstream failures that open its circuit
+        circuit_reset_seconds (float): Seconds an open circuit fails fast before probing
+        hedge_requests (bool): Duplicate async upstream requests slower than the observed p95
+        upstream_max_retries (int): Retries of a 429/5xx/connection error per upstream call
+        retry_base_delay_seconds (float): Backoff ceiling for the first retry, doubled per retry
+        retry_max_delay_seconds (float): Longest backoff or honored Retry-After wait
+        groq_requests_per_minute (int): Groq calls admitted per minute (0 for unlimited)
+        groq_tokens_per_minute (int): Groq prompt plus completion tokens per minute (0 for unlimited)
+        cache_max_entries (int): Diagnosis results kept in the in-process cache (0 disables it)
+        cache_ttl_seconds (float): Seconds a cached diagnosis result stays valid
+        kb_resolution_cache_size (int): Plant names whose knowledge base match is remembered (0 disables it)
+        classifier_classes (Tuple[str, ...]): Classifier labels resolved against the knowledge base at startup
+        kb_advice_cache_size (int): (plant, disease) advice entries memoized by the knowledge base (0 disables it)
+        kb_snapshot (bool): Load the knowledge base from its compiled binary snapshot when it is current
+        preprocess_images (bool): Normalize and downsize uploads before sending them upstream
+        classification_max_side (int): Longest image side sent to Roboflow
+        detection_max_side (int): Longest image side sent to Groq
+        jpeg_quality (int): JPEG quality of preprocessed images
+
+    Example:
+        >>> config = PipelineConfig.from_env()
+        >>> registry = ComponentRegistry(config=config)
+    """
+
+    # Concurrency Configuration
+    stage_workers: int = 16  # Upstream calls in flight on the sync path
+    blocking_workers: int = 8  # Executor size for blocking endpoint work
+    async_clients: bool = True  # Native async upstream clients in async endpoints
+
+    # Batch Configuration
+    batch_concurrency: int = 4  # Upstream diagnoses in flight per batch request
+    batch_max_files: int = 500  # Images accepted per batch request
+
+    # Upload Configuration
+    max_upload_bytes: int = 10 * 1024 * 1024  # Per-image cap, enforced while streaming
+
+    # Job Queue Configuration
+    job_workers: int = 4  # Worker tasks draining the job queue
+    job_queue_size: int = 100  # Waiting jobs before submissions get 503
+    job_ttl_seconds: float = 3600.0  # Lifetime of a finished job's result
+
+    # Admission Control Configuration
+    admission_max_in_flight: int = 16  # Diagnosis requests served at once
+    admission_max_queued: int = 32  # Waiting requests before shedding with 503
+    admission_queue_timeout_seconds: float = 2.0  # Kept well under the deadline so admitted work can finish
+
+    # Response Compression Configuration
+    compress_responses: bool = True  # Negotiated brotli/gzip; streaming responses stay uncompressed
+    compression_min_bytes: int = 1024  # Smaller bodies fit a packet or two anyway
+    gzip_level: int = 6  # zlib default ratio/speed tradeoff
+    brotli_quality: int = 4  # Beats gzip -6 on ratio at similar speed; 11 is for static assets
+
+    # Tracing Configuration
+    trace_file: Optional[str] = None  # Span export file; None disables export
+
+    # Deadline Configuration
+    deadline_seconds: float = 8.0  # Whole diagnosis; partial results after this
+    roboflow_timeout_seconds: float = 5.0  # Per-call budget, capped by the time left
+    groq_timeout_seconds: float = 7.0  # Per-call budget, capped by the time left
+
+    # Upstream Resilience Configuration
+    circuit_failure_threshold: int = 5  # Consecutive 429/5xx/timeouts before failing fast
+    circuit_reset_seconds: float = 30.0  # Open period before a half-open probe
+    hedge_requests: bool = False  # Hedging costs duplicate calls, so it is opt-in
+    upstream_max_retries: int = 2  # Bounded further by the stage budget
+    retry_base_delay_seconds: float = 0.25  # Full-jitter exponential backoff base
+    retry_max_delay_seconds: float = 4.0  # Longer Retry-After requests are not waited out
+
+    # Groq Quota Configuration (match the account's rate limits; 0 disables the scheduler)
+    groq_requests_per_minute: int = 0  # Requests per sliding minute
+    groq_tokens_per_minute: int = 0  # Tokens per sliding minute, settled from completion.usage
+
+    # Cache Configuration
+    cache_max_entries: int = 256  # Cached diagnosis results (LRU eviction)
+    cache_ttl_seconds: float = 3600.0  # Lifetime of a cached diagnosis result
+
+    # Knowledge Base Configuration
+    kb_resolution_cache_size: int = 512  # Resolved plant names (LRU eviction, cleared on reload)
+    classifier_classes: Tuple[str, ...] = ()  # Class labels of the Roboflow model, pre-resolved at startup
+    kb_advice_cache_size: int = 1024  # Assembled advice per (plant, disease) pair (LRU eviction, cleared on reload)
+    kb_snapshot: bool = True  # Skips JSON parsing and index building on cold start
+
+    # Image Preprocessing Configuration
+    preprocess_images: bool = True  # Decode/orient/strip/resize once before upload
+    classification_max_side: int = 640  # Roboflow input size (pixels, longest side)
+    detection_max_side: int = 1024  # Groq vision input size (pixels, longest side)
+    jpeg_quality: int = 85  # Re-encoding quality for both consumers
+
+    @classmethod
+    def from_env(cls) -> 'PipelineConfig':
+        """
+        Create pipeline configuration from environment variables.
+
+        Environment Variables:
+            PIPELINE_STAGE_WORKERS (optional): Override stage executor size
+            PIPELINE_BLOCKING_WORKERS (optional): Override blocking executor size
+            PIPELINE_ASYNC_CLIENTS (optional): "false" to run the sync SDKs on the
+                                               blocking executor instead
+            BATCH_CONCURRENCY (optional): Override per-batch diagnosis concurrency
+            BATCH_MAX_FILES (optional): Override maximum images per batch request
+            MAX_UPLOAD_BYTES (optional): Override the per-image upload size cap
+            JOB_WORKERS (optional): Override the job worker pool size
+            JOB_QUEUE_SIZE (optional): Override the maximum number of waiting jobs
+            JOB_TTL (optional): Override finished job lifetime in seconds
+            ADMISSION_MAX_IN_FLIGHT (optional): Override concurrent diagnosis requests (0 disables)
+            ADMISSION_MAX_QUEUED (optional): Override waiting diagnosis requests
+            ADMISSION_QUEUE_TIMEOUT (optional): Override the longest queue wait in seconds
+            COMPRESS_RESPONSES (optional): "false" to send every response uncompressed
+            COMPRESSION_MIN_BYTES (optional): Override the smallest compressed body size
+            GZIP_LEVEL (optional): Override the gzip compression level
+            BROTLI_QUALITY (optional): Override the brotli quality
+            DIAGNOSIS_TRACE_FILE (optional): Append every diagnosis's stage spans to this file
+            DIAGNOSIS_DEADLINE (optional): Override the diagnosis deadline in seconds (0 disables)
+            ROBOFLOW_TIMEOUT (optional): Override the Roboflow call budget in seconds
+            GROQ_TIMEOUT (optional): Override the Groq call budget in seconds
+            CIRCUIT_FAILURE_THRESHOLD (optional): Override failures that open a circuit
+            CIRCUIT_RESET_SECONDS (optional): Override the open circuit period in seconds
+            HEDGE_REQUESTS (optional): "true" to hedge slow async upstream requests
+            UPSTREAM_MAX_RETRIES (optional): Override retries per upstream call (0 disables)
+            RETRY_BASE_DELAY (optional): Override the first retry's backoff ceiling in seconds
+            RETRY_MAX_DELAY (optional): Override the longest retry wait in seconds
+            GROQ_RPM (optional): Groq requests-per-minute budget (0 for unlimited)
+            GROQ_TPM (optional): Groq tokens-per-minute budget (0 for unlimited)
+            DIAGNOSIS_CACHE_SIZE (optional): Override cached result count (0 disables)
+            DIAGNOSIS_CACHE_TTL (optional): Override cached result lifetime in seconds
+            KB_RESOLUTION_CACHE_SIZE (optional): Override resolved plant name count (0 disables)
+            CLASSIFIER_CLASSES (optional): Comma-separated classifier labels to pre-resolve
+            KB_ADVICE_CACHE_SIZE (optional): Override memoized advice entry count (0 disables)
+            KB_SNAPSHOT (optional): "false" to always parse the knowledge base JSON
+            PREPROCESS_IMAGES (optional): "false" to send uploads to both upstreams unchanged
+            CLASSIFICATION_IMAGE_MAX_SIDE (optional): Override Roboflow image size
+            DETECTION_IMAGE_MAX_SIDE (optional): Override Groq image size
+            PREPROCESS_JPEG_QUALITY (optional): Override JPEG re-encoding quality
+
+        Returns:
+            PipelineConfig: Configured instance with values from environment variables
+        """
+        return cls(
+            stage_workers=int(
+                os.getenv("PIPELINE_STAGE_WORKERS", cls.stage_workers)),
+            blocking_workers=int(
+                os.getenv("PIPELINE_BLOCKING_WORKERS", cls.blocking_workers)),
+            async_clients=_env_flag("PIPELINE_ASYNC_CLIENTS", cls.async_clients),
+            batch_concurrency=int(
+                os.getenv("BATCH_CONCURRENCY", cls.batch_concurrency)),
+            batch_max_files=int(
+                os.getenv("BATCH_MAX_FILES", cls.batch_max_files)),
+            max_upload_bytes=int(
+                os.getenv("MAX_UPLOAD_BYTES", cls.max_upload_bytes)),
+            job_workers=int(
+                os.getenv("JOB_WORKERS", cls.job_workers)),
+            job_queue_size=int(
+                os.getenv("JOB_QUEUE_SIZE", cls.job_queue_size)),
+            job_ttl_seconds=float(
+                os.getenv("JOB_TTL", cls.job_ttl_seconds)),
+            admission_max_in_flight=int(
+                os.getenv("ADMISSION_MAX_IN_FLIGHT", cls.admission_max_in_flight)),
+            admission_max_queued=int(
+                os.getenv("ADMISSION_MAX_QUEUED", cls.admission_max_queued)),
+            admission_queue_timeout_seconds=float(
+                os.getenv("ADMISSION_QUEUE_TIMEOUT", cls.admission_queue_timeout_seconds)),
+            compress_responses=_env_flag("COMPRESS_RESPONSES", cls.compress_responses),
+            compression_min_bytes=int(
+                os.getenv("COMPRESSION_MIN_BYTES", cls.compression_min_bytes)),
+            gzip_level=int(
+                os.getenv("GZIP_LEVEL", cls.gzip_level)),
+            brotli_quality=int(
+                os.getenv("BROTLI_QUALITY", cls.brotli_quality)),
+            trace_file=os.getenv("DIAGNOSIS_TRACE_FILE") or cls.trace_file,
+            deadline_seconds=float(
+                os.getenv("DIAGNOSIS_DEADLINE", cls.deadline_seconds)),
+            roboflow_timeout_seconds=float(
+                os.getenv("ROBOFLOW_TIMEOUT", cls.roboflow_timeout_seconds)),
+            groq_timeout_seconds=float(
+                os.getenv("GROQ_TIMEOUT", cls.groq_timeout_seconds)),
+            circuit_failure_threshold=int(
+                os.getenv("CIRCUIT_FAILURE_THRESHOLD", cls.circuit_failure_threshold)),
+            circuit_reset_seconds=float(
+                os.getenv("CIRCUIT_RESET_SECONDS", cls.circuit_reset_seconds)),
+            hedge_requests=_env_flag("HEDGE_REQUESTS", cls.hedge_requests),
+            upstream_max_retries=int(
+                os.getenv("UPSTREAM_MAX_RETRIES", cls.upstream_max_retries)),
+            retry_base_delay_seconds=float(
+                os.getenv("RETRY_BASE_DELAY", cls.retry_base_delay_seconds)),
+            retry_max_delay_seconds=float(
+                os.getenv("RETRY_MAX_DELAY", cls.retry_max_delay_seconds)),
+            groq_requests_per_minute=int(
+                os.getenv("GROQ_RPM", cls.groq_requests_per_minute)),
+            groq_tokens_per_minute=int(
+                os.getenv("GROQ_TPM", cls.groq_tokens_per_minute)),
+            cache_max_entries=int(
+                os.getenv("DIAGNOSIS_CACHE_SIZE", cls.cache_max_entries)),
+            cache_ttl_seconds=float(
+                os.getenv("DIAGNOSIS_CACHE_TTL", cls.cache_ttl_seconds)),
+            kb_resolution_cache_size=int(
+                os.getenv("KB_RESOLUTION_CACHE_SIZE", cls.kb_resolution_cache_size)),
+            classifier_classes=_env_list("CLASSIFIER_CLASSES", cls.classifier_classes),
+            kb_advice_cache_size=int(
+                os.getenv("KB_ADVICE_CACHE_SIZE", cls.kb_advice_cache_size)),
+            kb_snapshot=_env_flag("KB_SNAPSHOT", cls.kb_snapshot),
+            preprocess_images=_env_flag("PREPROCESS_IMAGES", cls.preprocess_images),
+            classification_max_side=int(
+                os.getenv("CLASSIFICATION_IMAGE_MAX_SIDE", cls.classification_max_side)),
+            detection_max_side=int(
+                os.getenv("DETECTION_IMAGE_MAX_SIDE", cls.detection_max_side)),
+            jpeg_quality=int(
+                os.getenv("PREPROCESS_JPEG_QUALITY", cls.jpeg_quality))
+        )
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    """Read a boolean environment variable ("1", "true", "yes", "on" are true)."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_list(name: str, default: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Read a comma-separated environment variable, dropping empty items."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return tuple(item.strip() for item in value.split(",") if item.strip())
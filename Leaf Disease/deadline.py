@@ -0,0 +1,76 @@
+"""
+Diagnosis Deadline
+==================
+
+This module bounds the end-to-end time of one diagnosis:
+1. A Deadline starts with the diagnosis (e.g. 8 seconds)
+2. Each upstream stage gets its own budget, capped by the time left, which is
+   passed to the Roboflow and Groq clients as a request timeout
+3. When the deadline expires, the diagnosis stops waiting and returns
+   whatever completed. Stages that have not started are cancelled; upstream
+   calls already running on a worker thread cannot be interrupted, so they
+   are abandoned and end within their own request timeout (the budget from 2)
+"""
+
+import time
+from typing import Optional
+
+
+class Deadline:
+    """
+    Monotonic end-to-end deadline for one diagnosis.
+
+    A deadline of None (or 0) never expires; stage budgets then apply alone.
+
+    Example:
+        >>> deadline = Deadline(8.0)
+        >>> timeout = deadline.budget(5.0)  # Roboflow gets min(5.0, time left)
+        >>> future.result(timeout=deadline.remaining())
+    """
+
+    def __init__(self, seconds: Optional[float]):
+        """
+        Start the deadline.
+
+        Args:
+            seconds (Optional[float]): Time allowed for the whole diagnosis;
+                                       None or 0 disables the deadline
+        """
+        self.seconds = seconds if seconds else None
+        self._expires_at = time.monotonic() + self.seconds if self.seconds else None
+
+    def remaining(self) -> Optional[float]:
+        """
+        Get the time left.
+
+        Returns:
+            Optional[float]: Seconds until the deadline (never negative),
+                             or None if there is no deadline
+        """
+        if self._expires_at is None:
+            return None
+        return max(0.0, self._expires_at - time.monotonic())
+
+    def budget(self, stage_seconds: Optional[float]) -> Optional[float]:
+        """
+        Get the timeout for a stage starting now.
+
+        Args:
+            stage_seconds (Optional[float]): The stage's own budget (None for unlimited)
+
+        Returns:
+            Optional[float]: The smaller of the stage budget and the time left,
+                             or None if neither applies
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return stage_seconds
+        if stage_seconds is None:
+            return remaining
+        return min(stage_seconds, remaining)
+
+    @property
+    def expired(self) -> bool:
+        """Whether the deadline has passed."""
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
@@ -11,6 +11,8 @@ This module orchestrates the complete plant diagnosis pipeline combining:
 import os
 import sys
 import logging
+import functools
+import concurrent.futures
 from typing import Dict, Any, Optional
 from pathlib import Path
 from dotenv import load_dotenv
@@ -23,8 +25,18 @@ load_dotenv()
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from inference import RoboflowInferenceClient
-from kb_utils import PlantKnowledgeBase
-from main import LeafDiseaseDetector
+from metrics import observe_stage
+from tracing import in_current_context, start_trace, trace_stage
+from main import LeafDiseaseDetector, prepare_pipeline_image
+from preprocessing import PreparedImage
+from registry import (
+    ComponentRegistry,
+    get_default_registry,
+    ROBOFLOW_WORKSPACE,
+    ROBOFLOW_MODEL_ID,
+    ROBOFLOW_MIN_CONFIDENCE,
+    ROBOFLOW_CONFIDENCE_METHOD,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +51,8 @@ class PlantDiagnosisPipeline:
         self, 
         roboflow_api_key: Optional[str] = None, 
         groq_api_key: Optional[str] = None,
-        confidence_method: str = "adaptive_weighted"
+        confidence_method: str = "adaptive_weighted",
+        registry: Optional[ComponentRegistry] = None
     ):
         """
         Initialize the plant diagnosis pipeline.
@@ -51,26 +64,41 @@ class PlantDiagnosisPipeline:
                                    - "adaptive_weighted": Weighted average with adaptive weights
                                    - "statistical": Statistical analysis of all scores
                                    - "simple_average": Simple average of all scores
+            registry (Optional[ComponentRegistry]): Shared pipeline components. Components
+                                                  without an explicit API key are taken from
+                                                  this registry (default registry if None).
         """
         try:
+            registry = registry or get_default_registry()
+            
             # Initialize Roboflow client for plant classification with workflow
-            self.roboflow_client = RoboflowInferenceClient(
-                api_key=roboflow_api_key,
-                workspace_name="laiba-masood-tyq7q",
-                model_id="identify-plant-zvd1y/1",
-                min_confidence=0.7,
-                confidence_method="adaptive"
-            )
+            if roboflow_api_key:
+                self.roboflow_client = RoboflowInferenceClient(
+                    api_key=roboflow_api_key,
+                    workspace_name=ROBOFLOW_WORKSPACE,
+                    model_id=ROBOFLOW_MODEL_ID,
+                    min_confidence=ROBOFLOW_MIN_CONFIDENCE,
+                    confidence_method=ROBOFLOW_CONFIDENCE_METHOD
+                )
+            else:
+                self.roboflow_client = registry.roboflow_client
             logger.info("Roboflow client initialized")
             
             # Initialize Groq client for disease detection
-            self.disease_detector = LeafDiseaseDetector(api_key=groq_api_key)
+            if groq_api_key:
+                self.disease_detector = LeafDiseaseDetector(api_key=groq_api_key)
+            else:
+                self.disease_detector = registry.disease_detector
             logger.info("Disease detector initialized")
             
-            # Initialize knowledge base
-            self.knowledge_base = PlantKnowledgeBase()
+            # Knowledge base is read-only, so it is always shared
+            self.knowledge_base = registry.knowledge_base
             logger.info("Knowledge base initialized")
             
+            # Shared thread pool for concurrent upstream calls
+            self.registry = registry
+            self.executor = registry.stage_executor
+            
             self.confidence_method = confidence_method
             
         except Exception as e:
@@ -169,18 +197,36 @@ class PlantDiagnosisPipeline:
         # Ensure result is between 0 and 1
         return max(0.0, min(1.0, overall))
     
-    def diagnose_plant(self, image_path: str) -> Dict[str, Any]:
+    def _prepare_image(self, image_path: str) -> PreparedImage:
+        """
+        Load a file path or base64 image and preprocess it once for both upstream calls.
+        
+        Args:
+            image_path (str): Path to plant image file or base64 encoded image
+            
+        Returns:
+            PreparedImage: Per-consumer encodings for classification and detection
+        """
+        # Handle both file path and base64 input
+        if os.path.exists(image_path):
+            with open(image_path, 'rb') as image_file:
+                return prepare_pipeline_image(image_file.read(), self.registry)
+        # Assume it's already base64
+        return prepare_pipeline_image(image_path, self.registry)
+    
+    def diagnose_plant(self, image_path: str, timings: bool = False) -> Dict[str, Any]:
         """
         Complete plant diagnosis pipeline.
         
         This method performs the full diagnosis workflow:
         1. Classify plant species using Roboflow
-        2. Detect diseases using Groq AI
-        3. Lookup plant-specific care information
+        2. Detect diseases using Groq AI (concurrently with step 1)
+        3. Lookup plant-specific care information as soon as step 1 returns
         4. Combine all results into comprehensive response
         
         Args:
             image_path (str): Path to plant image file or base64 encoded image
+            timings (bool): Add a "timings" block with per-stage durations in milliseconds
             
         Returns:
             Dict[str, Any]: Comprehensive diagnosis results containing:
@@ -191,65 +237,88 @@ class PlantDiagnosisPipeline:
                 - treatments: Treatment recommendations
                 - confidence: Overall confidence score with advanced calculation
                 - pipeline_success: Boolean indicating success
+                - timings: Per-stage durations (only if requested)
         """
+        exporter = self.registry.span_exporter
+        if not timings and exporter is None:
+            return self._diagnose_plant(image_path)
+        
+        with start_trace(exporter) as trace:
+            result = self._diagnose_plant(image_path)
+        if timings:
+            result["timings"] = trace.get_timings()
+        return result
+    
+    def _diagnose_plant(self, image_path: str) -> Dict[str, Any]:
+        """Run the diagnose_plant steps, recording spans into the active trace."""
         try:
             logger.info("Starting complete plant diagnosis pipeline")
             
-            # Step 1: Plant Classification using Roboflow
-            logger.info("Step 1: Classifying plant species...")
-            classification_result = self.roboflow_client.classify_plant(image_path)
-            
-            plant_name = classification_result.get("plant_name", "Unknown Plant")
-            classification_confidence = classification_result.get("confidence", 0.0)
-            classification_success = classification_result.get("success", False)
+            # Decode and downsize once; both upstream calls reuse the output
+            image = self._prepare_image(image_path)
             
-            logger.info(f"Plant classified as: {plant_name} (confidence: {classification_confidence:.2f})")
+            # Steps 1 and 2 are independent, so both upstream calls run concurrently,
+            # each bounded by its configured stage budget
+            config = self.registry.config
+            logger.info("Step 1: Classifying plant species...")
+            classification_future = self.executor.submit(in_current_context(functools.partial(
+                self.roboflow_client.classify_plant_from_base64, image.classification_base64,
+                timeout=config.roboflow_timeout_seconds)))
             
-            # Step 2: Disease Detection using Groq
             logger.info("Step 2: Detecting diseases...")
+            disease_future = self.executor.submit(in_current_context(functools.partial(
+                self.disease_detector.analyze_leaf_image_base64, image.detection_base64,
+                timeout=config.groq_timeout_seconds)))
             
-            # Handle both file path and base64 input for disease detection
-            if os.path.exists(image_path):
-                # File path - convert to base64 for disease detection
-                import base64
-                with open(image_path, 'rb') as image_file:
-                    image_bytes = image_file.read()
-                    base64_image = base64.b64encode(image_bytes).decode('utf-8')
-            else:
-                # Assume it's already base64
-                base64_image = image_path
+            try:
+                # Step 1: Plant Classification using Roboflow
+                classification_result = classification_future.result()
+                
+                plant_name = classification_result.get("plant_name", "Unknown Plant")
+                classification_confidence = classification_result.get("confidence", 0.0)
+                classification_success = classification_result.get("success", False)
+                
+                logger.info(f"Plant classified as: {plant_name} (confidence: {classification_confidence:.2f})")
+                
+                # Step 3: Knowledge Base Lookup (overlaps with disease detection)
+                logger.info("Step 3: Looking up plant care information...")
+                with observe_stage("kb"), trace_stage("kb_search"):
+                    kb_info = self.knowledge_base.get_advice(plant_name)
+                kb_confidence = kb_info.get("confidence", 0.0)
+                kb_success = kb_info.get("found", False)
+            except BaseException:
+                # Don't leave disease detection running for a failed diagnosis: drop it
+                # if it hasn't started, otherwise wait out its (time-bounded) call
+                if not disease_future.cancel():
+                    concurrent.futures.wait([disease_future])
+                raise
             
-            disease_result = self.disease_detector.analyze_leaf_image_base64(base64_image)
+            # Step 2: Disease Detection using Groq
+            disease_result = disease_future.result()
             disease_confidence = disease_result.get("confidence", 0.0)
             disease_success = disease_result.get("disease_detected") is not None and disease_result.get("disease_type") != "invalid_image"
             
-            # Step 3: Knowledge Base Lookup
-            logger.info("Step 3: Looking up plant care information...")
-            kb_info = self.knowledge_base.get_plant_care_info(plant_name)
-            kb_confidence = kb_info.get("confidence", 0.0)
-            kb_success = kb_info.get("found", False)
-            
             # Step 4: Get Treatment Recommendations
             treatment_recommendations = []
-            if disease_result.get("disease_detected", False):
-                disease_name = disease_result.get("disease_name", "")
-                treatment_recommendations = self.knowledge_base.get_treatment_recommendations(
-                    plant_name, disease_name
-                )
-            
-            # If no specific treatments found, get general treatments
-            if not treatment_recommendations:
-                treatment_recommendations = self.knowledge_base.get_treatment_recommendations(plant_name)
+            with observe_stage("kb"), trace_stage("kb_search"):
+                if disease_result.get("disease_detected", False):
+                    disease_name = disease_result.get("disease_name", "")
+                    treatment_recommendations = self.knowledge_base.get_advice(plant_name, disease_name)["treatments"]
+                
+                # If no specific treatments found, use the general treatments from step 3
+                if not treatment_recommendations:
+                    treatment_recommendations = kb_info["treatments"]
             
             # Step 5: Calculate Advanced Overall Confidence
-            overall_confidence = self._calculate_overall_confidence(
-                classification_confidence,
-                disease_confidence,
-                kb_confidence,
-                classification_success,
-                disease_success,
-                kb_success
-            )
+            with trace_stage("confidence_aggregation"):
+                overall_confidence = self._calculate_overall_confidence(
+                    classification_confidence,
+                    disease_confidence,
+                    kb_confidence,
+                    classification_success,
+                    disease_success,
+                    kb_success
+                )
             
             # Step 6: Compile Results
             diagnosis_result = {
@@ -274,12 +343,12 @@ class PlantDiagnosisPipeline:
                     "plant_found_in_kb": kb_success,
                     "kb_confidence": kb_confidence,
                     "general_care": kb_info.get("general_care", ""),
-                    "common_issues": kb_info.get("common_issues", []),
-                    "prevention_tips": self.knowledge_base.get_prevention_tips(plant_name)
+                    "common_issues": list(kb_info.get("common_issues", [])),
+                    "prevention_tips": list(kb_info["prevention_tips"])
                 },
                 "treatments": {
                     "disease_treatments": disease_result.get("treatment", []),
-                    "kb_treatments": treatment_recommendations,
+                    "kb_treatments": list(treatment_recommendations),
                     "combined_treatments": list(set(
                         disease_result.get("treatment", []) + treatment_recommendations
                     ))
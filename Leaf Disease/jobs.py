@@ -0,0 +1,209 @@
+"""
+Asynchronous Diagnosis Jobs
+===========================
+
+This module decouples request latency from upstream latency for clients on
+slow or flaky links:
+1. POST /jobs enqueues an uploaded image and returns a job ID immediately
+2. A fixed pool of worker tasks runs the diagnoses from a bounded queue
+3. GET /jobs/{id} polls the job's status and, once finished, its result
+
+Jobs are kept in memory and expire a while after they finish.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+@dataclass
+class Job:
+    """
+    State of one queued diagnosis.
+
+    Attributes:
+        job_id (str): Unique job identifier
+        status (str): "queued", "running", "completed" or "failed"
+        created_at (float): Submission time (epoch seconds)
+        started_at (Optional[float]): Time a worker picked the job up
+        finished_at (Optional[float]): Time the job completed or failed
+        result (Optional[Dict]): Diagnosis result once completed
+        error (Optional[str]): Error message if the job failed
+        payload (Any): Job input, released once the job starts
+    """
+    job_id: str
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    payload: Any = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Get the client-facing view of the job.
+
+        Returns:
+            Dict[str, Any]: Job status, timestamps and result or error
+        """
+        data = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+        if self.status == "completed":
+            data["result"] = self.result
+        elif self.status == "failed":
+            data["error"] = self.error
+        return data
+
+
+class JobQueue:
+    """
+    Bounded in-memory job queue drained by a fixed pool of asyncio workers.
+
+    Must be used from a single event loop. The handler receives the job
+    payload and returns the job result; an exception fails the job.
+
+    Example:
+        >>> jobs = JobQueue(workers=4, max_queued=100, ttl_seconds=3600)
+        >>> jobs.start(lambda contents: run_safe_diagnose(registry, contents))
+        >>> job = jobs.submit(image_bytes)
+        >>> jobs.get(job.job_id).status
+        'queued'
+    """
+
+    def __init__(self, workers: int = 4, max_queued: int = 100, ttl_seconds: float = 3600.0):
+        """
+        Initialize an idle queue.
+
+        Args:
+            workers (int): Number of jobs run concurrently
+            max_queued (int): Jobs waiting to run before submissions are refused
+            ttl_seconds (float): Seconds a finished job stays available for polling
+        """
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl_seconds = ttl_seconds
+        self._jobs: Dict[str, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._handler: Optional[Callable[[Any], Awaitable[Any]]] = None
+
+    def start(self, handler: Callable[[Any], Awaitable[Any]]) -> None:
+        """
+        Start the worker pool on the running event loop.
+
+        Args:
+            handler (Callable[[Any], Awaitable[Any]]): Coroutine function running one job
+        """
+        self._handler = handler
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"diagnosis-job-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Job queue started with {self.workers} workers")
+
+    async def stop(self) -> None:
+        """Cancel the workers; queued and running jobs are abandoned."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Job queue stopped")
+
+    def submit(self, payload: Any) -> Job:
+        """
+        Enqueue a job.
+
+        Args:
+            payload (Any): Input passed to the handler (e.g. image bytes)
+
+        Returns:
+            Job: The queued job
+
+        Raises:
+            JobQueueFull: If max_queued jobs are already waiting
+            RuntimeError: If the queue has not been started
+        """
+        if self._queue is None:
+            raise RuntimeError("Job queue is not started")
+        self._expire()
+        job = Job(job_id=uuid.uuid4().hex, payload=payload)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFull(f"Job queue is full ({self.max_queued} jobs waiting)")
+        self._jobs[job.job_id] = job
+        logger.info(f"Queued diagnosis job {job.job_id} ({self._queue.qsize()} waiting)")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        Look up a job.
+
+        Args:
+            job_id (str): Job identifier returned by submit
+
+        Returns:
+            Optional[Job]: The job, or None if unknown or expired
+        """
+        self._expire()
+        return self._jobs.get(job_id)
+
+    async def _worker(self) -> None:
+        """Run queued jobs one at a time until cancelled."""
+        while True:
+            job = await self._queue.get()
+            payload, job.payload = job.payload, None
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = await self._handler(payload)
+                job.status = "completed"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Diagnosis job {job.job_id} failed: {str(e)}")
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                self._queue.task_done()
+
+    def _expire(self) -> None:
+        """Drop finished jobs older than the TTL."""
+        cutoff = time.time() - self.ttl_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get queue statistics.
+
+        Returns:
+            Dict[str, int]: Job counts by status and the queue capacity
+        """
+        stats = {"queued": 0, "running": 0, "completed": 0, "failed": 0}
+        for job in self._jobs.values():
+            stats[job.status] += 1
+        stats["workers"] = self.workers
+        stats["max_queued"] = self.max_queued
+        return stats
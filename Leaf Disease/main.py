@@ -1,14 +1,30 @@
 import os
 import json
+import asyncio
+import contextlib
+import concurrent.futures
 import logging
 import sys
-from typing import Dict, Optional, List
+import base64
+from typing import Dict, Optional, List, Tuple, Union
 from dataclasses import dataclass
 from datetime import datetime
+from pathlib import Path
 
-from groq import Groq
+from groq import Groq, AsyncGroq, NOT_GIVEN
 from dotenv import load_dotenv
 
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from metrics import STAGE_ABANDONED, STAGE_DEADLINE_EXCEEDED, observe_stage, track_upstream
+from resilience import UpstreamGuard
+from ratelimit import TokenBudgetScheduler
+from tracing import in_current_context, start_trace, trace_stage
+from preprocessing import PreparedImage, prepare_image
+from deadline import Deadline
+from projection import FieldSelection
+
 
 # Configure logging
 logging.basicConfig(level=logging.INFO,
@@ -67,10 +83,13 @@ class LeafDiseaseDetector:
 
     Attributes:
         MODEL_NAME (str): The AI model used for analysis
+        PROMPT_VERSION (str): Version of the analysis prompt, part of result cache keys
         DEFAULT_TEMPERATURE (float): Default temperature for response generation
         DEFAULT_MAX_TOKENS (int): Default maximum tokens for responses
+        DATA_URL_PREFIX (str): Prefix turning base64 JPEG data into an image URL
         api_key (str): Groq API key for authentication
         client (Groq): Groq API client instance
+        async_client (AsyncGroq): Async Groq API client for event-loop callers
 
     Example:
         >>> detector = LeafDiseaseDetector()
@@ -84,10 +103,14 @@ class LeafDiseaseDetector:
     """
 
     MODEL_NAME = "meta-llama/llama-4-scout-17b-16e-instruct"
+    # Bump whenever create_analysis_prompt changes so cached results are invalidated
+    PROMPT_VERSION = "1"
     DEFAULT_TEMPERATURE = 0.3
     DEFAULT_MAX_TOKENS = 1024
+    DATA_URL_PREFIX = "data:image/jpeg;base64,"
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, upstream_guard: Optional[UpstreamGuard] = None,
+                 scheduler: Optional[TokenBudgetScheduler] = None):
         """
         Initialize the Leaf Disease Detector with API credentials.
 
@@ -98,6 +121,12 @@ class LeafDiseaseDetector:
         Args:
             api_key (Optional[str]): Groq API key. If None, will attempt to
                                    load from GROQ_API_KEY environment variable.
+            upstream_guard (Optional[UpstreamGuard]): Circuit breaker and hedging for
+                                                    Groq calls. If None, a private guard
+                                                    with default settings is used.
+            scheduler (Optional[TokenBudgetScheduler]): Shared RPM/TPM budget every Groq
+                                                        call is admitted through. If None,
+                                                        calls are sent immediately.
 
         Raises:
             ValueError: If no valid API key is found in parameters or environment.
@@ -109,7 +138,11 @@ class LeafDiseaseDetector:
         self.api_key = api_key or os.environ.get("GROQ_API_KEY")
         if not self.api_key:
             raise ValueError("GROQ_API_KEY not found in environment variables")
-        self.client = Groq(api_key=self.api_key)
+        # Retries are handled by the upstream guard's retry policy, within the deadline
+        self.client = Groq(api_key=self.api_key, max_retries=0)
+        self.async_client = AsyncGroq(api_key=self.api_key, max_retries=0)
+        self.upstream = upstream_guard or UpstreamGuard("groq")
+        self.scheduler = scheduler
         logger.info("Leaf Disease Detector initialized")
 
     def create_analysis_prompt(self) -> str:
@@ -168,7 +201,8 @@ class LeafDiseaseDetector:
 
     def analyze_leaf_image_base64(self, base64_image: str,
                                   temperature: float = None,
-                                  max_tokens: int = None) -> Dict:
+                                  max_tokens: int = None,
+                                  timeout: Optional[float] = None) -> Dict:
         """
         Analyze base64 encoded image data for leaf diseases and return JSON result.
 
@@ -177,9 +211,11 @@ class LeafDiseaseDetector:
         'invalid_image' response. For valid leaf images, performs disease analysis.
 
         Args:
-            base64_image (str): Base64 encoded image data (without data:image prefix)
+            base64_image (str): Base64 encoded image data (with or without data:image prefix)
             temperature (float, optional): Model temperature for response generation
             max_tokens (int, optional): Maximum tokens for response
+            timeout (float, optional): Budget in seconds for the request and any
+                retries, e.g. the stage's share of the diagnosis deadline
 
         Returns:
             Dict: Analysis results as dictionary (JSON serializable)
@@ -189,54 +225,71 @@ class LeafDiseaseDetector:
         Raises:
             Exception: If analysis fails
         """
-        try:
-            logger.info("Starting analysis for base64 image data")
+        return self._analyze(base64_image, temperature, max_tokens, timeout)
 
-            # Validate base64 input
-            if not isinstance(base64_image, str):
-                raise ValueError("base64_image must be a string")
+    def analyze_leaf_image_bytes(self, image_bytes: Union[bytes, memoryview],
+                                 temperature: float = None,
+                                 max_tokens: int = None,
+                                 timeout: Optional[float] = None) -> Dict:
+        """
+        Analyze raw image bytes for leaf diseases and return JSON result.
 
-            if not base64_image:
-                raise ValueError("base64_image cannot be empty")
+        The bytes are base64 encoded exactly once, directly into the data URL
+        sent to Groq.
 
-            # Clean base64 string (remove data URL prefix if present)
-            if base64_image.startswith('data:'):
-                base64_image = base64_image.split(',', 1)[1]
+        Args:
+            image_bytes (Union[bytes, memoryview]): Raw JPEG/PNG image data
+            temperature (float, optional): Model temperature for response generation
+            max_tokens (int, optional): Maximum tokens for response
+            timeout (float, optional): Budget in seconds for the request and any
+                retries, e.g. the stage's share of the diagnosis deadline
 
-            # Prepare request parameters
-            temperature = temperature or self.DEFAULT_TEMPERATURE
-            max_tokens = max_tokens or self.DEFAULT_MAX_TOKENS
+        Returns:
+            Dict: Analysis results (same format as analyze_leaf_image_base64)
+
+        Raises:
+            Exception: If analysis fails
+        """
+        return self._analyze(image_bytes, temperature, max_tokens, timeout)
+
+    def _analyze(self, image: Union[str, bytes, memoryview],
+                 temperature: float = None,
+                 max_tokens: int = None,
+                 timeout: Optional[float] = None) -> Dict:
+        """Run a synchronous analysis request for base64 or raw image data."""
+        try:
+            logger.info("Starting analysis for base64 image data")
 
             # Make API request
-            completion = self.client.chat.completions.create(
-                model=self.MODEL_NAME,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": self.create_analysis_prompt()
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                temperature=temperature,
-                max_completion_tokens=max_tokens,
-                top_p=1,
-                stream=False,
-                stop=None,
-            )
+            request = self._build_request(image, temperature, max_tokens)
+
+            def send(attempt_timeout):
+                # Each attempt queues for room in the RPM/TPM budget; the wait
+                # counts against the attempt's timeout
+                reservation = None
+                if self.scheduler is not None:
+                    with observe_stage("groq_queue"), trace_stage("groq_queue"):
+                        reservation = self.scheduler.acquire(attempt_timeout)
+                    attempt_timeout = reservation.remaining(attempt_timeout)
+
+                usage = None
+                try:
+                    with track_upstream("groq", self._image_url_size(request)), trace_stage("groq_call"):
+                        completion = self.client.chat.completions.create(
+                            **request, timeout=_groq_timeout(attempt_timeout))
+                    usage = getattr(completion, "usage", None)
+                    return completion
+                finally:
+                    if reservation is not None:
+                        self.scheduler.settle(reservation, usage)
+
+            # Fails fast while the circuit is open; retries 429/5xx within the timeout
+            completion = self.upstream.call(send, timeout)
 
             logger.info("API request completed successfully")
-            result = self._parse_response(
-                completion.choices[0].message.content)
+            with trace_stage("json_parse"):
+                result = self._parse_response(
+                    completion.choices[0].message.content)
 
             # Return as dictionary for JSON serialization
             return result.__dict__
@@ -245,6 +298,144 @@ class LeafDiseaseDetector:
             logger.error(f"Analysis failed for base64 image data: {str(e)}")
             raise
 
+    async def analyze_leaf_image_base64_async(self, base64_image: Union[str, bytes, memoryview],
+                                              temperature: float = None,
+                                              max_tokens: int = None,
+                                              timeout: Optional[float] = None) -> Dict:
+        """
+        Async variant of analyze_leaf_image_base64 using the AsyncGroq client.
+
+        The request never blocks the event loop, so many analyses can be in
+        flight on a single worker.
+
+        Args:
+            base64_image (Union[str, bytes, memoryview]): Base64 encoded image data
+                (with or without data:image prefix) or raw image bytes
+            temperature (float, optional): Model temperature for response generation
+            max_tokens (int, optional): Maximum tokens for response
+            timeout (float, optional): Budget in seconds for the request and any
+                retries, e.g. the stage's share of the diagnosis deadline
+
+        Returns:
+            Dict: Analysis results (same format as analyze_leaf_image_base64)
+
+        Raises:
+            Exception: If analysis fails
+        """
+        try:
+            logger.info("Starting async analysis for base64 image data")
+
+            request = self._build_request(base64_image, temperature, max_tokens)
+
+            async def send(attempt_timeout):
+                # Retries and hedged duplicates each queue for their own slot
+                reservation = None
+                if self.scheduler is not None:
+                    with observe_stage("groq_queue"), trace_stage("groq_queue"):
+                        reservation = await self.scheduler.acquire_async(attempt_timeout)
+                    attempt_timeout = reservation.remaining(attempt_timeout)
+
+                usage = None
+                try:
+                    with track_upstream("groq", self._image_url_size(request)), trace_stage("groq_call"):
+                        completion = await self.async_client.chat.completions.create(
+                            **request, timeout=_groq_timeout(attempt_timeout))
+                    usage = getattr(completion, "usage", None)
+                    return completion
+                finally:
+                    if reservation is not None:
+                        self.scheduler.settle(reservation, usage)
+
+            # Fails fast while the circuit is open; may hedge a slow request and
+            # retries 429/5xx within the timeout
+            completion = await self.upstream.call_async(send, timeout)
+
+            logger.info("API request completed successfully")
+            with trace_stage("json_parse"):
+                result = self._parse_response(
+                    completion.choices[0].message.content)
+
+            return result.__dict__
+
+        except Exception as e:
+            logger.error(f"Analysis failed for base64 image data: {str(e)}")
+            raise
+
+    async def aclose(self) -> None:
+        """Close the async Groq client's connection pool."""
+        await self.async_client.close()
+
+    def _build_request(self, image: Union[str, bytes, memoryview],
+                       temperature: float = None,
+                       max_tokens: int = None) -> Dict:
+        """
+        Validate the image and build chat completion request parameters.
+
+        Image data is base64 encoded at most once: raw bytes are encoded and
+        prefixed (the encoded bytes, their str form and the prefixed URL are
+        each a copy), base64 strings only gain the data URL prefix (one copy),
+        and data URLs are passed through without copying.
+
+        Args:
+            image (Union[str, bytes, memoryview]): Base64 encoded image data (with or
+                without data URL prefix) or raw image bytes
+            temperature (float, optional): Model temperature for response generation
+            max_tokens (int, optional): Maximum tokens for response
+
+        Returns:
+            Dict: Keyword arguments for chat.completions.create
+
+        Raises:
+            ValueError: If the image data is empty or not a string/bytes
+        """
+        # Validate image input
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            if not len(image):
+                raise ValueError("image bytes cannot be empty")
+            image_url = self.DATA_URL_PREFIX + base64.b64encode(image).decode('ascii')
+        elif isinstance(image, str):
+            if not image:
+                raise ValueError("base64_image cannot be empty")
+            # Data URLs are already in the format Groq expects
+            image_url = image if image.startswith('data:') else self.DATA_URL_PREFIX + image
+        else:
+            raise ValueError("base64_image must be a string or bytes")
+
+        # Prepare request parameters
+        temperature = temperature or self.DEFAULT_TEMPERATURE
+        max_tokens = max_tokens or self.DEFAULT_MAX_TOKENS
+
+        return {
+            "model": self.MODEL_NAME,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": self.create_analysis_prompt()
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": image_url
+                            }
+                        }
+                    ]
+                }
+            ],
+            "temperature": temperature,
+            "max_completion_tokens": max_tokens,
+            "top_p": 1,
+            "stream": False,
+            "stop": None,
+        }
+
+    @staticmethod
+    def _image_url_size(request: Dict) -> int:
+        """Size in bytes of the image data URL in a request built by _build_request."""
+        return len(request["messages"][0]["content"][1]["image_url"]["url"])
+
     def _parse_response(self, response_content: str) -> DiseaseAnalysisResult:
         """
         Parse and validate API response
@@ -316,7 +507,12 @@ class LeafDiseaseDetector:
                 f"Unable to parse API response as JSON: {response_content[:200]}...")
 
 
-def diagnose_plant(image_path: str) -> Dict:
+def _groq_timeout(timeout: Optional[float]):
+    """Per-request Groq timeout: the given seconds, or the client default if None."""
+    return NOT_GIVEN if timeout is None else timeout
+
+
+def diagnose_plant(image_path: str, registry=None) -> Dict:
     """
     Complete plant diagnosis pipeline combining classification, disease detection, and KB lookup.
     
@@ -327,6 +523,8 @@ def diagnose_plant(image_path: str) -> Dict:
     
     Args:
         image_path (str): Path to plant image file or base64 encoded image
+        registry (Optional[ComponentRegistry]): Shared pipeline components. If None,
+                                               uses the process-wide default registry.
         
     Returns:
         Dict: Comprehensive diagnosis results with plant info, health status, 
@@ -336,8 +534,8 @@ def diagnose_plant(image_path: str) -> Dict:
         # Import here to avoid circular imports
         from diagnosis import PlantDiagnosisPipeline
         
-        # Initialize the complete pipeline
-        pipeline = PlantDiagnosisPipeline()
+        # Pipeline is a thin wrapper around the shared registry components
+        pipeline = PlantDiagnosisPipeline(registry=registry)
         
         # Run the full diagnosis
         result = pipeline.diagnose_plant(image_path)
@@ -360,23 +558,243 @@ def diagnose_plant(image_path: str) -> Dict:
         }
 
 
-def safe_diagnose(base64_image: str) -> Dict:
+def prepare_pipeline_image(image: Union[bytes, str, PreparedImage], registry) -> PreparedImage:
     """
-    Safe plant diagnosis with tiered fallbacks.
+    Normalize an image once for both upstream consumers.
     
-    This function runs the complete plant diagnosis pipeline with robust error handling
-    and fallback mechanisms to ensure it always returns useful information.
+    Args:
+        image (Union[bytes, str, PreparedImage]): Raw image bytes, base64 encoded image
+                                                 data, or an already prepared image
+        registry (ComponentRegistry): Provides the preprocessing settings
+        
+    Returns:
+        PreparedImage: Per-consumer encodings (passthrough when preprocessing is
+                       disabled or the base64 data cannot be decoded)
+    """
+    if isinstance(image, PreparedImage):
+        return image
+    
+    config = registry.config
+    if isinstance(image, str):
+        if not config.preprocess_images:
+            return PreparedImage.passthrough(image)
+        try:
+            encoded = image.split(',', 1)[1] if image.startswith('data:') else image
+            image = base64.b64decode(encoded)
+        except Exception:
+            # Let the upstream stages report invalid base64 as before
+            return PreparedImage.passthrough(image)
+    elif not config.preprocess_images:
+        with trace_stage("base64_encode"):
+            return PreparedImage.passthrough(base64.b64encode(image).decode('utf-8'))
+    
+    with observe_stage("preprocess"):
+        return prepare_image(
+            image,
+            classification_max_side=config.classification_max_side,
+            detection_max_side=config.detection_max_side,
+            jpeg_quality=config.jpeg_quality
+        )
+
+
+def _classify_plant_stage(registry, image: PreparedImage, timeout: Optional[float] = None) -> Dict:
+    """
+    Stage 1 worker: classify the plant species with Roboflow.
+    
+    Runs on the registry stage executor; exceptions propagate through the future.
+    """
+    logger.info("Stage 1: Attempting plant classification with Roboflow")
+    return registry.roboflow_client.classify_plant_from_base64(image.classification_base64, timeout=timeout)
+
+
+def _detect_disease_stage(registry, image: PreparedImage, timeout: Optional[float] = None) -> Dict:
+    """
+    Stage 2 worker: detect leaf diseases with Groq.
+    
+    Runs on the registry stage executor; exceptions propagate through the future.
+    """
+    logger.info("Stage 2: Attempting disease detection with Groq")
+    return registry.disease_detector.analyze_leaf_image_base64(image.detection_base64, timeout=timeout)
+
+
+# Upstream stage of each result section: (description, metrics label)
+_UPSTREAM_STAGES = {
+    "classification_info": ("Plant classification", "roboflow"),
+    "disease_info": ("Disease detection", "groq")
+}
+
+
+# Result sections that depend on each skippable stage; pipeline_success and the
+# all-failed chatbot fallback need every stage to mean what they say
+_STAGE_SECTIONS = {
+    "classification": ("plant_name", "classification_info", "kb_advice", "treatments", "confidence",
+                       "pipeline_success", "chatbot"),
+    "detection": ("health_status", "disease_info", "treatments", "confidence", "pipeline_success", "chatbot"),
+    "kb_care": ("kb_advice", "treatments", "confidence", "pipeline_success", "chatbot"),
+    "kb_treatments": ("treatments", "pipeline_success", "chatbot")
+}
+
+
+def _wants_stage(fields: Optional[FieldSelection], stage: str) -> bool:
+    """Whether any selected result section depends on the stage (always True without a selection)."""
+    return fields is None or fields.wants(*_STAGE_SECTIONS[stage])
+
+
+def selected_stages(fields: Optional[FieldSelection]) -> Tuple[str, ...]:
+    """
+    List the safe_diagnose stages a field selection runs.
     
     Args:
-        base64_image (str): Base64 encoded image data
+        fields (Optional[FieldSelection]): Requested result sections (None for all)
         
     Returns:
-        Dict: Comprehensive diagnosis results with fallbacks
+        Tuple[str, ...]: Stage names, all of them when every stage is needed
     """
-    logger.info("Starting safe plant diagnosis with tiered fallbacks")
+    return tuple(stage for stage in _STAGE_SECTIONS if _wants_stage(fields, stage))
+
+
+def _apply_stage_timeout(result: Dict, section: str, deadline: Deadline, abandoned: bool = False) -> None:
+    """
+    Record an upstream stage cut off by the diagnosis deadline.
     
-    # Initialize result structure
-    result = {
+    Args:
+        result (Dict): Diagnosis result being assembled (updated in place)
+        section (str): Result section of the stage ("classification_info" or "disease_info")
+        deadline (Deadline): The expired deadline
+        abandoned (bool): The stage could not be cancelled and keeps running on its
+                          worker thread until its request timeout
+    """
+    description, stage = _UPSTREAM_STAGES[section]
+    message = f"{description} did not finish within the {deadline.seconds:g}s diagnosis deadline"
+    logger.warning(message)
+    STAGE_DEADLINE_EXCEEDED.labels(stage=stage).inc()
+    if abandoned:
+        STAGE_ABANDONED.labels(stage=stage).inc()
+    result[section]["error"] = message
+    result["deadline_exceeded"] = True
+
+
+def _apply_classification_result(result: Dict, classification_result: Dict) -> bool:
+    """
+    Merge a Roboflow classification result into the diagnosis result.
+    
+    Args:
+        result (Dict): Diagnosis result being assembled (updated in place)
+        classification_result (Dict): Output of RoboflowInferenceClient classification
+        
+    Returns:
+        bool: True if classification met the confidence threshold
+    """
+    if classification_result.get("success", False):
+        result["plant_name"] = classification_result.get("plant_name", "Unknown Plant")
+        result["classification_info"]["plant_identified"] = True
+        result["classification_info"]["classification_confidence"] = classification_result.get("confidence", 0.0)
+        result["classification_info"]["roboflow_predictions"] = classification_result.get("predictions", [])
+        result["confidence"]["classification"] = classification_result.get("confidence", 0.0)
+        
+        logger.info(f"Classification successful: {result['plant_name']} (confidence: {result['confidence']['classification']:.2%})")
+        return True
+    
+    # Get detailed error information
+    error_msg = classification_result.get("error", "Classification failed")
+    confidence = classification_result.get("confidence", 0.0)
+    plant_name = classification_result.get("plant_name", "Unknown Plant")
+    
+    # Build detailed error message
+    if confidence > 0:
+        error_msg = f"Classification confidence {confidence:.2%} below threshold. Detected: {plant_name}"
+    elif "No predictions" in error_msg or "predictions" in error_msg.lower():
+        error_msg = f"No predictions returned from Roboflow workflow. {error_msg}"
+    else:
+        error_msg = f"Classification failed: {error_msg}"
+    
+    logger.warning(f"Roboflow classification failed: {error_msg}")
+    result["classification_info"]["error"] = error_msg
+    result["classification_info"]["classification_confidence"] = confidence
+    result["classification_info"]["roboflow_predictions"] = classification_result.get("predictions", [])
+    
+    # Still set plant name if we got one, even if confidence is low
+    if plant_name != "Unknown Plant":
+        result["plant_name"] = plant_name
+        logger.info(f"Using low-confidence classification: {plant_name} (confidence: {confidence:.2%})")
+    return False
+
+
+def _apply_disease_result(result: Dict, disease_result: Dict) -> bool:
+    """
+    Merge a Groq disease analysis into the diagnosis result.
+    
+    Args:
+        result (Dict): Diagnosis result being assembled (updated in place)
+        disease_result (Dict): Output of LeafDiseaseDetector.analyze_leaf_image_base64
+        
+    Returns:
+        bool: True if the image was analyzed as a valid leaf
+    """
+    if disease_result and not disease_result.get("disease_type") == "invalid_image":
+        result["disease_info"]["disease_detected"] = disease_result.get("disease_detected", False)
+        result["disease_info"]["disease_name"] = disease_result.get("disease_name")
+        result["disease_info"]["disease_type"] = disease_result.get("disease_type", "unknown")
+        result["disease_info"]["severity"] = disease_result.get("severity", "unknown")
+        result["disease_info"]["confidence"] = disease_result.get("confidence", 0.0)
+        result["disease_info"]["symptoms"] = disease_result.get("symptoms", [])
+        result["disease_info"]["possible_causes"] = disease_result.get("possible_causes", [])
+        result["disease_info"]["treatment"] = disease_result.get("treatment", [])
+        result["confidence"]["disease_detection"] = disease_result.get("confidence", 0.0)
+        
+        # Update health status based on disease detection
+        result["health_status"] = "unhealthy" if disease_result.get("disease_detected", False) else "healthy"
+        
+        logger.info(f"Disease detection successful: {result['disease_info']['disease_detected']}")
+        return True
+    
+    logger.warning("Groq disease detection failed or invalid image")
+    result["disease_info"]["error"] = "Disease detection failed or invalid image"
+    return False
+
+
+def _apply_kb_care_info(result: Dict, kb) -> Dict:
+    """
+    Look up care information for the classified plant and merge it into the result.
+    
+    Args:
+        result (Dict): Diagnosis result being assembled (updated in place)
+        kb (PlantKnowledgeBase): Knowledge base to query
+        
+    Returns:
+        Dict: The knowledge base advice for the plant across all its issues
+              (empty if no plant name is available)
+    """
+    # Try to get plant-specific advice if we have a plant name
+    if result["plant_name"] == "Unknown Plant":
+        logger.warning("No plant name available for knowledge base lookup")
+        result["kb_advice"]["error"] = "No plant name available for lookup"
+        return {}
+    
+    with observe_stage("kb"), trace_stage("kb_search"):
+        kb_info = kb.get_advice(result["plant_name"])
+    
+    if kb_info.get("found", False):
+        result["kb_advice"]["plant_found_in_kb"] = True
+        result["kb_advice"]["general_care"] = kb_info.get("general_care", "")
+        # get_advice is memoized: copy its lists so a caller editing this result
+        # cannot change what later diagnoses (or cached results) see
+        result["kb_advice"]["common_issues"] = list(kb_info.get("common_issues", []))
+        result["kb_advice"]["prevention_tips"] = list(kb_info.get("prevention_tips", []))
+    else:
+        logger.warning(f"Plant '{result['plant_name']}' not found in knowledge base")
+        result["kb_advice"]["error"] = f"Plant '{result['plant_name']}' not found in knowledge base"
+    return kb_info
+
+
+def _new_diagnosis_result() -> Dict:
+    """
+    Build the safe_diagnose result structure with every stage in its fallback state.
+    
+    Returns:
+        Dict: Diagnosis result skeleton filled in by the pipeline stages
+    """
+    return {
         "plant_name": "Unknown Plant",
         "health_status": "unknown",
         "classification_info": {
@@ -414,128 +832,55 @@ def safe_diagnose(base64_image: str) -> Dict:
             "overall": 0.0
         },
         "pipeline_success": False,
+        "deadline_exceeded": False,
         "timestamp": datetime.now().astimezone().isoformat()
     }
+
+
+def _apply_kb_treatments(result: Dict, kb) -> bool:
+    """
+    Look up knowledge base treatments for the detected disease on the classified plant.
     
-    classification_success = False
-    disease_detection_success = False
-    kb_success = False
-    
-    # Stage 1: Classification (Roboflow)
-    logger.info("Stage 1: Attempting plant classification with Roboflow")
-    try:
-        from inference import RoboflowInferenceClient
-        
-        roboflow_client = RoboflowInferenceClient(
-            workspace_name="laiba-masood-tyq7q",
-            model_id="identify-plant-zvd1y/1",
-            min_confidence=0.7,
-            confidence_method="adaptive"
-        )
-        classification_result = roboflow_client.classify_plant_from_base64(base64_image)
-        
-        if classification_result.get("success", False):
-            result["plant_name"] = classification_result.get("plant_name", "Unknown Plant")
-            result["classification_info"]["plant_identified"] = True
-            result["classification_info"]["classification_confidence"] = classification_result.get("confidence", 0.0)
-            result["classification_info"]["roboflow_predictions"] = classification_result.get("predictions", [])
-            result["confidence"]["classification"] = classification_result.get("confidence", 0.0)
-            classification_success = True
-            
-            logger.info(f"Classification successful: {result['plant_name']} (confidence: {result['confidence']['classification']:.2%})")
-        else:
-            # Get detailed error information
-            error_msg = classification_result.get("error", "Classification failed")
-            confidence = classification_result.get("confidence", 0.0)
-            plant_name = classification_result.get("plant_name", "Unknown Plant")
-            
-            # Build detailed error message
-            if confidence > 0:
-                error_msg = f"Classification confidence {confidence:.2%} below threshold. Detected: {plant_name}"
-            elif "No predictions" in error_msg or "predictions" in error_msg.lower():
-                error_msg = f"No predictions returned from Roboflow workflow. {error_msg}"
-            else:
-                error_msg = f"Classification failed: {error_msg}"
-            
-            logger.warning(f"Roboflow classification failed: {error_msg}")
-            result["classification_info"]["error"] = error_msg
-            result["classification_info"]["classification_confidence"] = confidence
-            result["classification_info"]["roboflow_predictions"] = classification_result.get("predictions", [])
-            
-            # Still set plant name if we got one, even if confidence is low
-            if plant_name != "Unknown Plant":
-                result["plant_name"] = plant_name
-                logger.info(f"Using low-confidence classification: {plant_name} (confidence: {confidence:.2%})")
-            
-    except Exception as e:
-        logger.warning(f"Roboflow classification error: {str(e)}")
-        result["classification_info"]["error"] = str(e)
-    
-    # Stage 2: Disease Detection (Groq)
-    logger.info("Stage 2: Attempting disease detection with Groq")
-    try:
-        detector = LeafDiseaseDetector()
-        disease_result = detector.analyze_leaf_image_base64(base64_image)
+    Args:
+        result (Dict): Diagnosis result being assembled (updated in place)
+        kb (PlantKnowledgeBase): Knowledge base to query
         
-        if disease_result and not disease_result.get("disease_type") == "invalid_image":
-            result["disease_info"]["disease_detected"] = disease_result.get("disease_detected", False)
-            result["disease_info"]["disease_name"] = disease_result.get("disease_name")
-            result["disease_info"]["disease_type"] = disease_result.get("disease_type", "unknown")
-            result["disease_info"]["severity"] = disease_result.get("severity", "unknown")
-            result["disease_info"]["confidence"] = disease_result.get("confidence", 0.0)
-            result["disease_info"]["symptoms"] = disease_result.get("symptoms", [])
-            result["disease_info"]["possible_causes"] = disease_result.get("possible_causes", [])
-            result["disease_info"]["treatment"] = disease_result.get("treatment", [])
-            result["confidence"]["disease_detection"] = disease_result.get("confidence", 0.0)
-            
-            # Update health status based on disease detection
-            result["health_status"] = "unhealthy" if disease_result.get("disease_detected", False) else "healthy"
-            disease_detection_success = True
-            
-            logger.info(f"Disease detection successful: {result['disease_info']['disease_detected']}")
-        else:
-            logger.warning("Groq disease detection failed or invalid image")
-            result["disease_info"]["error"] = "Disease detection failed or invalid image"
-            
-    except Exception as e:
-        logger.warning(f"Groq disease detection error: {str(e)}")
-        result["disease_info"]["error"] = str(e)
-    
-    # Stage 3: Knowledge Base Lookup
-    logger.info("Stage 3: Attempting knowledge base lookup")
+    Returns:
+        bool: True if the lookup succeeded
+    """
     try:
-        from kb_utils import PlantKnowledgeBase
-        
-        kb = PlantKnowledgeBase()
-        
-        # Try to get plant-specific advice if we have a plant name
-        if result["plant_name"] != "Unknown Plant":
-            kb_info = kb.get_plant_care_info(result["plant_name"])
-            
-            if kb_info.get("found", False):
-                result["kb_advice"]["plant_found_in_kb"] = True
-                result["kb_advice"]["general_care"] = kb_info.get("general_care", "")
-                result["kb_advice"]["common_issues"] = kb_info.get("common_issues", [])
-                result["kb_advice"]["prevention_tips"] = kb.get_prevention_tips(result["plant_name"])
-                
-                # Get treatment recommendations
-                disease_name = result["disease_info"].get("disease_name")
-                kb_treatments = kb.get_treatment_recommendations(result["plant_name"], disease_name)
-                result["treatments"]["kb_treatments"] = kb_treatments
-                
-                kb_success = True
-                logger.info(f"Knowledge base lookup successful for: {result['plant_name']}")
-            else:
-                logger.warning(f"Plant '{result['plant_name']}' not found in knowledge base")
-                result["kb_advice"]["error"] = f"Plant '{result['plant_name']}' not found in knowledge base"
-        else:
-            logger.warning("No plant name available for knowledge base lookup")
-            result["kb_advice"]["error"] = "No plant name available for lookup"
-            
+        disease_name = result["disease_info"].get("disease_name")
+        with observe_stage("kb"), trace_stage("kb_search"):
+            # The plant resolution and advice are memoized, so this is a dict lookup after stage 3a
+            result["treatments"]["kb_treatments"] = list(kb.get_advice(result["plant_name"], disease_name)["treatments"])
+        logger.info(f"Knowledge base lookup successful for: {result['plant_name']}")
+        return True
     except Exception as e:
         logger.warning(f"Knowledge base lookup error: {str(e)}")
         result["kb_advice"]["error"] = str(e)
+        return False
+
+
+def _finalize_diagnosis(
+    result: Dict,
+    kb_info: Dict,
+    classification_success: bool,
+    disease_detection_success: bool,
+    kb_success: bool
+) -> Dict:
+    """
+    Combine treatments, compute overall confidence and apply the final fallback.
     
+    Args:
+        result (Dict): Diagnosis result with all stage sections filled (updated in place)
+        kb_info (Dict): Knowledge base care info for the plant (empty if not looked up)
+        classification_success (bool): Whether classification succeeded
+        disease_detection_success (bool): Whether disease detection succeeded
+        kb_success (bool): Whether the knowledge base lookup succeeded
+        
+    Returns:
+        Dict: The finalized diagnosis result
+    """
     # Combine treatments from disease detection and knowledge base
     disease_treatments = result["disease_info"].get("treatment", [])
     kb_treatments = result["treatments"].get("kb_treatments", [])
@@ -550,9 +895,6 @@ def safe_diagnose(base64_image: str) -> Dict:
     kb_conf = 0.0
     if result["kb_advice"].get("plant_found_in_kb"):
         # Calculate KB confidence based on match quality
-        from kb_utils import PlantKnowledgeBase
-        kb = PlantKnowledgeBase()
-        kb_info = kb.get_plant_care_info(result["plant_name"])
         kb_conf = kb_info.get("confidence", 0.0)
         result["kb_advice"]["kb_confidence"] = kb_conf
     
@@ -624,10 +966,354 @@ def safe_diagnose(base64_image: str) -> Dict:
             "note": "Since automated diagnosis could not identify your plant, you can use our Plant Doctor Chatbot for personalized help."
         }
     
+    return result
+
+
+def _diagnosis_trace(registry, timings: bool):
+    """Trace the diagnosis when timings are requested or a span file is configured."""
+    exporter = registry.span_exporter
+    if timings or exporter is not None:
+        return start_trace(exporter)
+    return contextlib.nullcontext()
+
+
+def _diagnosis_deadline(registry, deadline_seconds: Optional[float]) -> Deadline:
+    """Start the diagnosis deadline, defaulting to the configured one."""
+    if deadline_seconds is None:
+        deadline_seconds = registry.config.deadline_seconds
+    return Deadline(deadline_seconds)
+
+
+def safe_diagnose(base64_image: Union[str, bytes, PreparedImage], registry=None, timings: bool = False,
+                  deadline_seconds: Optional[float] = None, fields: Optional[FieldSelection] = None) -> Dict:
+    """
+    Safe plant diagnosis with tiered fallbacks.
+    
+    This function runs the complete plant diagnosis pipeline with robust error handling
+    and fallback mechanisms to ensure it always returns useful information. Stages
+    still running when the deadline expires are abandoned (each ends within its
+    request timeout) and reported in their section's "error" field, with
+    "deadline_exceeded" set on the result.
+    
+    Args:
+        base64_image (Union[str, bytes, PreparedImage]): Base64 encoded image data, raw image
+                                                        bytes, or an image already prepared
+                                                        by prepare_pipeline_image
+        registry (Optional[ComponentRegistry]): Shared pipeline components. If None,
+                                               uses the process-wide default registry.
+        timings (bool): Add a "timings" block with per-stage durations in milliseconds
+        deadline_seconds (Optional[float]): End-to-end time limit; None uses the
+                                            configured deadline, 0 disables it
+        fields (Optional[FieldSelection]): Sections the caller will use; stages none of
+                                          them depend on are skipped and keep their
+                                          fallback values (trim with fields.project)
+        
+    Returns:
+        Dict: Comprehensive diagnosis results with fallbacks
+    """
+    if registry is None:
+        from registry import get_default_registry
+        registry = get_default_registry()
+    
+    deadline = _diagnosis_deadline(registry, deadline_seconds)
+    with _diagnosis_trace(registry, timings) as trace:
+        result = _safe_diagnose(base64_image, registry, deadline, fields)
+    if timings:
+        result["timings"] = trace.get_timings()
+    return result
+
+
+def _safe_diagnose(base64_image: Union[str, bytes, PreparedImage], registry, deadline: Deadline,
+                   fields: Optional[FieldSelection] = None) -> Dict:
+    """Run the safe_diagnose stages, recording spans into the active trace."""
+    logger.info("Starting safe plant diagnosis with tiered fallbacks")
+    
+    # Initialize result structure
+    result = _new_diagnosis_result()
+    
+    # Decode and downsize once; both upstream calls reuse the output
+    image = prepare_pipeline_image(base64_image, registry)
+    
+    classification_success = False
+    disease_detection_success = False
+    kb_success = False
+    kb_info = {}
+    
+    # Stages 1 and 2 are independent, so both upstream calls run concurrently
+    logger.info("Stages 1 and 2: Starting plant classification (Roboflow) and disease detection (Groq) concurrently")
+    # Each upstream call gets its stage budget, capped by the time left on the deadline
+    config = registry.config
+    executor = registry.stage_executor
+    # Stages no requested field depends on are never started
+    classification_future = disease_future = None
+    if _wants_stage(fields, "classification"):
+        classification_future = executor.submit(in_current_context(
+            _classify_plant_stage, registry, image, deadline.budget(config.roboflow_timeout_seconds)))
+    if _wants_stage(fields, "detection"):
+        disease_future = executor.submit(in_current_context(
+            _detect_disease_stage, registry, image, deadline.budget(config.groq_timeout_seconds)))
+    
+    # Stage 1: Classification (Roboflow)
+    if classification_future is not None:
+        try:
+            classification_result = classification_future.result(timeout=deadline.remaining())
+            classification_success = _apply_classification_result(result, classification_result)
+        except concurrent.futures.TimeoutError:
+            # A running call cannot be interrupted; it ends within its request timeout
+            abandoned = not classification_future.cancel()
+            _apply_stage_timeout(result, "classification_info", deadline, abandoned)
+        except Exception as e:
+            logger.warning(f"Roboflow classification error: {str(e)}")
+            result["classification_info"]["error"] = str(e)
+    
+    # Stage 3a: Knowledge base care lookup starts as soon as the plant name is known,
+    # while disease detection may still be in flight
+    if _wants_stage(fields, "kb_care"):
+        logger.info("Stage 3: Attempting knowledge base lookup")
+        try:
+            kb = registry.knowledge_base
+            kb_info = _apply_kb_care_info(result, kb)
+        except Exception as e:
+            logger.warning(f"Knowledge base lookup error: {str(e)}")
+            result["kb_advice"]["error"] = str(e)
+    
+    # Stage 2: Disease Detection (Groq)
+    if disease_future is not None:
+        try:
+            disease_result = disease_future.result(timeout=deadline.remaining())
+            disease_detection_success = _apply_disease_result(result, disease_result)
+        except concurrent.futures.TimeoutError:
+            abandoned = not disease_future.cancel()
+            _apply_stage_timeout(result, "disease_info", deadline, abandoned)
+        except Exception as e:
+            logger.warning(f"Groq disease detection error: {str(e)}")
+            result["disease_info"]["error"] = str(e)
+    
+    # Stage 3b: Disease-specific treatments need both the plant and the disease name
+    if kb_info.get("found", False) and _wants_stage(fields, "kb_treatments"):
+        kb_success = _apply_kb_treatments(result, kb)
+    
+    with trace_stage("confidence_aggregation"):
+        _finalize_diagnosis(result, kb_info, classification_success, disease_detection_success, kb_success)
+    
     logger.info(f"Safe diagnosis completed - Pipeline success: {result['pipeline_success']}")
     return result
 
 
+# Result keys making up each progressively streamed section, in typical arrival order
+DIAGNOSIS_STREAM_SECTIONS = {
+    "plant": ("plant_name", "classification_info"),
+    "care": ("kb_advice",),
+    "disease": ("health_status", "disease_info")
+}
+
+
+def diagnosis_section(result: Dict, section: str) -> Dict:
+    """
+    Extract one streamed section from a (possibly partial) safe_diagnose result.
+    
+    Args:
+        result (Dict): Diagnosis result being assembled or already finalized
+        section (str): Section name from DIAGNOSIS_STREAM_SECTIONS
+        
+    Returns:
+        Dict: Copy of the section's result keys
+    """
+    import copy
+    return {key: copy.deepcopy(result[key]) for key in DIAGNOSIS_STREAM_SECTIONS[section]}
+
+
+async def safe_diagnose_stream(base64_image: Union[str, bytes, PreparedImage], registry=None, timings: bool = False,
+                               deadline_seconds: Optional[float] = None, fields: Optional[FieldSelection] = None):
+    """
+    Run safe_diagnose progressively, yielding each section as its stage finishes.
+    
+    Yields ("plant", ...) when classification finishes, ("care", ...) right
+    after the knowledge base care lookup, ("disease", ...) when the Groq analysis
+    finishes (before "plant" if it is faster), and finally ("result", ...) with
+    the complete result in the same format as safe_diagnose. Closing the
+    generator early, or the deadline expiring, cancels the upstream calls still
+    in flight (calls running on the stage executor when async clients are
+    disabled are abandoned instead); sections of stages cut off by the deadline
+    carry an error.
+    
+    Args:
+        base64_image (Union[str, bytes, PreparedImage]): Base64 encoded image data, raw image
+                                                        bytes, or an image already prepared
+                                                        by prepare_pipeline_image
+        registry (Optional[ComponentRegistry]): Shared pipeline components. If None,
+                                               uses the process-wide default registry.
+        timings (bool): Add a "timings" block with per-stage durations to the result
+        deadline_seconds (Optional[float]): End-to-end time limit; None uses the
+                                            configured deadline, 0 disables it
+        fields (Optional[FieldSelection]): Sections the caller will use; sections of
+                                          skipped stages are not yielded
+        
+    Yields:
+        Tuple[str, Dict]: Section name and section data
+    """
+    if registry is None:
+        from registry import get_default_registry
+        registry = get_default_registry()
+    
+    deadline = _diagnosis_deadline(registry, deadline_seconds)
+    with _diagnosis_trace(registry, timings) as trace:
+        async for section, data in _safe_diagnose_stages(base64_image, registry, deadline, fields):
+            if section == "result" and timings:
+                data["timings"] = trace.get_timings()
+            yield section, data
+
+
+async def _safe_diagnose_stages(base64_image: Union[str, bytes, PreparedImage], registry, deadline: Deadline,
+                                fields: Optional[FieldSelection] = None, sections: bool = True):
+    """
+    Run the safe_diagnose stages on the event loop, yielding sections as they finish.
+    
+    With sections False only the final ("result", ...) is yielded, so callers
+    without a stream consumer don't pay for copying each section.
+    """
+    logger.info("Starting streamed safe plant diagnosis with tiered fallbacks")
+    
+    result = _new_diagnosis_result()
+    
+    # Preprocessing is CPU-bound, so it runs on the blocking executor
+    loop = asyncio.get_running_loop()
+    image = await loop.run_in_executor(
+        registry.blocking_executor, in_current_context(prepare_pipeline_image, base64_image, registry))
+    
+    classification_success = False
+    disease_detection_success = False
+    kb_success = False
+    kb_info = {}
+    kb = None
+    config = registry.config
+    
+    async def classify():
+        timeout = deadline.budget(config.roboflow_timeout_seconds)
+        if not config.async_clients:
+            return await loop.run_in_executor(
+                registry.stage_executor, in_current_context(_classify_plant_stage, registry, image, timeout))
+        logger.info("Stage 1: Attempting plant classification with Roboflow")
+        return await registry.roboflow_client.classify_plant_from_base64_async(
+            image.classification_base64, timeout=timeout)
+    
+    async def detect():
+        timeout = deadline.budget(config.groq_timeout_seconds)
+        if not config.async_clients:
+            return await loop.run_in_executor(
+                registry.stage_executor, in_current_context(_detect_disease_stage, registry, image, timeout))
+        logger.info("Stage 2: Attempting disease detection with Groq")
+        return await registry.disease_detector.analyze_leaf_image_base64_async(
+            image.detection_base64, timeout=timeout)
+    
+    # Stages no requested field depends on are never started
+    classification_task = asyncio.create_task(classify()) if _wants_stage(fields, "classification") else None
+    disease_task = asyncio.create_task(detect()) if _wants_stage(fields, "detection") else None
+    pending = {task for task in (classification_task, disease_task) if task is not None}
+    
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=deadline.remaining(), return_when=asyncio.FIRST_COMPLETED)
+            timed_out = set()
+            if not done:
+                # Deadline expired: cancel what is left and finish with partial results
+                timed_out, pending = pending, set()
+                for task in timed_out:
+                    task.cancel()
+            
+            # Stage 1: Classification (Roboflow)
+            if classification_task in done or classification_task in timed_out:
+                try:
+                    if classification_task in timed_out:
+                        _apply_stage_timeout(result, "classification_info", deadline, not config.async_clients)
+                    else:
+                        classification_success = _apply_classification_result(result, classification_task.result())
+                except Exception as e:
+                    logger.warning(f"Roboflow classification error: {str(e)}")
+                    result["classification_info"]["error"] = str(e)
+                if sections:
+                    yield "plant", diagnosis_section(result, "plant")
+                
+                # Stage 3a: Knowledge base care lookup (in-memory, no I/O) while Groq may be in flight
+                if _wants_stage(fields, "kb_care"):
+                    logger.info("Stage 3: Attempting knowledge base lookup")
+                    try:
+                        kb = registry.knowledge_base
+                        kb_info = _apply_kb_care_info(result, kb)
+                    except Exception as e:
+                        logger.warning(f"Knowledge base lookup error: {str(e)}")
+                        result["kb_advice"]["error"] = str(e)
+                    if sections:
+                        yield "care", diagnosis_section(result, "care")
+            
+            # Stage 2: Disease Detection (Groq)
+            if disease_task in done or disease_task in timed_out:
+                try:
+                    if disease_task in timed_out:
+                        _apply_stage_timeout(result, "disease_info", deadline, not config.async_clients)
+                    else:
+                        disease_detection_success = _apply_disease_result(result, disease_task.result())
+                except Exception as e:
+                    logger.warning(f"Groq disease detection error: {str(e)}")
+                    result["disease_info"]["error"] = str(e)
+                if sections:
+                    yield "disease", diagnosis_section(result, "disease")
+    finally:
+        # Consumer stopped early (e.g. client disconnected): drop the remaining stages
+        for task in pending:
+            task.cancel()
+    
+    # Stage 3b: Disease-specific treatments
+    if kb_info.get("found", False) and _wants_stage(fields, "kb_treatments"):
+        kb_success = _apply_kb_treatments(result, kb)
+    
+    with trace_stage("confidence_aggregation"):
+        _finalize_diagnosis(result, kb_info, classification_success, disease_detection_success, kb_success)
+    
+    logger.info(f"Streamed safe diagnosis completed - Pipeline success: {result['pipeline_success']}")
+    yield "result", result
+
+
+async def safe_diagnose_async(base64_image: Union[str, bytes, PreparedImage], registry=None,
+                              timings: bool = False, deadline_seconds: Optional[float] = None,
+                              fields: Optional[FieldSelection] = None) -> Dict:
+    """
+    Async variant of safe_diagnose for event-loop callers.
+    
+    Uses the native async Roboflow and Groq clients so neither upstream call
+    occupies a thread, and keeps the same tiered fallbacks and result format
+    as safe_diagnose.
+    
+    Args:
+        base64_image (Union[str, bytes, PreparedImage]): Base64 encoded image data, raw image
+                                                        bytes, or an image already prepared
+                                                        by prepare_pipeline_image
+        registry (Optional[ComponentRegistry]): Shared pipeline components. If None,
+                                               uses the process-wide default registry.
+        timings (bool): Add a "timings" block with per-stage durations in milliseconds
+        deadline_seconds (Optional[float]): End-to-end time limit; None uses the
+                                            configured deadline, 0 disables it
+        fields (Optional[FieldSelection]): Sections the caller will use; stages none of
+                                          them depend on are skipped and keep their
+                                          fallback values (trim with fields.project)
+        
+    Returns:
+        Dict: Comprehensive diagnosis results with fallbacks
+    """
+    if registry is None:
+        from registry import get_default_registry
+        registry = get_default_registry()
+    
+    deadline = _diagnosis_deadline(registry, deadline_seconds)
+    with _diagnosis_trace(registry, timings) as trace:
+        async for _, result in _safe_diagnose_stages(base64_image, registry, deadline, fields, sections=False):
+            pass
+    if timings:
+        result["timings"] = trace.get_timings()
+    return result
+
+
 def main():
     """Main execution function for testing"""
     try:
@@ -638,6 +1324,8 @@ def main():
         print("- analyze_leaf_image_base64() for disease detection only")
         print("- diagnose_plant() for complete plant diagnosis pipeline")
         print("- safe_diagnose() for robust diagnosis with fallbacks")
+        print("- safe_diagnose_async() for the same pipeline on native async clients")
+        print("- safe_diagnose_stream() for progressive, per-stage results")
 
     except Exception as e:
         print(f"Error: {str(e)}")
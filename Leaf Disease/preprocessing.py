@@ -0,0 +1,147 @@
+"""
+Image Preprocessing
+===================
+
+This module normalizes an uploaded image once before it is sent upstream:
+1. Decode (JPEG uploads are decoded at reduced scale when possible)
+2. Apply EXIF orientation and drop all metadata
+3. Resize and re-encode a JPEG per consumer (Roboflow classification,
+   Groq disease detection), sharing the encoding when both targets match
+
+Both models downscale their input anyway, so sending a 10 MB phone photo only
+costs upload bytes, base64 CPU time and upstream latency.
+"""
+
+import base64
+import io
+import logging
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from tracing import trace_stage
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PreparedImage:
+    """
+    Upstream-ready encodings of one uploaded image.
+
+    Attributes:
+        classification_base64 (str): Base64 JPEG sized for Roboflow classification
+        detection_base64 (str): Base64 JPEG sized for Groq disease detection
+        original_bytes (int): Size of the uploaded image in bytes
+        original_size (Optional[Tuple[int, int]]): Decoded (width, height), None if not decoded
+        normalized (bool): False when the upload could not be decoded and is passed through
+    """
+    classification_base64: str
+    detection_base64: str
+    original_bytes: int = 0
+    original_size: Optional[Tuple[int, int]] = None
+    normalized: bool = False
+
+    @classmethod
+    def passthrough(cls, base64_image: str) -> 'PreparedImage':
+        """
+        Wrap an already encoded image without preprocessing.
+
+        Args:
+            base64_image (str): Base64 encoded image sent unchanged to both consumers
+
+        Returns:
+            PreparedImage: Image using the same encoding for both upstream calls
+        """
+        return cls(
+            classification_base64=base64_image,
+            detection_base64=base64_image,
+            original_bytes=len(base64_image) * 3 // 4
+        )
+
+
+def _encode_jpeg(image: Image.Image, max_side: int, quality: int) -> Tuple[Image.Image, str]:
+    """
+    Downscale an image to fit max_side and encode it as a metadata-free JPEG.
+
+    Args:
+        image (Image.Image): Decoded RGB image
+        max_side (int): Maximum width/height in pixels
+        quality (int): JPEG quality (1-95)
+
+    Returns:
+        Tuple[Image.Image, str]: The resized image and its base64 JPEG encoding
+    """
+    with trace_stage("image_encode"):
+        if max(image.size) > max_side:
+            image = image.copy()
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    with trace_stage("base64_encode"):
+        return image, base64.b64encode(buffer.getbuffer()).decode("ascii")
+
+
+def prepare_image(
+    image_bytes: bytes,
+    classification_max_side: int = 640,
+    detection_max_side: int = 1024,
+    jpeg_quality: int = 85
+) -> PreparedImage:
+    """
+    Decode, orient, strip and resize an image once for both upstream consumers.
+
+    Images that cannot be decoded are passed through unchanged so the upstream
+    services report the error exactly as they would without preprocessing.
+
+    Args:
+        image_bytes (bytes): Raw uploaded image bytes
+        classification_max_side (int): Longest side sent to Roboflow
+        detection_max_side (int): Longest side sent to Groq
+        jpeg_quality (int): JPEG quality for the re-encoded images
+
+    Returns:
+        PreparedImage: Per-consumer base64 encodings
+    """
+    try:
+        with trace_stage("image_decode"), Image.open(io.BytesIO(image_bytes)) as source:
+            original_size = source.size
+            # JPEG decoders can scale by 1/2, 1/4 or 1/8 while decoding
+            largest_side = max(classification_max_side, detection_max_side)
+            source.draft("RGB", (largest_side, largest_side))
+            image = ImageOps.exif_transpose(source)
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            image.load()
+    except (UnidentifiedImageError, OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning(f"Image preprocessing skipped, sending original upload: {str(e)}")
+        with trace_stage("base64_encode"):
+            return PreparedImage.passthrough(base64.b64encode(image_bytes).decode("ascii"))
+
+    # Encode the larger target first and derive the smaller one from it
+    if detection_max_side >= classification_max_side:
+        resized, detection_base64 = _encode_jpeg(image, detection_max_side, jpeg_quality)
+        if max(resized.size) <= classification_max_side:
+            classification_base64 = detection_base64
+        else:
+            _, classification_base64 = _encode_jpeg(resized, classification_max_side, jpeg_quality)
+    else:
+        resized, classification_base64 = _encode_jpeg(image, classification_max_side, jpeg_quality)
+        if max(resized.size) <= detection_max_side:
+            detection_base64 = classification_base64
+        else:
+            _, detection_base64 = _encode_jpeg(resized, detection_max_side, jpeg_quality)
+
+    logger.info(
+        f"Preprocessed image {original_size[0]}x{original_size[1]} ({len(image_bytes)} bytes) -> "
+        f"classification {len(classification_base64) * 3 // 4} bytes, "
+        f"detection {len(detection_base64) * 3 // 4} bytes"
+    )
+    return PreparedImage(
+        classification_base64=classification_base64,
+        detection_base64=detection_base64,
+        original_bytes=len(image_bytes),
+        original_size=original_size,
+        normalized=True
+    )
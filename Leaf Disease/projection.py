@@ -0,0 +1,205 @@
+"""
+Response Field Projection
+=========================
+
+This module lets clients ask for only part of a diagnosis:
+1. A request names sections ("disease_info") or single keys
+   ("kb_advice.general_care") with fields=, or picks a preset with view=
+2. The pipeline skips the stages that no selected field depends on
+3. The response is assembled from the selected keys only, so heavy lists such
+   as roboflow_predictions and common_issues are never serialized unless asked for
+
+The default "full" view returns the complete result unchanged.
+"""
+
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+# Sections of the safe_diagnose result and the keys each may contain (empty for scalars)
+DIAGNOSE_SCHEMA: Dict[str, Tuple[str, ...]] = {
+    "plant_name": (),
+    "health_status": (),
+    "classification_info": ("plant_identified", "classification_confidence", "roboflow_predictions", "error"),
+    "disease_info": ("disease_detected", "disease_name", "disease_type", "severity", "confidence",
+                     "symptoms", "possible_causes", "treatment", "error"),
+    "kb_advice": ("plant_found_in_kb", "general_care", "common_issues", "prevention_tips",
+                  "kb_confidence", "general_tips", "error"),
+    "treatments": ("disease_treatments", "kb_treatments", "combined_treatments", "note"),
+    "confidence": ("classification", "disease_detection", "overall", "calculation_method"),
+    "pipeline_success": (),
+    "deadline_exceeded": (),
+    "timestamp": (),
+    "chatbot": ()
+}
+
+# What the Streamlit client renders from /diagnose
+DIAGNOSE_VIEWS: Dict[str, Optional[Tuple[str, ...]]] = {
+    "full": None,
+    "compact": (
+        "plant_name", "health_status", "pipeline_success", "deadline_exceeded", "timestamp", "chatbot",
+        "classification_info.plant_identified", "classification_info.error",
+        "disease_info.disease_detected", "disease_info.disease_name", "disease_info.severity",
+        "disease_info.symptoms", "disease_info.error",
+        "kb_advice.general_care", "kb_advice.prevention_tips", "kb_advice.kb_confidence",
+        "kb_advice.general_tips", "kb_advice.error",
+        "treatments.combined_treatments", "treatments.note",
+        "confidence"
+    )
+}
+
+# Keys of the /plant-diagnosis result (detector output plus the plant name)
+PLANT_DIAGNOSIS_SCHEMA: Dict[str, Tuple[str, ...]] = {
+    "plant_name": (),
+    "disease_detected": (),
+    "disease_name": (),
+    "disease_type": (),
+    "severity": (),
+    "confidence": (),
+    "symptoms": (),
+    "possible_causes": (),
+    "treatment": (),
+    "analysis_timestamp": ()
+}
+
+PLANT_DIAGNOSIS_VIEWS: Dict[str, Optional[Tuple[str, ...]]] = {
+    "full": None,
+    "compact": ("plant_name", "disease_detected", "disease_name", "disease_type", "severity", "confidence",
+                "symptoms", "treatment")
+}
+
+# Keys added on request (e.g. ?timings=true) that projection never removes
+_PASSTHROUGH_KEYS = ("timings",)
+
+
+class FieldSelectionError(ValueError):
+    """Raised when fields= or view= names something the result does not have."""
+
+
+class FieldSelection:
+    """
+    The parts of a result a client asked for.
+
+    Each selected section is either whole (None) or a set of its keys.
+
+    Example:
+        >>> selection = FieldSelection.parse(DIAGNOSE_SCHEMA, DIAGNOSE_VIEWS, fields="plant_name,disease_info.severity")
+        >>> selection.wants("kb_advice")
+        False
+        >>> selection.project(result)
+        {'plant_name': 'Tomato', 'disease_info': {'severity': 'mild'}}
+    """
+
+    def __init__(self, sections: Optional[Dict[str, Optional[FrozenSet[str]]]] = None):
+        """
+        Initialize a selection.
+
+        Args:
+            sections (Optional[Dict[str, Optional[FrozenSet[str]]]]): Section name to selected
+                                                                      keys (None for the whole
+                                                                      section); None selects everything
+        """
+        self.sections = sections
+
+    @classmethod
+    def parse(cls, schema: Dict[str, Tuple[str, ...]], views: Dict[str, Optional[Tuple[str, ...]]],
+              fields: Optional[str] = None, view: Optional[str] = None) -> 'FieldSelection':
+        """
+        Build a selection from the fields= and view= query parameters.
+
+        Args:
+            schema (Dict[str, Tuple[str, ...]]): Sections of the result and their keys
+            views (Dict[str, Optional[Tuple[str, ...]]]): Named presets (None for everything)
+            fields (Optional[str]): Comma-separated section or section.key names
+            view (Optional[str]): Preset name; "full" when neither parameter is given
+
+        Returns:
+            FieldSelection: The requested selection
+
+        Raises:
+            FieldSelectionError: If both parameters are given or a name is unknown
+        """
+        if fields and view:
+            raise FieldSelectionError("Use either fields or view, not both")
+        if not fields:
+            view = view or "full"
+            if view not in views:
+                raise FieldSelectionError(f"Unknown view '{view}' (expected one of: {', '.join(views)})")
+            paths = views[view]
+            return cls() if paths is None else cls._from_paths(schema, paths)
+        return cls._from_paths(schema, [path.strip() for path in fields.split(",") if path.strip()])
+
+    @classmethod
+    def _from_paths(cls, schema: Dict[str, Tuple[str, ...]], paths: Iterable[str]) -> 'FieldSelection':
+        """Group section and section.key paths by section, validating them against the schema."""
+        sections: Dict[str, Optional[set]] = {}
+        for path in paths:
+            section, _, key = path.partition(".")
+            if section not in schema:
+                raise FieldSelectionError(f"Unknown field '{path}'")
+            if not key:
+                sections[section] = None
+                continue
+            if key not in schema[section]:
+                raise FieldSelectionError(f"Unknown field '{path}'")
+            if section not in sections:
+                sections[section] = set()
+            if sections[section] is not None:
+                sections[section].add(key)
+        if not sections:
+            raise FieldSelectionError("fields must name at least one field")
+        return cls({
+            section: None if keys is None else frozenset(keys)
+            for section, keys in sections.items()
+        })
+
+    @property
+    def is_full(self) -> bool:
+        """Whether everything is selected."""
+        return self.sections is None
+
+    @property
+    def key(self) -> str:
+        """Canonical form of the selection, used in result cache keys."""
+        if self.sections is None:
+            return "full"
+        return ",".join(
+            section if keys is None else ",".join(f"{section}.{key}" for key in sorted(keys))
+            for section, keys in sorted(self.sections.items())
+        )
+
+    def wants(self, *sections: str) -> bool:
+        """
+        Check whether any of the given sections is at least partly selected.
+
+        Args:
+            *sections (str): Section names
+
+        Returns:
+            bool: True if the result must include one of them
+        """
+        return self.sections is None or any(section in self.sections for section in sections)
+
+    def project(self, result: Dict) -> Dict:
+        """
+        Build a response holding only the selected parts of a result.
+
+        Args:
+            result (Dict): Complete (or stage-skipped) result
+
+        Returns:
+            Dict: The result itself for a full selection, otherwise a new dict
+                  sharing the selected values with the result
+        """
+        if self.sections is None:
+            return result
+        projected = {}
+        for section, keys in self.sections.items():
+            if section not in result:
+                continue
+            value = result[section]
+            if keys is not None and isinstance(value, dict):
+                value = {key: value[key] for key in value if key in keys}
+            projected[section] = value
+        for key in _PASSTHROUGH_KEYS:
+            if key in result:
+                projected[key] = result[key]
+        return projected
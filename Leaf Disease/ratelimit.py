@@ -0,0 +1,330 @@
+"""
+Groq Request and Token Budget Scheduler
+=======================================
+
+This module keeps Groq calls within the account's per-minute limits instead
+of tripping them and paying for 429 retries:
+1. Every call reserves one request and an estimated token count in a sliding
+   one-minute window before it is sent
+2. Calls that do not fit wait in a single FIFO queue shared by sync and async
+   callers, so no caller can starve another
+3. Once a call completes, its reservation is settled to the actual
+   completion.usage token count, and the estimate follows observed usage
+
+One scheduler is shared by the process through the registry's disease detector.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Provider limits are per minute
+WINDOW_SECONDS = 60.0
+
+# Initial per-call token estimate (image + prompt + completion) until usage is observed
+DEFAULT_ESTIMATED_TOKENS = 2500
+
+# Weight of each observed call in the running token estimate
+ESTIMATE_SMOOTHING = 0.2
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a call cannot be admitted within its time budget."""
+
+    # Classified apart from upstream timeouts, so a full local queue neither
+    # counts against the circuit breaker nor is retried
+    error_type = "queue_timeout"
+
+
+class Reservation:
+    """
+    One admitted call's share of the request and token budget.
+
+    Attributes:
+        tokens (int): Tokens currently counted for the call (estimate until settled)
+        waited (float): Seconds the call spent queued before admission
+        settled (bool): Whether the reservation was settled or cancelled
+    """
+
+    def __init__(self, entry: List[float], waited: float):
+        self._entry = entry
+        self.tokens = int(entry[1])
+        self.waited = waited
+        self.settled = False
+
+    def remaining(self, timeout: Optional[float]) -> Optional[float]:
+        """
+        Get what is left of a time budget after queueing.
+
+        Args:
+            timeout (Optional[float]): Budget in seconds the call was queued under
+
+        Returns:
+            Optional[float]: Remaining seconds (never negative), or None if unbounded
+        """
+        if timeout is None:
+            return None
+        return max(0.0, timeout - self.waited)
+
+
+class _Waiter:
+    """A queued call, woken by the thread or event loop that admits it."""
+
+    __slots__ = ("tokens", "enqueued_at", "reservation", "event", "loop", "future")
+
+    def __init__(self, tokens: int, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+        self.reservation: Optional[Reservation] = None
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+        self.event = threading.Event() if loop is None else None
+
+    def grant(self, reservation: Reservation) -> None:
+        self.reservation = reservation
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future, reservation)
+
+
+def _resolve(future: asyncio.Future, reservation: Reservation) -> None:
+    """Complete an async waiter's future unless it was abandoned."""
+    if not future.done():
+        future.set_result(reservation)
+
+
+class TokenBudgetScheduler:
+    """
+    Fair FIFO admission of calls within requests-per-minute and tokens-per-minute budgets.
+
+    A limit of 0 disables that dimension. A single call estimated above the
+    whole token budget is admitted once the window is otherwise empty.
+
+    Example:
+        >>> scheduler = TokenBudgetScheduler(requests_per_minute=30, tokens_per_minute=30000)
+        >>> reservation = scheduler.acquire(timeout=7.0)
+        >>> completion = client.chat.completions.create(..., timeout=reservation.remaining(7.0))
+        >>> scheduler.settle(reservation, completion.usage)
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0,
+                 estimated_tokens: int = DEFAULT_ESTIMATED_TOKENS):
+        """
+        Initialize an empty window.
+
+        Args:
+            requests_per_minute (int): Calls admitted per sliding minute (0 for unlimited)
+            tokens_per_minute (int): Prompt plus completion tokens per sliding minute (0 for unlimited)
+            estimated_tokens (int): Token reservation per call until usage has been observed
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.estimated_tokens = float(estimated_tokens)
+        self.admitted = 0
+        self.timed_out = 0
+        self._window: Deque[List[float]] = deque()  # [admitted_at, tokens]
+        self._window_tokens = 0.0
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._timer_due = 0.0
+
+    def acquire(self, timeout: Optional[float] = None) -> Reservation:
+        """
+        Wait for a slot in the budget, blocking the calling thread.
+
+        Args:
+            timeout (Optional[float]): Longest wait in seconds (None waits indefinitely)
+
+        Returns:
+            Reservation: The admitted call's reservation
+
+        Raises:
+            RateLimitTimeout: If the call was not admitted within timeout
+        """
+        waiter = _Waiter(self._estimate())
+        with self._lock:
+            self._waiters.append(waiter)
+            self._dispatch()
+        if not waiter.event.wait(timeout):
+            with self._lock:
+                if waiter.reservation is None:
+                    self._abandon(waiter)
+                    raise RateLimitTimeout(self._timeout_message(timeout))
+        return waiter.reservation
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> Reservation:
+        """
+        Wait for a slot in the budget without blocking the event loop.
+
+        Args:
+            timeout (Optional[float]): Longest wait in seconds (None waits indefinitely)
+
+        Returns:
+            Reservation: The admitted call's reservation
+
+        Raises:
+            RateLimitTimeout: If the call was not admitted within timeout
+        """
+        waiter = _Waiter(self._estimate(), asyncio.get_running_loop())
+        with self._lock:
+            self._waiters.append(waiter)
+            self._dispatch()
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                if waiter.reservation is None:
+                    self._abandon(waiter)
+                else:
+                    # Admitted while being cancelled: the call is never sent
+                    self._release(waiter.reservation)
+            if isinstance(e, asyncio.TimeoutError):
+                raise RateLimitTimeout(self._timeout_message(timeout))
+            raise
+
+    def settle(self, reservation: Reservation, usage: Any = None) -> None:
+        """
+        Replace a reservation's estimate with the call's actual token usage.
+
+        Args:
+            reservation (Reservation): Reservation returned by acquire
+            usage (Any): completion.usage (with total_tokens, or prompt_tokens and
+                         completion_tokens); None keeps the estimate, e.g. for failed calls
+        """
+        tokens = _usage_tokens(usage)
+        with self._lock:
+            if reservation.settled:
+                return
+            reservation.settled = True
+            if tokens is None:
+                return
+            self.estimated_tokens += ESTIMATE_SMOOTHING * (tokens - self.estimated_tokens)
+            self._window_tokens += tokens - reservation._entry[1]
+            reservation._entry[1] = tokens
+            reservation.tokens = tokens
+            self._dispatch()
+
+    def _estimate(self) -> int:
+        """Current per-call token reservation."""
+        return max(1, int(round(self.estimated_tokens)))
+
+    def _timeout_message(self, timeout: Optional[float]) -> str:
+        return (
+            f"Groq request budget ({self.requests_per_minute} RPM, {self.tokens_per_minute} TPM) "
+            f"had no capacity within {timeout:.1f}s"
+        )
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        """Drop a queued waiter that gave up (lock held)."""
+        self.timed_out += 1
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        self._dispatch()
+
+    def _release(self, reservation: Reservation) -> None:
+        """Return an admitted but unsent call's budget (lock held)."""
+        reservation.settled = True
+        try:
+            self._window.remove(reservation._entry)
+            self._window_tokens -= reservation._entry[1]
+        except ValueError:
+            pass
+        self._dispatch()
+
+    def _expire(self, now: float) -> None:
+        """Drop window entries older than a minute (lock held)."""
+        cutoff = now - WINDOW_SECONDS
+        while self._window and self._window[0][0] <= cutoff:
+            self._window_tokens -= self._window.popleft()[1]
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        """Seconds until a call of the given size fits the budget (lock held)."""
+        wait = 0.0
+        if self.requests_per_minute and len(self._window) >= self.requests_per_minute:
+            oldest_needed = self._window[len(self._window) - self.requests_per_minute]
+            wait = oldest_needed[0] + WINDOW_SECONDS - now
+        if self.tokens_per_minute:
+            excess = self._window_tokens + min(tokens, self.tokens_per_minute) - self.tokens_per_minute
+            for admitted_at, entry_tokens in self._window:
+                if excess <= 0:
+                    break
+                excess -= entry_tokens
+                wait = max(wait, admitted_at + WINDOW_SECONDS - now)
+        return max(0.0, wait)
+
+    def _dispatch(self) -> None:
+        """Admit queued calls in order while they fit; otherwise wake up when they will (lock held)."""
+        now = time.monotonic()
+        self._expire(now)
+        while self._waiters:
+            waiter = self._waiters[0]
+            wait = self._wait_time(waiter.tokens, now)
+            if wait > 0:
+                self._schedule(now + wait)
+                return
+            self._waiters.popleft()
+            entry = [now, float(waiter.tokens)]
+            self._window.append(entry)
+            self._window_tokens += waiter.tokens
+            self.admitted += 1
+            waiter.grant(Reservation(entry, now - waiter.enqueued_at))
+
+    def _schedule(self, due: float) -> None:
+        """Re-run dispatch at the given monotonic time (lock held)."""
+        if self._timer is not None and self._timer.is_alive() and self._timer_due <= due:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(max(0.0, due - time.monotonic()), self._on_timer)
+        self._timer.daemon = True
+        self._timer_due = due
+        self._timer.start()
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get budget usage.
+
+        Returns:
+            Dict[str, Any]: Limits, requests and tokens in the current window,
+                            queue length, token estimate and admission counters
+        """
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "window_requests": len(self._window),
+                "window_tokens": int(self._window_tokens),
+                "queued": len(self._waiters),
+                "estimated_tokens_per_request": self._estimate(),
+                "admitted": self.admitted,
+                "timed_out": self.timed_out
+            }
+
+
+def _usage_tokens(usage: Any) -> Optional[int]:
+    """Total tokens of a completion.usage object, or None if unavailable."""
+    if usage is None:
+        return None
+    total = getattr(usage, "total_tokens", None)
+    if total is None:
+        prompt = getattr(usage, "prompt_tokens", None)
+        completion = getattr(usage, "completion_tokens", None)
+        if prompt is None or completion is None:
+            return None
+        total = prompt + completion
+    return int(total)
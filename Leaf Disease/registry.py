@@ -0,0 +1,355 @@
+"""
+Pipeline Component Registry
+===========================
+
+This module owns the process-lifetime components of the diagnosis pipeline:
+1. Roboflow inference client (plant classification)
+2. Groq leaf disease detector (disease detection)
+3. Plant knowledge base (care advice), with the classifier labels pre-resolved
+4. Stage executor running the independent upstream calls concurrently
+5. Blocking executor for synchronous work offloaded from async endpoints
+6. Content-addressed diagnosis result cache
+7. Single-flight coalescer for identical in-flight diagnoses
+8. Background job queue for asynchronous diagnoses
+9. Span exporter for per-stage diagnosis traces (optional)
+10. Upstream guards (circuit breaker, retries, hedging) owned by the two upstream clients
+11. Groq RPM/TPM scheduler owned by the disease detector (optional)
+12. Admission controller shedding diagnosis requests under overload (optional)
+
+Components are built once, shared between requests and guarded by a lock so
+concurrent requests never construct duplicates.
+"""
+
+import logging
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import PipelineConfig
+
+logger = logging.getLogger(__name__)
+
+# Roboflow model settings shared by every pipeline entry point
+ROBOFLOW_WORKSPACE = "laiba-masood-tyq7q"
+ROBOFLOW_MODEL_ID = "identify-plant-zvd1y/1"
+ROBOFLOW_MIN_CONFIDENCE = 0.7
+ROBOFLOW_CONFIDENCE_METHOD = "adaptive"
+
+
+class ComponentRegistry:
+    """
+    Thread-safe registry of shared pipeline components.
+
+    Each component is constructed lazily on first access and then reused for
+    the lifetime of the registry. A component whose construction fails (for
+    example because an API key is missing) is not cached, so the next access
+    retries and the caller sees the original error.
+
+    Example:
+        >>> registry = ComponentRegistry()
+        >>> registry.warm_up()
+        >>> kb = registry.knowledge_base
+    """
+
+    def __init__(self, config: Optional[PipelineConfig] = None, kb_file_path: Optional[str] = None):
+        """
+        Initialize an empty registry.
+
+        Args:
+            config (Optional[PipelineConfig]): Pipeline settings. If None, loads
+                                             them from environment variables.
+            kb_file_path (Optional[str]): Path to the knowledge base JSON file.
+                                        If None, uses the knowledge base default.
+        """
+        self.config = config or PipelineConfig.from_env()
+        self.kb_file_path = kb_file_path
+        self._components: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name: str, factory: Callable[[], Any]) -> Any:
+        """
+        Return the named component, building it under the lock if needed.
+
+        Args:
+            name (str): Component name used as the cache key
+            factory (Callable[[], Any]): Zero-argument constructor for the component
+
+        Returns:
+            Any: The shared component instance
+        """
+        component = self._components.get(name)
+        if component is not None:
+            return component
+
+        with self._lock:
+            component = self._components.get(name)
+            if component is None:
+                component = factory()
+                self._components[name] = component
+                logger.info(f"Registry component initialized: {name}")
+            return component
+
+    @property
+    def roboflow_client(self):
+        """Shared RoboflowInferenceClient for plant classification."""
+        def factory():
+            from inference import RoboflowInferenceClient
+            return RoboflowInferenceClient(
+                workspace_name=ROBOFLOW_WORKSPACE,
+                model_id=ROBOFLOW_MODEL_ID,
+                min_confidence=ROBOFLOW_MIN_CONFIDENCE,
+                confidence_method=ROBOFLOW_CONFIDENCE_METHOD,
+                upstream_guard=self._new_upstream_guard("roboflow")
+            )
+        return self._get_or_create("roboflow_client", factory)
+
+    @property
+    def disease_detector(self):
+        """Shared LeafDiseaseDetector for Groq disease detection."""
+        def factory():
+            from main import LeafDiseaseDetector
+            return LeafDiseaseDetector(
+                upstream_guard=self._new_upstream_guard("groq"),
+                scheduler=self._new_groq_scheduler()
+            )
+        return self._get_or_create("disease_detector", factory)
+
+    @property
+    def knowledge_base(self):
+        """Shared PlantKnowledgeBase, loaded from its snapshot (or parsed from JSON) once."""
+        def factory():
+            from kb_utils import PlantKnowledgeBase
+            kb = PlantKnowledgeBase(
+                self.kb_file_path,
+                resolution_cache_size=self.config.kb_resolution_cache_size,
+                advice_cache_size=self.config.kb_advice_cache_size,
+                use_snapshot=self.config.kb_snapshot
+            )
+            if self.config.classifier_classes:
+                kb.prewarm(self.config.classifier_classes)
+            return kb
+        return self._get_or_create("knowledge_base", factory)
+
+    @property
+    def stage_executor(self) -> ThreadPoolExecutor:
+        """Shared thread pool for running pipeline stages concurrently."""
+        def factory():
+            return ThreadPoolExecutor(
+                max_workers=self.config.stage_workers,
+                thread_name_prefix="pipeline-stage"
+            )
+        return self._get_or_create("stage_executor", factory)
+
+    @property
+    def blocking_executor(self) -> ThreadPoolExecutor:
+        """Bounded thread pool for blocking calls made from async endpoints."""
+        def factory():
+            return ThreadPoolExecutor(
+                max_workers=self.config.blocking_workers,
+                thread_name_prefix="pipeline-blocking"
+            )
+        return self._get_or_create("blocking_executor", factory)
+
+    @property
+    def diagnosis_cache(self):
+        """Shared LRU/TTL cache of diagnosis results keyed by image content."""
+        def factory():
+            from cache import DiagnosisCache
+            return DiagnosisCache(
+                max_entries=self.config.cache_max_entries,
+                ttl_seconds=self.config.cache_ttl_seconds
+            )
+        return self._get_or_create("diagnosis_cache", factory)
+
+    @property
+    def single_flight(self):
+        """Shared coalescer so identical in-flight diagnoses run only once."""
+        def factory():
+            from singleflight import SingleFlight
+            return SingleFlight()
+        return self._get_or_create("single_flight", factory)
+
+    @property
+    def job_queue(self):
+        """Shared queue of background diagnosis jobs (started by the API lifespan hook)."""
+        def factory():
+            from jobs import JobQueue
+            return JobQueue(
+                workers=self.config.job_workers,
+                max_queued=self.config.job_queue_size,
+                ttl_seconds=self.config.job_ttl_seconds
+            )
+        return self._get_or_create("job_queue", factory)
+
+    @property
+    def span_exporter(self):
+        """Shared JSON Lines span exporter, or None when no trace file is configured."""
+        if not self.config.trace_file:
+            return None
+        def factory():
+            from tracing import JsonlSpanExporter
+            return JsonlSpanExporter(self.config.trace_file)
+        return self._get_or_create("span_exporter", factory)
+
+    @property
+    def admission(self):
+        """Shared admission controller, or None when admission control is disabled."""
+        if self.config.admission_max_in_flight <= 0:
+            return None
+        def factory():
+            from admission import AdmissionController
+            return AdmissionController(
+                max_in_flight=self.config.admission_max_in_flight,
+                max_queued=self.config.admission_max_queued,
+                queue_timeout=self.config.admission_queue_timeout_seconds or None
+            )
+        return self._get_or_create("admission", factory)
+
+    def _new_upstream_guard(self, name: str):
+        """Build the circuit breaker, retry and hedging guard for an upstream client."""
+        from resilience import RetryPolicy, UpstreamGuard
+        return UpstreamGuard(
+            name,
+            failure_threshold=self.config.circuit_failure_threshold,
+            reset_seconds=self.config.circuit_reset_seconds,
+            hedge=self.config.hedge_requests,
+            retry_policy=RetryPolicy(
+                max_retries=self.config.upstream_max_retries,
+                base_delay=self.config.retry_base_delay_seconds,
+                max_delay=self.config.retry_max_delay_seconds
+            )
+        )
+
+    def _new_groq_scheduler(self):
+        """Build the Groq RPM/TPM scheduler, or None when no budget is configured."""
+        if not (self.config.groq_requests_per_minute or self.config.groq_tokens_per_minute):
+            return None
+        from ratelimit import TokenBudgetScheduler
+        return TokenBudgetScheduler(
+            requests_per_minute=self.config.groq_requests_per_minute,
+            tokens_per_minute=self.config.groq_tokens_per_minute
+        )
+
+    def cache_key(self, image_bytes: bytes, namespace: str) -> str:
+        """
+        Build the diagnosis cache key for an image.
+
+        Args:
+            image_bytes (bytes): Raw uploaded image bytes
+            namespace (str): Result shape being cached (e.g. "diagnose")
+
+        Returns:
+            str: Key covering image content, model IDs and prompt version
+        """
+        from main import LeafDiseaseDetector
+        return self.diagnosis_cache.make_key(
+            image_bytes,
+            namespace,
+            ROBOFLOW_MODEL_ID,
+            LeafDiseaseDetector.MODEL_NAME,
+            LeafDiseaseDetector.PROMPT_VERSION
+        )
+
+    def warm_up(self) -> Dict[str, bool]:
+        """
+        Eagerly build every component so the first request does not pay for it.
+
+        Construction errors are logged rather than raised; the affected
+        component is retried on first use and its pipeline stage falls back.
+
+        Returns:
+            Dict[str, bool]: Whether each component is ready
+        """
+        status = {}
+        for name in ("knowledge_base", "roboflow_client", "disease_detector"):
+            try:
+                getattr(self, name)
+                status[name] = True
+            except Exception as e:
+                logger.warning(f"Registry component '{name}' unavailable at startup: {str(e)}")
+                status[name] = False
+        return status
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get the initialization status of all registry components.
+
+        Returns:
+            Dict[str, Any]: Component name to initialization status
+        """
+        return {
+            name: name in self._components
+            for name in ("knowledge_base", "roboflow_client", "disease_detector")
+        }
+
+    def get_upstream_status(self) -> Dict[str, Any]:
+        """
+        Get circuit breaker, latency, hedging, retry and quota state of the upstream clients.
+
+        Returns:
+            Dict[str, Any]: Upstream name to guard status (only for clients built so far)
+        """
+        status = {}
+        for upstream, name in (("roboflow", "roboflow_client"), ("groq", "disease_detector")):
+            client = self._components.get(name)
+            if client is not None:
+                status[upstream] = client.upstream.get_status()
+                scheduler = getattr(client, "scheduler", None)
+                if scheduler is not None:
+                    status[upstream]["scheduler"] = scheduler.get_stats()
+        return status
+
+    def close(self) -> None:
+        """Release all components; later accesses rebuild them."""
+        with self._lock:
+            components = dict(self._components)
+            self._components.clear()
+        for name in ("stage_executor", "blocking_executor"):
+            executor = components.get(name)
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        roboflow_client = components.get("roboflow_client")
+        if roboflow_client is not None:
+            roboflow_client.close()
+        span_exporter = components.get("span_exporter")
+        if span_exporter is not None:
+            span_exporter.close()
+        logger.info("Component registry closed")
+
+    async def aclose(self) -> None:
+        """Stop background jobs, close the async upstream HTTP clients, then release all components."""
+        job_queue = self._components.get("job_queue")
+        if job_queue is not None:
+            await job_queue.stop()
+        for name in ("roboflow_client", "disease_detector"):
+            component = self._components.get(name)
+            if component is not None:
+                try:
+                    await component.aclose()
+                except Exception as e:
+                    logger.warning(f"Failed to close {name}: {str(e)}")
+        self.close()
+
+
+_default_registry: Optional[ComponentRegistry] = None
+_default_registry_lock = threading.Lock()
+
+
+def get_default_registry() -> ComponentRegistry:
+    """
+    Get the process-wide registry used when no registry is passed explicitly.
+
+    Returns:
+        ComponentRegistry: The shared default registry
+    """
+    global _default_registry
+    if _default_registry is None:
+        with _default_registry_lock:
+            if _default_registry is None:
+                _default_registry = ComponentRegistry()
+    return _default_registry
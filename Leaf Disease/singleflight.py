@@ -0,0 +1,83 @@
+"""
+Single-Flight Request Coalescing
+================================
+
+This module deduplicates identical diagnoses that are in flight at the same
+time. When the same image arrives several times within a few seconds (client
+retries, the Streamlit local-then-cloud fallback), only the first request
+calls Roboflow and Groq; the others wait for and share its result.
+"""
+
+import asyncio
+import copy
+import logging
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent async calls that share a key into one execution.
+
+    Must be used from a single event loop. The shared execution is shielded,
+    so a leader whose request is cancelled (client disconnect) does not cancel
+    the work the other waiters depend on.
+
+    Example:
+        >>> flights = SingleFlight()
+        >>> result, coalesced = await flights.run(cache_key, lambda: safe_diagnose_async(b64))
+    """
+
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run func for key, or join the identical call already in flight.
+
+        Args:
+            key (str): Identity of the call (e.g. image content hash + models)
+            func (Callable[[], Awaitable[Any]]): Coroutine factory doing the work
+
+        Returns:
+            Tuple[Any, bool]: The result and whether it was shared from another call.
+                              Every caller gets its own deep copy and may mutate it.
+        """
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            logger.info("Joining identical diagnosis already in flight")
+            result = await asyncio.shield(future)
+            return copy.deepcopy(result), True
+
+        future = asyncio.ensure_future(func())
+        self._in_flight[key] = future
+        self.executed += 1
+        future.add_done_callback(lambda _: self._forget(key, future))
+        result = await asyncio.shield(future)
+        return copy.deepcopy(result), False
+
+    def _forget(self, key: str, future: asyncio.Future) -> None:
+        """Remove a finished call so later requests start a fresh execution."""
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        # Retrieve the exception so an abandoned failing call is not reported as unhandled
+        if not future.cancelled():
+            future.exception()
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get coalescing statistics.
+
+        Returns:
+            Dict[str, int]: Executions started, requests coalesced and calls in flight
+        """
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight)
+        }
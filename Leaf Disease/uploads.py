@@ -0,0 +1,109 @@
+"""
+Upload Ingestion
+================
+
+This module reads uploaded images in bounded chunks instead of buffering the
+whole upload first:
+1. Reject uploads whose declared size already exceeds the byte cap
+2. Sniff the first chunk's magic bytes and reject non-image payloads
+3. Stream the rest, aborting as soon as the byte cap is exceeded
+
+The client-supplied content type is never trusted on its own, and at most
+max_bytes of an upload are ever held in memory.
+"""
+
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Bytes read per chunk; the first chunk must cover every signature below
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# ISO base media file brands used by HEIC/HEIF/AVIF phone photos
+_FTYP_IMAGE_BRANDS = (b"heic", b"heix", b"hevc", b"heim", b"heis", b"mif1", b"msf1", b"avif")
+
+
+class UploadRejected(Exception):
+    """
+    Raised when an upload is refused before being fully buffered.
+
+    Attributes:
+        status_code (int): HTTP status for the rejection (400 or 413)
+        detail (str): Client-facing reason
+    """
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """
+    Identify an image format from its leading magic bytes.
+
+    Args:
+        header (bytes): First bytes of the upload (at least 16 for all formats)
+
+    Returns:
+        Optional[str]: Format name ("jpeg", "png", "gif", "webp", "bmp", "tiff",
+                       "heif"), or None if the bytes are not a known image
+    """
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if header.startswith(b"RIFF") and header[8:12] == b"WEBP":
+        return "webp"
+    if header.startswith(b"BM"):
+        return "bmp"
+    if header.startswith((b"II*\x00", b"MM\x00*")):
+        return "tiff"
+    if header[4:8] == b"ftyp" and header[8:12] in _FTYP_IMAGE_BRANDS:
+        return "heif"
+    return None
+
+
+async def read_image_upload(file, max_bytes: int, chunk_size: int = UPLOAD_CHUNK_SIZE) -> bytes:
+    """
+    Read an uploaded image in chunks, enforcing a byte cap and an image header.
+
+    Args:
+        file: FastAPI/Starlette UploadFile (anything with async read(size))
+        max_bytes (int): Maximum accepted upload size in bytes
+        chunk_size (int): Bytes read per chunk
+
+    Returns:
+        bytes: The complete upload
+
+    Raises:
+        UploadRejected: 413 if the upload exceeds max_bytes, 400 if it is empty
+                        or does not start with a known image signature
+    """
+    declared_size = getattr(file, "size", None)
+    if declared_size is not None and declared_size > max_bytes:
+        raise UploadRejected(413, f"Image too large: {declared_size} bytes (maximum {max_bytes})")
+
+    first_chunk = await file.read(chunk_size)
+    if not first_chunk:
+        raise UploadRejected(400, "Uploaded image is empty")
+    image_type = sniff_image_type(first_chunk)
+    if image_type is None:
+        logger.warning(f"Rejected upload '{getattr(file, 'filename', None)}': not a recognized image format")
+        raise UploadRejected(400, "File must be an image")
+
+    chunks = [first_chunk]
+    total = len(first_chunk)
+    while True:
+        if total > max_bytes:
+            raise UploadRejected(413, f"Image too large: more than {max_bytes} bytes")
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        total += len(chunk)
+
+    return first_chunk if len(chunks) == 1 else b"".join(chunks)
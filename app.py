@@ -1,11 +1,16 @@
-from fastapi import FastAPI, Request, HTTPException, UploadFile, File
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, HTTPException, UploadFile, File, Depends
+from fastapi.responses import Response, StreamingResponse
+from contextlib import asynccontextmanager
+import asyncio
+import functools
 import logging
 import os
 import sys
+import time
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
-from utils import convert_image_to_base64_and_test, test_with_base64_data
+from utils import test_with_base64_data
 
 # Load environment variables from .env file
 load_dotenv()
@@ -13,67 +18,341 @@ load_dotenv()
 # Add Leaf Disease directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent / "Leaf Disease"))
 
+from registry import ComponentRegistry
+from uploads import UploadRejected, read_image_upload
+from jobs import JobQueueFull
+from admission import AdmissionRejected
+from response_encoding import CompressionMiddleware, OrjsonResponse, dumps_json
+from projection import (DIAGNOSE_SCHEMA, DIAGNOSE_VIEWS, PLANT_DIAGNOSIS_SCHEMA, PLANT_DIAGNOSIS_VIEWS,
+                        FieldSelection, FieldSelectionError)
+from metrics import REQUEST_DURATION, REQUESTS_IN_FLIGHT, REQUESTS_TOTAL, UPLOAD_BYTES
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Plant Doctor API", version="2.0.0", description="Complete plant diagnosis system with classification, disease detection, and care recommendations")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the shared pipeline components once per process and release them on shutdown."""
+    registry = ComponentRegistry()
+    status = registry.warm_up()
+    logger.info(f"Pipeline components ready: {status}")
+    registry.job_queue.start(functools.partial(run_job_diagnosis, registry))
+    app.state.registry = registry
+    try:
+        yield
+    finally:
+        await registry.aclose()
+
+
+def get_registry(request: Request) -> ComponentRegistry:
+    """Dependency returning the process-lifetime component registry."""
+    return request.app.state.registry
+
+
+async def read_upload(registry: ComponentRegistry, file: UploadFile) -> bytes:
+    """Stream an upload into memory, rejecting oversized or non-image payloads before fully buffering them."""
+    try:
+        contents = await read_image_upload(file, registry.config.max_upload_bytes)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    UPLOAD_BYTES.observe(len(contents))
+    return contents
+
+
+async def run_blocking(registry: ComponentRegistry, func, *args):
+    """Run a blocking call on the registry's bounded executor without stalling the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(registry.blocking_executor, functools.partial(func, *args))
+
+
+def is_cacheable_diagnosis(result: Dict) -> bool:
+    """Only cache diagnoses where both upstream stages answered, so transient failures are retried."""
+    return (
+        result.get("pipeline_success", False)
+        and not result["classification_info"].get("error")
+        and not result["disease_info"].get("error")
+    )
+
+
+def parse_fields(schema: Dict, views: Dict, fields: Optional[str], view: Optional[str]) -> FieldSelection:
+    """Parse the fields= / view= query parameters, answering 400 for unknown names."""
+    try:
+        return FieldSelection.parse(schema, views, fields, view)
+    except FieldSelectionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def run_safe_diagnose(
+    registry: ComponentRegistry,
+    contents: bytes,
+    timings: bool = False,
+    fields: Optional[FieldSelection] = None
+) -> Tuple[Dict, str]:
+    """
+    Run the safe diagnosis pipeline on raw image bytes without blocking the event loop.
+    
+    Repeat uploads of the same image are answered from the result cache, and
+    identical uploads arriving while a diagnosis is in flight share it.
+    Requests for per-stage timings bypass both, so every stage of this request
+    is measured. A field selection skips the stages it does not need; results
+    of such reduced runs are cached apart from complete ones, and a cached
+    complete result answers them too. The result is not projected. Returns the
+    diagnosis result and its cache status: "HIT", "MISS", "COALESCED" or "BYPASS".
+    """
+    from main import selected_stages
+    
+    async def diagnose(timings: bool = False):
+        # Import and use the safe diagnosis pipeline with fallbacks;
+        # both variants decode and downsize the image once for both upstream calls
+        from main import safe_diagnose, safe_diagnose_async
+        
+        if registry.config.async_clients:
+            return await safe_diagnose_async(contents, registry, timings, fields=fields)
+        return await run_blocking(registry, functools.partial(safe_diagnose, fields=fields), contents, registry, timings)
+    
+    if timings:
+        return await diagnose(timings=True), "BYPASS"
+    
+    cache = registry.diagnosis_cache
+    cache_key = registry.cache_key(contents, "diagnose")
+    cached = cache.get(cache_key)
+    stages = selected_stages(fields)
+    if cached is None and stages != selected_stages(None):
+        cache_key = registry.cache_key(contents, "diagnose:" + "+".join(stages))
+        cached = cache.get(cache_key)
+    if cached is not None:
+        logger.info("Diagnosis served from cache")
+        return cached, "HIT"
+    
+    async def diagnose_and_cache():
+        result = await diagnose()
+        if is_cacheable_diagnosis(result):
+            cache.set(cache_key, result)
+        return result
+    
+    result, coalesced = await registry.single_flight.run(cache_key, diagnose_and_cache)
+    return result, "COALESCED" if coalesced else "MISS"
+
+
+async def run_job_diagnosis(registry: ComponentRegistry, contents: bytes) -> Dict:
+    """Job queue handler: run the safe diagnosis pipeline for a queued upload."""
+    result, _ = await run_safe_diagnose(registry, contents)
+    return result
+
+
+async def run_plant_diagnosis(
+    registry: ComponentRegistry,
+    contents: bytes,
+    fields: Optional[FieldSelection] = None
+) -> Tuple[Optional[Dict], str]:
+    """
+    Run disease detection with plant classification on raw image bytes.
+    
+    Uses the same cache and single-flight coalescing as run_safe_diagnose.
+    A field selection without plant_name skips classification, and one with
+    only plant_name skips detection. Returns the detection result (None if
+    detection failed) and its cache status.
+    """
+    classify = fields is None or fields.wants("plant_name")
+    detect_fields = [name for name in PLANT_DIAGNOSIS_SCHEMA if name != "plant_name"]
+    detect = fields is None or fields.wants(*detect_fields)
+    
+    cache = registry.diagnosis_cache
+    cache_key = registry.cache_key(contents, "plant-diagnosis")
+    cached = cache.get(cache_key)
+    if cached is None and not (classify and detect):
+        cache_key = registry.cache_key(contents, "plant-diagnosis:" + ("classify" if classify else "detect"))
+        cached = cache.get(cache_key)
+    if cached is not None:
+        logger.info("Disease detection served from cache")
+        return cached, "HIT"
+    
+    async def skipped():
+        return None
+    
+    async def diagnose():
+        from main import prepare_pipeline_image
+        
+        # Decode and downsize once for both upstream calls
+        image = await run_blocking(registry, prepare_pipeline_image, contents, registry)
+        
+        # Classify the plant and detect diseases concurrently, skipping the call no selected field needs
+        plant_name, result = await asyncio.gather(
+            classify_plant_name(registry, image.classification_base64) if classify else skipped(),
+            detect_disease(registry, image.detection_base64) if detect else skipped()
+        )
+        if not detect:
+            result = {}
+        elif result is None:
+            return None
+        
+        # Add plant classification info to the result
+        if classify:
+            result["plant_name"] = plant_name
+        
+        # Cache only when every upstream call made succeeded
+        if plant_name != "Unknown Plant":
+            cache.set(cache_key, result)
+        return result
+    
+    result, coalesced = await registry.single_flight.run(cache_key, diagnose)
+    return result, "COALESCED" if coalesced else "MISS"
+
+
+async def classify_plant_name(registry: ComponentRegistry, base64_image: str) -> str:
+    """Classify the plant species, returning "Unknown Plant" if classification fails."""
+    try:
+        roboflow_client = registry.roboflow_client
+        if registry.config.async_clients:
+            classification_result = await roboflow_client.classify_plant_from_base64_async(base64_image)
+        else:
+            classification_result = await run_blocking(registry, roboflow_client.classify_plant_from_base64, base64_image)
+        
+        if classification_result.get("success", False):
+            return classification_result.get("plant_name", "Unknown Plant")
+        classification_error = classification_result.get("error", "Classification failed")
+        logger.warning(f"Roboflow classification failed: {classification_error}")
+    except Exception as e:
+        logger.warning(f"Roboflow classification error: {str(e)}")
+    return "Unknown Plant"
+
+
+async def detect_disease(registry: ComponentRegistry, base64_image: str):
+    """Run disease detection only, returning None if the analysis fails."""
+    try:
+        detector = registry.disease_detector
+        if registry.config.async_clients:
+            return await detector.analyze_leaf_image_base64_async(base64_image)
+        return await run_blocking(registry, test_with_base64_data, base64_image, detector)
+    except Exception as e:
+        logger.error(f"Disease detection error: {str(e)}")
+        return None
+
+
+app = FastAPI(title="Plant Doctor API", version="2.0.0", description="Complete plant diagnosis system with classification, disease detection, and care recommendations", lifespan=lifespan, default_response_class=OrjsonResponse)
+
+# Added before the function middlewares below so it wraps the routes directly and sees complete bodies
+app.add_middleware(CompressionMiddleware, get_config=lambda: app.state.registry.config)
+
+# Allowance for multipart boundaries and part headers around each image
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+# Endpoints that run the diagnosis pipeline inline; /jobs has its own bounded queue
+ADMISSION_CONTROLLED_PATHS = frozenset({"/plant-diagnosis", "/diagnose", "/diagnose/stream", "/diagnose/batch"})
+# Streaming endpoints keep diagnosing after the headers are sent
+STREAMING_PATHS = frozenset({"/diagnose/stream", "/diagnose/batch"})
+
+
+async def release_after_body(body_iterator, admission, slot):
+    """Pass a streamed body through, releasing the admission slot once it ends."""
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+    finally:
+        admission.release(slot)
+
+
+# Registered first so it runs inside the upload size check and rejects before the body is read
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    """Bound concurrent diagnoses, queue a few more and shed the rest with 503 and Retry-After."""
+    admission = request.app.state.registry.admission
+    if admission is None or request.method != "POST" or request.url.path not in ADMISSION_CONTROLLED_PATHS:
+        return await call_next(request)
+    try:
+        slot = await admission.acquire()
+    except AdmissionRejected as e:
+        logger.warning(f"Shed {request.url.path} request: {str(e)}")
+        return OrjsonResponse(
+            status_code=503,
+            content={"detail": str(e)},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    try:
+        response = await call_next(request)
+    except BaseException:
+        admission.release(slot)
+        raise
+    response.headers["X-Queue-Wait-Ms"] = f"{slot.queue_wait * 1000:.1f}"
+    if request.url.path in STREAMING_PATHS:
+        response.body_iterator = release_after_body(response.body_iterator, admission, slot)
+    else:
+        admission.release(slot)
+    return response
+
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Refuse uploads whose declared Content-Length exceeds the cap before the body is read."""
+    content_length = request.headers.get("content-length")
+    if request.method == "POST" and content_length and content_length.isdigit():
+        config = request.app.state.registry.config
+        max_files = config.batch_max_files if request.url.path == "/diagnose/batch" else 1
+        limit = max_files * (config.max_upload_bytes + MULTIPART_OVERHEAD_BYTES)
+        if int(content_length) > limit:
+            logger.warning(f"Rejected {content_length}-byte upload to {request.url.path} (limit {limit})")
+            return OrjsonResponse(
+                status_code=413,
+                content={"detail": f"Request too large: {content_length} bytes (maximum {limit})"}
+            )
+    return await call_next(request)
+
+
+# Registered last so it is the outermost middleware and also counts rejected uploads
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count requests and time them until the response headers are sent."""
+    REQUESTS_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        REQUESTS_IN_FLIGHT.dec()
+        # Label by route template (e.g. /jobs/{job_id}) to keep cardinality bounded
+        route = request.scope.get("route")
+        endpoint = route.path if route is not None else "unmatched"
+        REQUESTS_TOTAL.labels(endpoint=endpoint, method=request.method, status=str(status)).inc()
+        REQUEST_DURATION.labels(endpoint=endpoint).observe(time.perf_counter() - start)
+
 
 @app.post('/plant-diagnosis')
-async def plant_diagnosis(file: UploadFile = File(...)):
+async def plant_diagnosis(
+    file: UploadFile = File(...),
+    fields: Optional[str] = None,
+    view: Optional[str] = None,
+    registry: ComponentRegistry = Depends(get_registry)
+):
     """
     Endpoint to detect diseases in leaf images using direct image file upload.
     Now includes plant classification from Roboflow along with disease detection.
     Accepts multipart/form-data with an image file.
+    
+    Pass ?fields=plant_name,severity,... or ?view=compact to return only those keys.
     """
     try:
         logger.info("Received image file for disease detection with plant classification")
+        selection = parse_fields(PLANT_DIAGNOSIS_SCHEMA, PLANT_DIAGNOSIS_VIEWS, fields, view)
         
         # Validate file type
         if not file.content_type or not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
         
-        # Read uploaded file into memory
-        contents = await file.read()
-        
-        # Convert to base64 for Roboflow classification
-        import base64
-        base64_image = base64.b64encode(contents).decode('utf-8')
+        # Stream the upload into memory, checking its size cap and image header
+        contents = await read_upload(registry, file)
         
-        # First, classify the plant using Roboflow
-        plant_name = "Unknown Plant"
-        
-        try:
-            from inference import RoboflowInferenceClient
-            
-            roboflow_client = RoboflowInferenceClient(
-                workspace_name="laiba-masood-tyq7q",
-                model_id="identify-plant-zvd1y/1",
-                min_confidence=0.7,
-                confidence_method="adaptive"
-            )
-            classification_result = roboflow_client.classify_plant_from_base64(base64_image)
-            
-            if classification_result.get("success", False):
-                plant_name = classification_result.get("plant_name", "Unknown Plant")
-            else:
-                classification_error = classification_result.get("error", "Classification failed")
-                logger.warning(f"Roboflow classification failed: {classification_error}")
-        except Exception as e:
-            classification_error = str(e)
-            logger.warning(f"Roboflow classification error: {classification_error}")
-        
-        # Process file for disease detection
-        result = convert_image_to_base64_and_test(contents)
+        # Classify and detect, answering repeat uploads from the cache
+        result, cache_status = await run_plant_diagnosis(registry, contents, selection)
         
         if result is None:
             raise HTTPException(status_code=500, detail="Failed to process image file")
         
-        # Add plant classification info to the result
-        result["plant_name"] = plant_name
-        
         logger.info("Disease detection with plant classification completed successfully")
-        return JSONResponse(content=result)
+        return OrjsonResponse(content=selection.project(result), headers={"X-Cache": cache_status})
     except HTTPException:
         raise
     except Exception as e:
@@ -82,7 +361,13 @@ async def plant_diagnosis(file: UploadFile = File(...)):
 
 
 @app.post('/diagnose')
-async def diagnose_plant(file: UploadFile = File(...)):
+async def diagnose_plant(
+    file: UploadFile = File(...),
+    timings: bool = False,
+    fields: Optional[str] = None,
+    view: Optional[str] = None,
+    registry: ComponentRegistry = Depends(get_registry)
+):
     """
     Complete plant diagnosis endpoint that combines plant classification, 
     disease detection, and knowledge base recommendations.
@@ -91,32 +376,30 @@ async def diagnose_plant(file: UploadFile = File(...)):
     - Plant species identification (Roboflow)
     - Disease detection (Groq AI)
     - Care recommendations (Knowledge Base)
+    
+    Pass ?timings=true to add per-stage durations to the result (bypasses the cache).
+    Pass ?view=compact, or ?fields= with sections (disease_info) and keys
+    (kb_advice.general_care), to build and return only those parts.
     """
     try:
         logger.info("Received image file for complete plant diagnosis")
+        selection = parse_fields(DIAGNOSE_SCHEMA, DIAGNOSE_VIEWS, fields, view)
         
         # Validate file type
         if not file.content_type or not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
         
-        # Read uploaded file into memory
-        contents = await file.read()
-        
-        # Convert to base64 for processing
-        import base64
-        base64_image = base64.b64encode(contents).decode('utf-8')
-        
-        # Import and use the safe diagnosis pipeline with fallbacks
-        from main import safe_diagnose
+        # Stream the upload into memory, checking its size cap and image header
+        contents = await read_upload(registry, file)
         
         # Run safe diagnosis with tiered fallbacks
-        result = safe_diagnose(base64_image)
+        result, cache_status = await run_safe_diagnose(registry, contents, timings, selection)
         
         if not result.get("pipeline_success", False):
             logger.warning("Plant diagnosis pipeline completed with issues")
         
         logger.info("Complete plant diagnosis completed successfully")
-        return JSONResponse(content=result)
+        return OrjsonResponse(content=selection.project(result), headers={"X-Cache": cache_status})
         
     except HTTPException:
         raise
@@ -125,6 +408,192 @@ async def diagnose_plant(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+def format_sse(event: str, data: Dict) -> str:
+    """Format one Server-Sent Events message with a JSON payload."""
+    return f"event: {event}\ndata: {dumps_json(data).decode()}\n\n"
+
+
+@app.post('/diagnose/stream')
+async def diagnose_stream(file: UploadFile = File(...), registry: ComponentRegistry = Depends(get_registry)):
+    """
+    Progressive plant diagnosis streamed as Server-Sent Events.
+    
+    Emits each section of the /diagnose result as soon as its stage finishes,
+    so clients can render the plant name before the slower disease analysis:
+    event "plant" (plant_name, classification_info), "care" (kb_advice),
+    "disease" (health_status, disease_info), then "result" with the complete
+    /diagnose result. Cached images replay every section immediately.
+    """
+    logger.info("Received image file for streamed plant diagnosis")
+    
+    # Validate file type
+    if not file.content_type or not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    
+    # Stream the upload into memory, checking its size cap and image header
+    contents = await read_upload(registry, file)
+    
+    from main import DIAGNOSIS_STREAM_SECTIONS, diagnosis_section, safe_diagnose_stream
+    
+    cache = registry.diagnosis_cache
+    cache_key = registry.cache_key(contents, "diagnose")
+    cached = cache.get(cache_key)
+    
+    async def stream_sections():
+        if cached is not None:
+            logger.info("Streamed diagnosis served from cache")
+            for section in DIAGNOSIS_STREAM_SECTIONS:
+                yield format_sse(section, diagnosis_section(cached, section))
+            yield format_sse("result", cached)
+            return
+        
+        try:
+            async for section, data in safe_diagnose_stream(contents, registry):
+                if section == "result" and is_cacheable_diagnosis(data):
+                    cache.set(cache_key, data)
+                yield format_sse(section, data)
+        except Exception as e:
+            logger.error(f"Error in streamed plant diagnosis: {str(e)}")
+            yield format_sse("error", {"detail": f"Internal server error: {str(e)}"})
+    
+    return StreamingResponse(
+        stream_sections(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Cache": "HIT" if cached is not None else "MISS"}
+    )
+
+
+@app.post('/diagnose/batch')
+async def diagnose_batch(files: List[UploadFile] = File(...), registry: ComponentRegistry = Depends(get_registry)):
+    """
+    Batch plant diagnosis endpoint streaming one NDJSON line per image.
+    
+    Images are diagnosed with bounded upstream concurrency and each result is
+    written as soon as it finishes, in completion order. Every line carries the
+    upload index and filename so clients can match results to files:
+    {"index": 0, "filename": "leaf.jpg", "result": {...}, "cache_status": "MISS"} or
+    {"index": 1, "filename": "notes.txt", "error": "File must be an image"}
+    """
+    if len(files) > registry.config.batch_max_files:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files: {len(files)} (maximum {registry.config.batch_max_files})"
+        )
+    
+    logger.info(f"Received batch of {len(files)} images for plant diagnosis")
+    
+    # Uploads are closed once the endpoint returns, so read them before streaming.
+    # Each entry is released as soon as its image has been diagnosed; rejected
+    # uploads keep their error message instead of contents.
+    uploads = []
+    for file in files:
+        if not file.content_type or not file.content_type.startswith('image/'):
+            uploads.append((file.filename, "File must be an image"))
+            continue
+        try:
+            contents = await read_image_upload(file, registry.config.max_upload_bytes)
+        except UploadRejected as e:
+            uploads.append((file.filename, e.detail))
+            continue
+        UPLOAD_BYTES.observe(len(contents))
+        uploads.append((file.filename, contents))
+    
+    semaphore = asyncio.Semaphore(registry.config.batch_concurrency)
+    
+    async def diagnose_one(index: int):
+        filename, contents = uploads[index]
+        uploads[index] = None
+        line = {"index": index, "filename": filename}
+        if isinstance(contents, str):
+            line["error"] = contents
+            return line
+        async with semaphore:
+            try:
+                line["result"], line["cache_status"] = await run_safe_diagnose(registry, contents)
+            except Exception as e:
+                logger.error(f"Error in batch diagnosis for {filename}: {str(e)}")
+                line["error"] = f"Internal server error: {str(e)}"
+        return line
+    
+    async def stream_results():
+        tasks = [asyncio.create_task(diagnose_one(i)) for i in range(len(uploads))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                line = await next_done
+                yield dumps_json(line) + b"\n"
+        finally:
+            # Client disconnected mid-stream: stop the remaining diagnoses
+            for task in tasks:
+                task.cancel()
+        logger.info(f"Batch diagnosis of {len(tasks)} images completed")
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+@app.post('/jobs', status_code=202)
+async def create_job(file: UploadFile = File(...), registry: ComponentRegistry = Depends(get_registry)):
+    """
+    Queue a complete plant diagnosis and return its job ID immediately.
+    
+    The diagnosis runs on a fixed pool of background workers with the same
+    pipeline, cache and coalescing as /diagnose. Poll GET /jobs/{job_id} for
+    the result. Returns 503 with Retry-After when the queue is full.
+    """
+    # Validate file type
+    if not file.content_type or not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    
+    # Stream the upload into memory, checking its size cap and image header
+    contents = await read_upload(registry, file)
+    
+    try:
+        job = registry.job_queue.submit(contents)
+    except JobQueueFull as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    
+    return {"job_id": job.job_id, "status": job.status, "status_url": f"/jobs/{job.job_id}"}
+
+
+@app.get('/jobs/{job_id}')
+async def get_job(job_id: str, registry: ComponentRegistry = Depends(get_registry)):
+    """Status of a queued diagnosis job, including the /diagnose result once completed."""
+    job = registry.job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found or expired: {job_id}")
+    return job.to_dict()
+
+
+@app.get('/metrics')
+async def metrics():
+    """Prometheus metrics: request totals, stage latencies, upstream errors and payload sizes."""
+    from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get('/cache/stats')
+async def cache_stats(registry: ComponentRegistry = Depends(get_registry)):
+    """Hit/miss counters and size of the diagnosis result cache, plus single-flight coalescing."""
+    stats = registry.diagnosis_cache.get_stats()
+    stats["single_flight"] = registry.single_flight.get_stats()
+    return stats
+
+
+@app.get('/upstreams')
+async def upstream_status(registry: ComponentRegistry = Depends(get_registry)):
+    """Circuit breaker state, observed latency percentiles and hedging counters per upstream."""
+    return registry.get_upstream_status()
+
+
+@app.get('/admission')
+async def admission_status(registry: ComponentRegistry = Depends(get_registry)):
+    """In-flight and queued diagnosis requests, shed counts and average queue wait."""
+    admission = registry.admission
+    if admission is None:
+        return {"enabled": False}
+    return {"enabled": True, **admission.get_stats()}
+
+
 @app.get("/")
 async def root():
     """Root endpoint providing API information"""
@@ -134,6 +603,14 @@ async def root():
         "description": "AI-powered plant identification, disease detection, and care recommendations",
         "endpoints": {
             "diagnose": "/diagnose (POST, file upload) - Complete plant diagnosis",
+            "diagnose_stream": "/diagnose/stream (POST, file upload) - Complete diagnosis streamed stage by stage as Server-Sent Events",
+            "diagnose_batch": "/diagnose/batch (POST, multiple file uploads) - Batch diagnosis streamed as NDJSON",
+            "jobs": "/jobs (POST, file upload) - Queue a complete diagnosis and return a job ID",
+            "job_status": "/jobs/{job_id} (GET) - Status and result of a queued diagnosis",
+            "metrics": "/metrics (GET) - Prometheus metrics",
+            "cache_stats": "/cache/stats (GET) - Diagnosis result cache hit/miss counters",
+            "upstreams": "/upstreams (GET) - Circuit breaker and hedging state of Roboflow and Groq",
+            "admission": "/admission (GET) - In-flight, queued and shed diagnosis requests",
             "disease_detection_file": "/disease-detection-file (POST, file upload) - Disease detection only"
         },
         "features": [
@@ -0,0 +1,150 @@
+"""
+Knowledge Base Search Benchmark
+===============================
+
+This script measures plant lookup cost as the knowledge base grows:
+1. The previous linear scan (substring checks, then normalizing and scoring
+   every plant name on each lookup)
+2. PlantKnowledgeBase.search_plant, which looks names up in indexes built
+   when the knowledge base is loaded
+3. The same lookups answered from the plant name resolution cache
+4. Load time from JSON (parsing plus index building) and from the binary snapshot
+
+The bundled knowledge base is padded with synthetic plants (fixed seed, so
+runs are comparable) and shuffled so real plants sit at random positions.
+
+Usage: python benchmark_kb_search.py [--sizes 1000,10000] [--number N]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import timeit
+
+from kb_utils import (FUZZY_MATCH_THRESHOLD, SNAPSHOT_SUFFIX, PlantKnowledgeBase, _normalize_plant_name,
+                      compile_snapshot)
+
+# Classifier labels (hits, some only through fuzzy matching) and a miss
+QUERIES = ["Pothos", "Jade Plant", "Aloe Vera", "Snake Plant", "Swiss Cheese Plant", "Tomato"]
+
+SYLLABLES = ["ka", "lo", "mi", "ra", "then", "phy", "lum", "dra", "cae", "nia", "tor", "vel",
+             "sa", "qui", "ber", "on", "til", "gra", "mos", "ze"]
+
+# Words shared by many real plant names
+COMMON_WORDS = ["Plant", "Palm", "Fern", "Lily", "Cactus", "Ivy"]
+
+
+def linear_search(knowledge_base: dict, plant_name: str):
+    """Reference copy of the previous search_plant: returns the matching key or None."""
+    plant_name_lower = plant_name.lower().strip()
+    for plant_key in knowledge_base:
+        plant_key_lower = plant_key.lower()
+        if (plant_name_lower == plant_key_lower or
+                plant_name_lower in plant_key_lower or
+                plant_key_lower in plant_name_lower):
+            return plant_key
+
+    target_norm = _normalize_plant_name(plant_name)
+    if not target_norm:
+        return None
+    target_tokens = set(target_norm.split())
+    best_key, best_score = None, 0.0
+    for plant_key in knowledge_base:
+        key_norm = _normalize_plant_name(plant_key)
+        if not key_norm:
+            continue
+        if target_norm == key_norm:
+            return plant_key
+        key_tokens = set(key_norm.split())
+        intersection = target_tokens & key_tokens
+        score = max(len(intersection) / len(target_tokens | key_tokens),
+                    len(intersection) / max(len(target_tokens), 1))
+        if score > best_score:
+            best_key, best_score = plant_key, score
+    return best_key if best_score >= FUZZY_MATCH_THRESHOLD else None
+
+
+def synthetic_name(rng: random.Random) -> str:
+    """Random "Common Name (Genus species)" in the style of the knowledge base keys."""
+    def word(min_syllables: int, max_syllables: int) -> str:
+        return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(min_syllables, max_syllables)))
+
+    common = " ".join(word(2, 3).capitalize() for _ in range(rng.randint(1, 2)))
+    if rng.random() < 0.3:
+        common += " " + rng.choice(COMMON_WORDS)
+    return f"{common} ({word(3, 4).capitalize()} {word(2, 4)})"
+
+
+def padded_knowledge_base(real: dict, size: int, seed: int = 42) -> dict:
+    """Real plants plus synthetic ones up to size entries, in shuffled order."""
+    rng = random.Random(seed)
+    entries = list(real.items())
+    names = set(real)
+    while len(entries) < size:
+        name = synthetic_name(rng)
+        if name not in names:
+            names.add(name)
+            entries.append((name, {}))
+    rng.shuffle(entries)
+    return dict(entries)
+
+
+def time_per_lookup(func, number: int) -> float:
+    """Average microseconds per query."""
+    seconds = timeit.timeit(lambda: [func(query) for query in QUERIES], number=number)
+    return seconds / (number * len(QUERIES)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark plant lookup against knowledge base size")
+    parser.add_argument("--sizes", default="1000,10000,50000", help="Comma-separated padded knowledge base sizes")
+    parser.add_argument("--number", type=int, default=200, help="Timing repetitions per query")
+    args = parser.parse_args()
+    # Keep per-lookup logging out of the report
+    logging.getLogger().setLevel(logging.ERROR)
+
+    real = PlantKnowledgeBase(use_snapshot=False).knowledge_base
+    sizes = [len(real)] + [int(size) for size in args.sizes.split(",") if size.strip()]
+
+    print("Knowledge Base Search Benchmark")
+    print("=" * 40)
+    print(f"{len(QUERIES)} queries, {args.number} repetitions\n")
+    print(f"{'plants':>8} {'json (ms)':>10} {'snapshot (ms)':>14} {'linear (us)':>12} {'indexed (us)':>13} "
+          f"{'cached (us)':>12} {'speedup':>8}")
+
+    for size in sizes:
+        knowledge_base = padded_knowledge_base(real, size)
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as f:
+            json.dump(knowledge_base, f)
+        snapshot_path = f.name + SNAPSHOT_SUFFIX
+        try:
+            load_seconds = timeit.timeit(lambda: PlantKnowledgeBase(f.name, use_snapshot=False), number=1)
+            compile_snapshot(f.name, snapshot_path)
+            snapshot_seconds = timeit.timeit(lambda: PlantKnowledgeBase(f.name, snapshot_path=snapshot_path), number=1)
+            kb = PlantKnowledgeBase(f.name, resolution_cache_size=0, use_snapshot=False)
+            cached_kb = PlantKnowledgeBase(f.name, use_snapshot=False)
+        finally:
+            os.unlink(f.name)
+            os.unlink(snapshot_path)
+
+        for query in QUERIES:
+            found = kb.search_plant(query)
+            expected = linear_search(kb.knowledge_base, query)
+            if (found or {}).get("plant_name") != expected:
+                print(f"  note: '{query}' -> {found and found['plant_name']!r} (linear scan: {expected!r})")
+
+        # The linear scan is slow on large knowledge bases; scale repetitions down
+        linear_number = max(1, args.number * len(real) // size)
+        linear_us = time_per_lookup(lambda query: linear_search(kb.knowledge_base, query), linear_number)
+        indexed_us = time_per_lookup(kb.search_plant, args.number)
+        cached_kb.prewarm(QUERIES)
+        cached_us = time_per_lookup(cached_kb.search_plant, args.number)
+        print(f"{size:>8} {load_seconds * 1000:>10.1f} {snapshot_seconds * 1000:>14.1f} {linear_us:>12.1f} {indexed_us:>13.1f} "
+              f"{cached_us:>12.1f} {linear_us / indexed_us:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Response Encoding Benchmark
+===========================
+
+This script measures what the API's response encoding saves on representative
+/diagnose results:
+1. Serialization time of the stock JSONResponse encoder versus orjson
+2. Response size uncompressed, with gzip and with brotli (if installed),
+   for the full and the compact view
+
+Results are assembled by the real pipeline helpers from the bundled knowledge
+base and typical Roboflow/Groq outputs, so no API keys or network are needed.
+
+Usage: python benchmark_responses.py [--number N]
+"""
+
+import argparse
+import json
+import logging
+import sys
+import timeit
+from pathlib import Path
+
+# Add Leaf Disease directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent / "Leaf Disease"))
+
+from kb_utils import PlantKnowledgeBase
+from main import (_apply_classification_result, _apply_disease_result, _apply_kb_care_info,
+                  _apply_kb_treatments, _finalize_diagnosis, _new_diagnosis_result)
+from projection import DIAGNOSE_SCHEMA, DIAGNOSE_VIEWS, FieldSelection
+from response_encoding import compress_body, dumps_json
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+# Typical Groq analysis; the disease name is replaced per plant with one of its KB issues
+SAMPLE_DISEASE = {
+    "disease_detected": True,
+    "disease_name": None,
+    "disease_type": "fungal",
+    "severity": "moderate",
+    "confidence": 87.5,
+    "symptoms": [
+        "Circular brown spots with yellow halos on older leaves",
+        "Spots merging into larger necrotic patches near the leaf margin",
+        "Premature yellowing and drop of the most affected leaves",
+        "Small dark fruiting bodies visible in the center of older lesions"
+    ],
+    "possible_causes": [
+        "Prolonged leaf wetness from overhead watering",
+        "Poor air circulation around dense foliage",
+        "Spores splashed from infected debris in the pot"
+    ],
+    "treatment": [
+        "Remove and dispose of all spotted leaves",
+        "Water at the soil line in the morning so foliage dries quickly",
+        "Apply a copper-based fungicide every 7-10 days for three weeks",
+        "Increase spacing between plants to improve airflow"
+    ]
+}
+
+
+def sample_results(kb: PlantKnowledgeBase, count: int):
+    """Build full diagnosis results for the first plants in the knowledge base."""
+    plants = kb.list_all_plants()[:count]
+    results = []
+    for plant in plants:
+        # Roboflow returns a score for every class
+        predictions = [{"class": plant, "confidence": 0.91}] + [
+            {"class": other, "confidence": round(0.09 / (i + 2), 4)} for i, other in enumerate(plants) if other != plant
+        ]
+        result = _new_diagnosis_result()
+        classified = _apply_classification_result(result, {
+            "success": True, "plant_name": plant, "confidence": 0.91, "predictions": predictions
+        })
+        issue = next(iter(kb.knowledge_base[plant]), None)
+        detected = _apply_disease_result(result, dict(SAMPLE_DISEASE, disease_name=issue))
+        kb_info = _apply_kb_care_info(result, kb)
+        kb_success = _apply_kb_treatments(result, kb) if kb_info.get("found") else False
+        results.append(_finalize_diagnosis(result, kb_info, classified, detected, kb_success))
+    return results
+
+
+def stdlib_dumps(content) -> bytes:
+    """Serialize exactly like starlette's JSONResponse.render."""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def time_per_call(func, payloads, number: int) -> float:
+    """Average microseconds per payload."""
+    seconds = timeit.timeit(lambda: [func(payload) for payload in payloads], number=number)
+    return seconds / (number * len(payloads)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response serialization and compression")
+    parser.add_argument("--number", type=int, default=2000, help="Timing repetitions per payload")
+    parser.add_argument("--plants", type=int, default=10, help="Number of sample diagnoses")
+    args = parser.parse_args()
+    # Keep pipeline helper logging out of the report
+    logging.getLogger().setLevel(logging.ERROR)
+
+    kb = PlantKnowledgeBase()
+    full = sample_results(kb, args.plants)
+    compact_view = FieldSelection.parse(DIAGNOSE_SCHEMA, DIAGNOSE_VIEWS, view="compact")
+    compact = [compact_view.project(result) for result in full]
+
+    print("Response Encoding Benchmark")
+    print("=" * 40)
+    print(f"{len(full)} sample /diagnose results, {args.number} repetitions\n")
+
+    stdlib_us = time_per_call(stdlib_dumps, full, args.number)
+    orjson_us = time_per_call(dumps_json, full, args.number)
+    print("Serialization (full view, per response)")
+    print(f"  json (JSONResponse)  {stdlib_us:8.1f} us")
+    print(f"  orjson               {orjson_us:8.1f} us  ({stdlib_us / orjson_us:.1f}x faster)\n")
+
+    encoders = [("gzip", lambda body: compress_body(body, "gzip", GZIP_LEVEL, BROTLI_QUALITY))]
+    if brotli is not None:
+        encoders.append(("br", lambda body: compress_body(body, "br", GZIP_LEVEL, BROTLI_QUALITY)))
+    else:
+        print("(brotli not installed; install it to include br)\n")
+
+    baseline = None
+    for view, results in (("full", full), ("compact", compact)):
+        bodies = [dumps_json(result) for result in results]
+        raw = sum(len(body) for body in bodies) / len(bodies)
+        baseline = baseline or raw
+        print(f"Response size ({view} view, average)")
+        print(f"  identity             {raw:8.0f} B  ({raw / baseline:.0%} of full)")
+        for name, encode in encoders:
+            size = sum(len(encode(body)) for body in bodies) / len(bodies)
+            encode_us = time_per_call(encode, bodies, max(1, args.number // 10))
+            print(f"  {name:<20} {size:8.0f} B  ({size / baseline:.0%} of full, {encode_us:.1f} us to compress)")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,11 +9,16 @@ to classify plant species from images using the custom workflow.
 import os
 import logging
 import base64
-import tempfile
-from typing import Dict, Optional, Any, List
+import threading
+from typing import Dict, Optional, Any, List, Union
 from inference_sdk import InferenceHTTPClient
 from dotenv import load_dotenv
 import statistics
+import httpx
+
+from metrics import redact_secrets, redact_upstream_error, track_upstream
+from resilience import UpstreamGuard
+from tracing import trace_stage
 
 # Load environment variables from .env file
 load_dotenv()
@@ -21,6 +26,19 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 
 
+class _RedactSecretsFilter(logging.Filter):
+    """Mask the API key in request URLs that httpx logs for every request."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.msg = redact_secrets(record.getMessage())
+        record.args = None
+        return True
+
+
+# The hosted model authenticates with ?api_key=, which httpx logs at INFO
+logging.getLogger("httpx").addFilter(_RedactSecretsFilter())
+
+
 class RoboflowInferenceClient:
     """
     Client for Roboflow inference API to identify plant species using workflow.
@@ -30,13 +48,16 @@ class RoboflowInferenceClient:
     with advanced confidence filtering.
     """
     
+    API_URL = "https://serverless.roboflow.com"
+    
     def __init__(
         self, 
         api_key: Optional[str] = None,
         workspace_name: str = "laiba-masood-tyq7q",
         model_id: str = "identify-plant-zvd1y/1",
         min_confidence: float = 0.7,
-        confidence_method: str = "adaptive"
+        confidence_method: str = "adaptive",
+        upstream_guard: Optional[UpstreamGuard] = None
     ):
         """
         Initialize the Roboflow inference client.
@@ -51,6 +72,9 @@ class RoboflowInferenceClient:
                                    - "adaptive": Uses statistical analysis
                                    - "strict": Only top prediction if above threshold
                                    - "weighted": Weighted average of top predictions
+            upstream_guard (Optional[UpstreamGuard]): Circuit breaker and hedging for
+                                                    Roboflow calls. If None, a private
+                                                    guard with default settings is used.
         """
         # Get API key from parameter or environment variable
         self.api_key = api_key or os.environ.get("ROBOFLOW_API_KEY")
@@ -67,12 +91,20 @@ class RoboflowInferenceClient:
         self.model_id = model_id
         self.min_confidence = min_confidence
         self.confidence_method = confidence_method
+        self.upstream = upstream_guard or UpstreamGuard("roboflow")
+        
+        # Pooled HTTP clients for in-memory base64 requests, each created once on
+        # first use under the lock. The async client's connections belong to the
+        # event loop that first uses it (the server's loop)
+        self._http: Optional[httpx.Client] = None
+        self._async_http: Optional[httpx.AsyncClient] = None
+        self._http_lock = threading.Lock()
         
         # Initialize InferenceHTTPClient exactly as per Roboflow example
         # 2. Connect to your workflow
         try:
             self.client = InferenceHTTPClient(
-                api_url="https://serverless.roboflow.com",
+                api_url=self.API_URL,
                 api_key=self.api_key
             )
             logger.info(
@@ -181,12 +213,226 @@ class RoboflowInferenceClient:
             "method": "default"
         }
     
-    def classify_plant(self, image_path: str) -> Dict[str, Any]:
+    def _describe_inference_error(self, error: Exception) -> str:
+        """
+        Build an inference error message with a hint for common failure causes.
+        
+        Args:
+            error: Exception raised by the inference request
+            
+        Returns:
+            str: Error message including authentication/model/timeout hints
+        """
+        error_msg = f"Failed to run inference: {redact_upstream_error(error)}"
+        # Provide helpful error messages for common issues
+        error_str = error_msg.lower()
+        if "401" in error_str or "unauthorized" in error_str:
+            error_msg += " (Authentication failed - check your API key)"
+        elif "404" in error_str or "not found" in error_str:
+            error_msg += f" (Model not found - verify workspace: {self.workspace_name}, model: {self.model_id})"
+        elif "timeout" in error_str:
+            error_msg += " (Request timeout - check your internet connection)"
+        return error_msg
+    
+    def _classification_error_result(self, error: Exception) -> Dict[str, Any]:
+        """
+        Build the failed classification result for an unexpected error.
+        
+        Args:
+            error: Exception raised while classifying
+            
+        Returns:
+            Dict[str, Any]: Classification result with success False and error details
+        """
+        error_message = redact_upstream_error(error)
+        logger.error(f"Plant classification failed: {error_message}", exc_info=True)
+        # Log more details about the error
+        error_details = {
+            "error_type": type(error).__name__,
+            "error_message": error_message,
+            "workspace_name": self.workspace_name,
+            "model_id": self.model_id,
+            "api_key_set": bool(self.api_key)
+        }
+        logger.error(f"Error details: {error_details}")
+        return {
+            "plant_name": "Unknown Plant",
+            "confidence": 0.0,
+            "predictions": [],
+            "success": False,
+            "error": error_message,
+            "error_details": error_details
+        }
+    
+    def _build_classification_result(self, result: Any) -> Dict[str, Any]:
+        """
+        Extract, normalize and filter predictions from a raw inference result.
+        
+        Args:
+            result: Raw model inference response (dict or list)
+            
+        Returns:
+            Dict[str, Any]: Classification results (same format as classify_plant)
+        """
+        # Extract predictions from model inference result
+        # Model results structure may vary, so we handle multiple formats
+        predictions = []
+
+        # Log the raw result structure for debugging (INFO level for visibility)
+        logger.info(f"Raw inference result type: {type(result)}")
+        if isinstance(result, dict):
+            logger.info(f"Raw workflow result keys: {list(result.keys())}")
+            # Log a sample of the result structure
+            logger.info(f"Raw result sample: {str(result)[:300]}")
+        else:
+            logger.info(f"Raw result (first 300 chars): {str(result)[:300]}")
+
+        if isinstance(result, dict):
+            # Try different possible result structures
+            if 'predictions' in result:
+                predictions = result.get('predictions', [])
+                logger.debug("Found predictions in 'predictions' key")
+            elif 'results' in result:
+                predictions = result.get('results', [])
+                logger.debug("Found predictions in 'results' key")
+            elif 'output' in result:
+                output = result.get('output', {})
+                if isinstance(output, list):
+                    predictions = output
+                    logger.debug("Found predictions in 'output' as list")
+                elif isinstance(output, dict) and 'predictions' in output:
+                    predictions = output.get('predictions', [])
+                    logger.debug("Found predictions in 'output.predictions'")
+                elif isinstance(output, dict):
+                    # Try to find predictions in output dict
+                    for key in ['predictions', 'results', 'classes', 'top_predictions']:
+                        if key in output and isinstance(output[key], list):
+                            predictions = output[key]
+                            logger.debug(f"Found predictions in 'output.{key}'")
+                            break
+            elif 'image' in result:
+                # Workflow might return results nested under image key
+                image_data = result.get('image', {})
+                if isinstance(image_data, dict):
+                    for key in ['predictions', 'results', 'classes']:
+                        if key in image_data and isinstance(image_data[key], list):
+                            predictions = image_data[key]
+                            logger.debug(f"Found predictions in 'image.{key}'")
+                            break
+            else:
+                # Try to find any list of predictions in nested structure
+                for key, value in result.items():
+                    if isinstance(value, list) and len(value) > 0:
+                        if isinstance(value[0], dict) and ('class' in value[0] or 'confidence' in value[0] or 'name' in value[0]):
+                            predictions = value
+                            logger.debug(f"Found predictions in '{key}' key")
+                            break
+                    elif isinstance(value, dict):
+                        # Check nested dicts
+                        for nested_key in ['predictions', 'results', 'classes']:
+                            if nested_key in value and isinstance(value[nested_key], list):
+                                predictions = value[nested_key]
+                                logger.debug(f"Found predictions in '{key}.{nested_key}'")
+                                break
+                        if predictions:
+                            break
+        elif isinstance(result, list):
+            # If result itself is a list
+            predictions = result
+            logger.debug("Result is a list, using directly as predictions")
+
+        # Log what we found
+        logger.info(f"Extracted {len(predictions)} predictions from model inference result")
+
+        if not predictions:
+            logger.error("No predictions returned from Roboflow model")
+            logger.error(f"Raw result type: {type(result)}")
+            if isinstance(result, dict):
+                logger.error(f"Raw result keys: {list(result.keys())}")
+                # Log the full structure for debugging
+                import json
+                try:
+                    logger.error(f"Raw result JSON: {json.dumps(result, indent=2, default=str)[:1000]}")
+                except:
+                    logger.error(f"Raw result (string): {str(result)[:1000]}")
+            else:
+                logger.error(f"Raw result: {str(result)[:1000]}")
+            return {
+                "plant_name": "Unknown Plant",
+                "confidence": 0.0,
+                "predictions": [],
+                "success": False,
+                "error": "No predictions found in model inference result",
+                "raw_result": result
+            }
+
+        # Normalize prediction format - handle different field names
+        normalized_predictions = []
+        for pred in predictions:
+            if isinstance(pred, dict):
+                # Normalize field names (class/name, confidence/score)
+                normalized = {}
+                normalized['class'] = pred.get('class') or pred.get('name') or pred.get('label') or pred.get('plant_name') or 'Unknown'
+                # Handle confidence in different formats (0-1, 0-100, percentage)
+                conf = pred.get('confidence') or pred.get('score') or pred.get('prob') or 0.0
+                if isinstance(conf, str):
+                    conf = float(conf.replace('%', '')) / 100.0 if '%' in conf else float(conf)
+                elif conf > 1.0:  # Assume 0-100 scale
+                    conf = conf / 100.0
+                normalized['confidence'] = float(conf)
+                normalized_predictions.append(normalized)
+            elif isinstance(pred, str):
+                # If prediction is just a string (plant name)
+                normalized_predictions.append({
+                    'class': pred,
+                    'confidence': 1.0  # Default confidence if not provided
+                })
+
+        predictions = normalized_predictions
+
+        # Sort predictions by confidence (descending)
+        if predictions and isinstance(predictions[0], dict) and 'confidence' in predictions[0]:
+            predictions = sorted(predictions, key=lambda x: float(x.get('confidence', 0)), reverse=True)
+            logger.debug(f"Top prediction: {predictions[0].get('class')} (confidence: {predictions[0].get('confidence'):.2f})")
+
+        # Apply advanced confidence filtering
+        filtered_result = self._apply_advanced_confidence_filtering(predictions)
+
+        # Check if confidence meets threshold
+        success = filtered_result['confidence'] >= self.min_confidence
+
+        if not success:
+            logger.warning(
+                f"Classification confidence {filtered_result['confidence']:.2f} below threshold {self.min_confidence}. "
+                f"Plant: {filtered_result['plant_name']}"
+            )
+
+        logger.info(
+            f"Plant classified as: {filtered_result['plant_name']} "
+            f"(confidence: {filtered_result['confidence']:.2f}, "
+            f"method: {filtered_result['method']}, "
+            f"success: {success})"
+        )
+
+        return {
+            "plant_name": filtered_result['plant_name'],
+            "confidence": filtered_result['confidence'],
+            "predictions": predictions,
+            "success": success,
+            "confidence_method": filtered_result['method'],
+            "raw_result": result
+        }
+    
+    def classify_plant(self, image_path: str, timeout: Optional[float] = None) -> Dict[str, Any]:
         """
         Classify a plant image and return species identification using workflow API.
         
         Args:
             image_path (str): Path to the image file (absolute or relative path)
+            timeout (Optional[float]): Budget in seconds for retries. The SDK has no
+                                       per-request timeout, so a single attempt is only
+                                       bounded by the SDK's own; deadline-bound callers
+                                       use classify_plant_from_base64
             
         Returns:
             Dict[str, Any]: Classification results containing:
@@ -210,10 +456,14 @@ class RoboflowInferenceClient:
             # 3. Run inference on the image using the model
             try:
                 # Use infer method for model inference (not workflow)
-                result = self.client.infer(
-                    image_path,
-                    model_id=self.model_id
-                )
+                def send(attempt_timeout):
+                    with track_upstream("roboflow", os.path.getsize(image_path)), trace_stage("roboflow_call"):
+                        return self.client.infer(
+                            image_path,
+                            model_id=self.model_id
+                        )
+                
+                result = self.upstream.call(send, timeout)
                 logger.info(f"Inference result received: {type(result)}")
                 logger.debug(f"Inference result content: {result}")
             except AttributeError as e:
@@ -224,166 +474,12 @@ class RoboflowInferenceClient:
                 logger.error(error_msg)
                 raise AttributeError(error_msg)
             except Exception as e:
-                error_msg = f"Failed to run inference: {str(e)}"
+                error_msg = self._describe_inference_error(e)
                 logger.error(error_msg)
-                # Provide helpful error messages for common issues
-                error_str = str(e).lower()
-                if "401" in error_str or "unauthorized" in error_str:
-                    error_msg += " (Authentication failed - check your API key)"
-                elif "404" in error_str or "not found" in error_str:
-                    error_msg += f" (Model not found - verify workspace: {self.workspace_name}, model: {self.model_id})"
-                elif "timeout" in error_str:
-                    error_msg += " (Request timeout - check your internet connection)"
                 raise Exception(error_msg)
             
-            # Extract predictions from model inference result
-            # Model results structure may vary, so we handle multiple formats
-            predictions = []
-            
-            # Log the raw result structure for debugging (INFO level for visibility)
-            logger.info(f"Raw inference result type: {type(result)}")
-            if isinstance(result, dict):
-                logger.info(f"Raw workflow result keys: {list(result.keys())}")
-                # Log a sample of the result structure
-                logger.info(f"Raw result sample: {str(result)[:300]}")
-            else:
-                logger.info(f"Raw result (first 300 chars): {str(result)[:300]}")
-            
-            if isinstance(result, dict):
-                # Try different possible result structures
-                if 'predictions' in result:
-                    predictions = result.get('predictions', [])
-                    logger.debug("Found predictions in 'predictions' key")
-                elif 'results' in result:
-                    predictions = result.get('results', [])
-                    logger.debug("Found predictions in 'results' key")
-                elif 'output' in result:
-                    output = result.get('output', {})
-                    if isinstance(output, list):
-                        predictions = output
-                        logger.debug("Found predictions in 'output' as list")
-                    elif isinstance(output, dict) and 'predictions' in output:
-                        predictions = output.get('predictions', [])
-                        logger.debug("Found predictions in 'output.predictions'")
-                    elif isinstance(output, dict):
-                        # Try to find predictions in output dict
-                        for key in ['predictions', 'results', 'classes', 'top_predictions']:
-                            if key in output and isinstance(output[key], list):
-                                predictions = output[key]
-                                logger.debug(f"Found predictions in 'output.{key}'")
-                                break
-                elif 'image' in result:
-                    # Workflow might return results nested under image key
-                    image_data = result.get('image', {})
-                    if isinstance(image_data, dict):
-                        for key in ['predictions', 'results', 'classes']:
-                            if key in image_data and isinstance(image_data[key], list):
-                                predictions = image_data[key]
-                                logger.debug(f"Found predictions in 'image.{key}'")
-                                break
-                else:
-                    # Try to find any list of predictions in nested structure
-                    for key, value in result.items():
-                        if isinstance(value, list) and len(value) > 0:
-                            if isinstance(value[0], dict) and ('class' in value[0] or 'confidence' in value[0] or 'name' in value[0]):
-                                predictions = value
-                                logger.debug(f"Found predictions in '{key}' key")
-                                break
-                        elif isinstance(value, dict):
-                            # Check nested dicts
-                            for nested_key in ['predictions', 'results', 'classes']:
-                                if nested_key in value and isinstance(value[nested_key], list):
-                                    predictions = value[nested_key]
-                                    logger.debug(f"Found predictions in '{key}.{nested_key}'")
-                                    break
-                            if predictions:
-                                break
-            elif isinstance(result, list):
-                # If result itself is a list
-                predictions = result
-                logger.debug("Result is a list, using directly as predictions")
-            
-            # Log what we found
-            logger.info(f"Extracted {len(predictions)} predictions from model inference result")
-            
-            if not predictions:
-                logger.error("No predictions returned from Roboflow model")
-                logger.error(f"Raw result type: {type(result)}")
-                if isinstance(result, dict):
-                    logger.error(f"Raw result keys: {list(result.keys())}")
-                    # Log the full structure for debugging
-                    import json
-                    try:
-                        logger.error(f"Raw result JSON: {json.dumps(result, indent=2, default=str)[:1000]}")
-                    except:
-                        logger.error(f"Raw result (string): {str(result)[:1000]}")
-                else:
-                    logger.error(f"Raw result: {str(result)[:1000]}")
-                return {
-                    "plant_name": "Unknown Plant",
-                    "confidence": 0.0,
-                    "predictions": [],
-                    "success": False,
-                    "error": "No predictions found in model inference result",
-                    "raw_result": result
-                }
-            
-            # Normalize prediction format - handle different field names
-            normalized_predictions = []
-            for pred in predictions:
-                if isinstance(pred, dict):
-                    # Normalize field names (class/name, confidence/score)
-                    normalized = {}
-                    normalized['class'] = pred.get('class') or pred.get('name') or pred.get('label') or pred.get('plant_name') or 'Unknown'
-                    # Handle confidence in different formats (0-1, 0-100, percentage)
-                    conf = pred.get('confidence') or pred.get('score') or pred.get('prob') or 0.0
-                    if isinstance(conf, str):
-                        conf = float(conf.replace('%', '')) / 100.0 if '%' in conf else float(conf)
-                    elif conf > 1.0:  # Assume 0-100 scale
-                        conf = conf / 100.0
-                    normalized['confidence'] = float(conf)
-                    normalized_predictions.append(normalized)
-                elif isinstance(pred, str):
-                    # If prediction is just a string (plant name)
-                    normalized_predictions.append({
-                        'class': pred,
-                        'confidence': 1.0  # Default confidence if not provided
-                    })
-            
-            predictions = normalized_predictions
-            
-            # Sort predictions by confidence (descending)
-            if predictions and isinstance(predictions[0], dict) and 'confidence' in predictions[0]:
-                predictions = sorted(predictions, key=lambda x: float(x.get('confidence', 0)), reverse=True)
-                logger.debug(f"Top prediction: {predictions[0].get('class')} (confidence: {predictions[0].get('confidence'):.2f})")
-            
-            # Apply advanced confidence filtering
-            filtered_result = self._apply_advanced_confidence_filtering(predictions)
-            
-            # Check if confidence meets threshold
-            success = filtered_result['confidence'] >= self.min_confidence
-            
-            if not success:
-                logger.warning(
-                    f"Classification confidence {filtered_result['confidence']:.2f} below threshold {self.min_confidence}. "
-                    f"Plant: {filtered_result['plant_name']}"
-                )
-            
-            logger.info(
-                f"Plant classified as: {filtered_result['plant_name']} "
-                f"(confidence: {filtered_result['confidence']:.2f}, "
-                f"method: {filtered_result['method']}, "
-                f"success: {success})"
-            )
-            
-            return {
-                "plant_name": filtered_result['plant_name'],
-                "confidence": filtered_result['confidence'],
-                "predictions": predictions,
-                "success": success,
-                "confidence_method": filtered_result['method'],
-                "raw_result": result
-            }
+            with trace_stage("prediction_extraction"):
+                return self._build_classification_result(result)
             
         except FileNotFoundError as e:
             logger.error(f"Image file not found: {str(e)}")
@@ -395,79 +491,181 @@ class RoboflowInferenceClient:
                 "error": f"Image file not found: {str(e)}"
             }
         except Exception as e:
-            logger.error(f"Plant classification failed: {str(e)}", exc_info=True)
-            # Log more details about the error
-            error_details = {
-                "error_type": type(e).__name__,
-                "error_message": str(e),
-                "workspace_name": self.workspace_name,
-                "model_id": self.model_id,
-                "api_key_set": bool(self.api_key)
-            }
-            logger.error(f"Error details: {error_details}")
-            return {
-                "plant_name": "Unknown Plant",
-                "confidence": 0.0,
-                "predictions": [],
-                "success": False,
-                "error": str(e),
-                "error_details": error_details
-            }
+            return self._classification_error_result(e)
     
-    def classify_plant_from_base64(self, base64_image: str) -> Dict[str, Any]:
+    def _get_http(self) -> httpx.Client:
+        """Pooled sync HTTP client; threads racing on first use share one client."""
+        http = self._http
+        if http is None:
+            with self._http_lock:
+                if self._http is None:
+                    self._http = httpx.Client(base_url=self.API_URL, timeout=30.0)
+                http = self._http
+        return http
+    
+    def _get_async_http(self) -> httpx.AsyncClient:
+        """Pooled async HTTP client; threads racing on first use share one client."""
+        http = self._async_http
+        if http is None:
+            with self._http_lock:
+                if self._async_http is None:
+                    self._async_http = httpx.AsyncClient(base_url=self.API_URL, timeout=30.0)
+                http = self._async_http
+        return http
+    
+    def _inference_request(self, base64_image: Union[str, bytes]) -> Dict[str, Any]:
+        """
+        Build the hosted model request for base64 image data.
+        
+        Args:
+            base64_image (Union[str, bytes]): Base64 encoded image data (with or without data URL prefix)
+            
+        Returns:
+            Dict[str, Any]: Keyword arguments for an httpx POST
+        """
+        # Clean base64 string (remove data URL prefix if present)
+        if isinstance(base64_image, str):
+            if base64_image.startswith('data:'):
+                base64_image = base64_image[base64_image.index(',') + 1:]
+            # ASCII-only base64 is sent as its UTF-8 bytes without re-encoding
+            base64_image = base64_image.encode('ascii')
+        return {
+            "url": f"/{self.model_id}",
+            "params": {"api_key": self.api_key},
+            "content": base64_image,
+            "headers": {"Content-Type": "application/x-www-form-urlencoded"}
+        }
+    
+    def classify_plant_from_base64(self, base64_image: str, timeout: Optional[float] = None) -> Dict[str, Any]:
         """
         Classify a plant from base64 encoded image data.
         
+        Posts the base64 payload straight to the hosted model endpoint over a
+        pooled HTTP connection; the image is never decoded or written to disk.
+        
         Args:
             base64_image (str): Base64 encoded image data (with or without data URL prefix)
+            timeout (Optional[float]): Budget in seconds for the request and any retries,
+                                       e.g. the stage's share of the diagnosis deadline
             
         Returns:
             Dict[str, Any]: Classification results (same format as classify_plant)
         """
         try:
-            # Clean base64 string (remove data URL prefix if present)
-            if base64_image.startswith('data:'):
-                base64_image = base64_image.split(',', 1)[1]
+            if not base64_image:
+                raise ValueError("Invalid base64 image data: image is empty")
+            
+            http = self._get_http()
+            
+            logger.info("Starting plant classification for base64 image data")
+            request = self._inference_request(base64_image)
+            
+            def send(attempt_timeout):
+                with track_upstream("roboflow", len(request["content"])), trace_stage("roboflow_call"):
+                    response = http.post(**request, timeout=_httpx_timeout(attempt_timeout))
+                    _raise_for_status(response)
+                    return response.json()
             
-            # Decode base64 to bytes
             try:
-                image_bytes = base64.b64decode(base64_image)
+                # Fails fast while the circuit is open; retries 429/5xx within the timeout
+                result = self.upstream.call(send, timeout)
+                logger.info(f"Inference result received: {type(result)}")
             except Exception as e:
-                logger.error(f"Failed to decode base64 image: {str(e)}")
-                return {
-                    "plant_name": "Unknown Plant",
-                    "confidence": 0.0,
-                    "predictions": [],
-                    "success": False,
-                    "error": f"Invalid base64 image data: {str(e)}"
-                }
+                error_msg = self._describe_inference_error(e)
+                logger.error(error_msg)
+                raise Exception(error_msg)
             
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-                temp_file.write(image_bytes)
-                temp_path = temp_file.name
+            with trace_stage("prediction_extraction"):
+                return self._build_classification_result(result)
+            
+        except Exception as e:
+            return self._classification_error_result(e)
+    
+    def classify_plant_from_bytes(self, image_bytes: Union[bytes, memoryview]) -> Dict[str, Any]:
+        """
+        Classify a plant from raw image bytes, base64 encoding them exactly once.
+        
+        Args:
+            image_bytes (Union[bytes, memoryview]): Raw JPEG/PNG image data
+            
+        Returns:
+            Dict[str, Any]: Classification results (same format as classify_plant)
+        """
+        return self.classify_plant_from_base64(base64.b64encode(image_bytes))
+    
+    async def classify_plant_from_base64_async(self, base64_image: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Classify a plant from base64 encoded image data without blocking the event loop.
+        
+        Posts the base64 payload straight to the hosted model endpoint with an
+        async HTTP client, so no temporary file is written and the SDK's
+        blocking requests session is not used.
+        
+        Args:
+            base64_image (str): Base64 encoded image data (with or without data URL prefix)
+            timeout (Optional[float]): Budget in seconds for the request and any retries,
+                                       e.g. the stage's share of the diagnosis deadline
+            
+        Returns:
+            Dict[str, Any]: Classification results (same format as classify_plant)
+        """
+        try:
+            if not base64_image:
+                raise ValueError("Invalid base64 image data: image is empty")
+            
+            http = self._get_async_http()
+            
+            logger.info("Starting async plant classification for base64 image data")
+            request = self._inference_request(base64_image)
+            
+            async def send(attempt_timeout):
+                with track_upstream("roboflow", len(request["content"])), trace_stage("roboflow_call"):
+                    response = await http.post(**request, timeout=_httpx_timeout(attempt_timeout))
+                    _raise_for_status(response)
+                    return response.json()
             
             try:
-                # Classify using the temporary file
-                result = self.classify_plant(temp_path)
-                return result
-            finally:
-                # Clean up temporary file
-                try:
-                    if os.path.exists(temp_path):
-                        os.unlink(temp_path)
-                except Exception as e:
-                    logger.warning(f"Failed to delete temporary file {temp_path}: {str(e)}")
+                # Fails fast while the circuit is open; may hedge a slow request and
+                # retries 429/5xx within the timeout
+                result = await self.upstream.call_async(send, timeout)
+                logger.info(f"Inference result received: {type(result)}")
+            except Exception as e:
+                error_msg = self._describe_inference_error(e)
+                logger.error(error_msg)
+                raise Exception(error_msg)
+            
+            with trace_stage("prediction_extraction"):
+                return self._build_classification_result(result)
             
         except Exception as e:
-            logger.error(f"Base64 plant classification failed: {str(e)}")
-            return {
-                "plant_name": "Unknown Plant",
-                "confidence": 0.0,
-                "predictions": [],
-                "success": False,
-                "error": str(e)
-            }
+            return self._classification_error_result(e)
+    
+    def close(self) -> None:
+        """Close the pooled sync HTTP client."""
+        with self._http_lock:
+            http, self._http = self._http, None
+        if http is not None:
+            http.close()
+    
+    async def aclose(self) -> None:
+        """Close the async HTTP client's connection pool."""
+        with self._http_lock:
+            http, self._async_http = self._async_http, None
+        if http is not None:
+            await http.aclose()
+
+
+def _httpx_timeout(timeout: Optional[float]):
+    """Per-request httpx timeout: the given seconds, or the client default if None."""
+    return httpx.USE_CLIENT_DEFAULT if timeout is None else timeout
+
+
+def _raise_for_status(response: httpx.Response) -> None:
+    """Raise HTTPStatusError for a non-2xx response without the API key from the request URL."""
+    try:
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        raise httpx.HTTPStatusError(redact_upstream_error(e), request=e.request, response=e.response) from None
 
 
 def main():
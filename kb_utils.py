@@ -4,17 +4,102 @@ Knowledge Base Utilities for Plant Care Information
 
 This module provides utilities for loading and querying the plant knowledge base
 JSON file containing plant-specific care information, common issues, and treatments.
+
+The flattened knowledge base and its search indexes are also saved as a binary
+snapshot next to the JSON file, so later processes skip JSON parsing and index
+building. Compile it ahead of deployment with: python kb_utils.py --compile
 """
 
+import argparse
+import hashlib
 import json
 import logging
+import math
+import mmap
 import os
-from typing import Dict, List, Optional, Any, Tuple
+import pickle
+import struct
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Any, Tuple
 from pathlib import Path
 import re
 
 logger = logging.getLogger(__name__)
 
+# Minimum share of query tokens a fuzzy match must contain
+FUZZY_MATCH_THRESHOLD = 0.4
+
+# Plant names whose resolved knowledge base key is remembered (classifier labels are a small fixed set)
+DEFAULT_RESOLUTION_CACHE_SIZE = 512
+
+# Assembled (plant, disease) advice entries kept by get_advice
+DEFAULT_ADVICE_CACHE_SIZE = 1024
+
+# Minimum weighted share of the disease name (or of the issue name) two names must have in common
+ISSUE_MATCH_THRESHOLD = 0.6
+
+# Words that say nothing about which issue a disease is
+ISSUE_STOPWORDS = frozenset({
+    "a", "an", "and", "by", "disease", "due", "from", "in", "infection", "infestation",
+    "issue", "of", "on", "or", "plant", "problem", "the", "to", "with"
+})
+
+# Variants mapped to one canonical token (plurals are folded separately)
+ISSUE_SYNONYMS = {
+    "leaves": "leaf", "foliage": "leaf", "frond": "leaf",
+    "spotting": "spot", "spotted": "spot", "lesion": "spot", "speck": "spot",
+    "fungus": "fungal", "fungi": "fungal",
+    "bacteria": "bacterial", "bacterium": "bacterial",
+    "yellowing": "yellow", "yellowed": "yellow", "chlorosis": "yellow", "chlorotic": "yellow",
+    "browning": "brown", "browned": "brown",
+    "wilting": "wilt", "wilted": "wilt", "drooping": "wilt", "droop": "wilt", "droopy": "wilt",
+    "rotting": "rot", "rotten": "rot",
+    "sunburn": "burn", "sunscald": "burn", "scald": "burn", "scorch": "burn", "burnt": "burn", "burned": "burn",
+    "whiteflies": "whitefly", "mealy": "mealybug",
+    "insect": "pest", "bug": "pest",
+    "overwatered": "overwatering", "waterlogged": "overwatering", "waterlogging": "overwatering",
+    "soggy": "overwatering",
+    "underwatered": "underwatering", "drought": "underwatering", "dehydration": "underwatering",
+    "dehydrated": "underwatering",
+    "deficient": "deficiency", "nutrition": "nutrient", "nutritional": "nutrient",
+    "humid": "humidity",
+    "etiolation": "leggy", "etiolated": "leggy", "stretching": "leggy",
+    "bloom": "flower", "blooming": "flower", "flowering": "flower", "blossom": "flower",
+    "dropping": "drop", "falling": "drop"
+}
+
+# Multi-word names rewritten before tokenizing, where the words alone would
+# mislead (singular form; a plural "s" on the last word is accepted)
+ISSUE_PHRASES = {
+    "fungus gnat": "gnat pest"
+}
+
+_WORD_RE = re.compile(r"[a-z]+")
+_ISSUE_PHRASE_RE = re.compile(
+    r"\b(" + "|".join(r"[\s\-]+".join(phrase.split()) for phrase in ISSUE_PHRASES) + r")s?\b"
+)
+
+# Bump whenever the indexes built by _build_index change shape
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".kbsnap"
+SNAPSHOT_MAGIC = b"PLANTKB\0"
+
+# Magic, version, source size, source mtime (ns), source SHA-256, index fingerprint
+_SNAPSHOT_HEADER = struct.Struct("<8sIQq32s32s")
+
+# Matching tables baked into the issue index; editing them invalidates old snapshots
+_INDEX_FINGERPRINT = hashlib.sha256(repr((
+    SNAPSHOT_VERSION, sorted(ISSUE_SYNONYMS.items()), sorted(ISSUE_PHRASES.items()), sorted(ISSUE_STOPWORDS)
+)).encode("utf-8")).digest()
+
+# Instance state saved in a snapshot
+_SNAPSHOT_ATTRIBUTES = (
+    "knowledge_base", "_plant_keys", "_lower_names", "_lower_ids", "_normalized_ids",
+    "_word_index", "_token_index", "_anchor_index",
+    "_unknown_issue_weight", "_issue_weights", "_issue_index"
+)
+
 
 def _normalize_plant_name(name: str) -> str:
     """
@@ -40,6 +125,53 @@ def _normalize_plant_name(name: str) -> str:
     return name
 
 
+def _issue_tokens(name: str) -> FrozenSet[str]:
+    """
+    Normalize an issue or disease name to a set of canonical tokens.
+    
+    Word order, punctuation, plurals and common phrasings are ignored, so
+    "fungal leaf spots" and "Leaf Spot (Fungal)" give the same tokens, while
+    "Fungus Gnats" is read as a pest rather than as a fungal disease.
+    """
+    name = _ISSUE_PHRASE_RE.sub(
+        lambda match: f" {ISSUE_PHRASES[' '.join(_WORD_RE.findall(match.group(1)))]} ", name.lower()
+    )
+    tokens = set()
+    for word in _WORD_RE.findall(name):
+        word = ISSUE_SYNONYMS.get(word, word)
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = ISSUE_SYNONYMS.get(word[:-1], word[:-1])
+        if word not in ISSUE_STOPWORDS:
+            tokens.add(word)
+    return frozenset(tokens)
+
+
+class _IssueIndex:
+    """Issues of one plant with their tokens, indexed for matching disease names."""
+    
+    __slots__ = ("names", "tokens", "weights", "exact", "postings")
+    
+    def __init__(self, names: List[str], tokens: List[FrozenSet[str]], weights: List[float]):
+        self.names = names
+        self.tokens = tokens
+        self.weights = weights
+        # Token set -> first issue with exactly those tokens
+        self.exact: Dict[FrozenSet[str], int] = {}
+        # Token -> issue positions in knowledge base order
+        self.postings: Dict[str, List[int]] = {}
+        for position, issue_tokens in enumerate(tokens):
+            if issue_tokens:
+                self.exact.setdefault(issue_tokens, position)
+            for token in issue_tokens:
+                self.postings.setdefault(token, []).append(position)
+
+
+def _unique(items: List[str], fallback: str) -> List[str]:
+    """Remove duplicates preserving order, or return [fallback] if nothing is left."""
+    unique_items = list(dict.fromkeys(items))
+    return unique_items if unique_items else [fallback]
+
+
 class PlantKnowledgeBase:
     """
     Knowledge base manager for plant care information.
@@ -47,15 +179,33 @@ class PlantKnowledgeBase:
     This class handles loading and querying plant-specific information from
     the JSON knowledge base including care instructions, common issues,
     symptoms, and treatment recommendations.
+    
+    Resolved plant names are kept in a bounded LRU cache, so the classifier's
+    labels are matched against the knowledge base once rather than on every
+    lookup. Advice assembled by get_advice is memoized per (plant, disease)
+    pair. Both caches are cleared whenever the knowledge base is (re)loaded.
+    
+    The parsed knowledge base and its indexes are loaded from a snapshot file
+    when one matches the JSON file (same size and mtime, or same SHA-256), and
+    the snapshot is rewritten after every load from JSON. Snapshots are
+    pickles, trusted like the code shipped next to them.
     """
     
-    def __init__(self, kb_file_path: Optional[str] = None):
+    def __init__(self, kb_file_path: Optional[str] = None,
+                 resolution_cache_size: int = DEFAULT_RESOLUTION_CACHE_SIZE,
+                 advice_cache_size: int = DEFAULT_ADVICE_CACHE_SIZE,
+                 use_snapshot: bool = True, snapshot_path: Optional[str] = None):
         """
         Initialize the plant knowledge base.
         
         Args:
             kb_file_path (Optional[str]): Path to the knowledge base JSON file.
                                         If None, uses default path.
+            resolution_cache_size (int): Plant names whose resolution is cached (0 disables it)
+            advice_cache_size (int): (plant, disease) advice entries memoized (0 disables it)
+            use_snapshot (bool): Load from and maintain the binary snapshot
+            snapshot_path (Optional[str]): Snapshot file. If None, the JSON path
+                                          with a .kbsnap suffix.
         """
         if kb_file_path is None:
             # Default to the data directory
@@ -63,12 +213,26 @@ class PlantKnowledgeBase:
             kb_file_path = current_dir / "data" / "Plants_KB_Plant_Doc.json"
         
         self.kb_file_path = Path(kb_file_path)
+        self.snapshot_path = None
+        if use_snapshot:
+            self.snapshot_path = Path(snapshot_path) if snapshot_path else self.kb_file_path.with_suffix(SNAPSHOT_SUFFIX)
+        self.loaded_from_snapshot = False
+        self._source_signature: Optional[Tuple[int, int, bytes]] = None
         self.knowledge_base = {}
+        self.resolution_cache_size = resolution_cache_size
+        self._resolutions: "OrderedDict[str, Optional[Tuple[str, float]]]" = OrderedDict()
+        self._resolution_lock = threading.Lock()
+        self.resolution_hits = 0
+        self.resolution_misses = 0
+        self.advice_cache_size = advice_cache_size
+        self._advice: "OrderedDict[Tuple[str, float, str], Dict[str, Any]]" = OrderedDict()
+        self.advice_hits = 0
+        self.advice_misses = 0
         self.load_knowledge_base()
     
     def load_knowledge_base(self) -> None:
         """
-        Load the plant knowledge base from JSON file.
+        Load the plant knowledge base from its snapshot, or from the JSON file.
         
         Raises:
             FileNotFoundError: If the knowledge base file doesn't exist
@@ -78,24 +242,43 @@ class PlantKnowledgeBase:
             if not self.kb_file_path.exists():
                 raise FileNotFoundError(f"Knowledge base file not found: {self.kb_file_path}")
             
-            with open(self.kb_file_path, 'r', encoding='utf-8') as file:
-                raw_data = json.load(file)
-
-            # The JSON file is a LIST of dicts, each containing many plants.
-            # Flatten into a single dict: {plant_name: plant_data}
-            kb: Dict[str, Any] = {}
-            if isinstance(raw_data, list):
-                for block in raw_data:
-                    if isinstance(block, dict):
-                        kb.update(block)
-            elif isinstance(raw_data, dict):
-                kb = raw_data
-            else:
-                raise ValueError("Unexpected knowledge base JSON structure")
+            source_stat = self.kb_file_path.stat()
+            self.loaded_from_snapshot = self.snapshot_path is not None and self._load_snapshot(source_stat)
+            if not self.loaded_from_snapshot:
+                raw_bytes = self.kb_file_path.read_bytes()
+                raw_data = json.loads(raw_bytes.decode('utf-8'))
+
+                # The JSON file is a LIST of dicts, each containing many plants.
+                # Flatten into a single dict: {plant_name: plant_data}
+                kb: Dict[str, Any] = {}
+                if isinstance(raw_data, list):
+                    for block in raw_data:
+                        if isinstance(block, dict):
+                            kb.update(block)
+                elif isinstance(raw_data, dict):
+                    kb = raw_data
+                else:
+                    raise ValueError("Unexpected knowledge base JSON structure")
 
-            self.knowledge_base = kb
+                self.knowledge_base = kb
+                self._build_index()
+                self._source_signature = (
+                    source_stat.st_size, source_stat.st_mtime_ns, hashlib.sha256(raw_bytes).digest()
+                )
+                if self.snapshot_path is not None:
+                    try:
+                        self.save_snapshot()
+                    except OSError as e:
+                        # e.g. a read-only deployment filesystem; the JSON is still loaded
+                        logger.warning(f"Could not write knowledge base snapshot {self.snapshot_path}: {str(e)}")
+            
+            # Resolutions and advice point at the previous knowledge base
+            with self._resolution_lock:
+                self._resolutions.clear()
+                self._advice.clear()
             
-            logger.info(f"Loaded knowledge base with {len(self.knowledge_base)} plants from {self.kb_file_path}")
+            source = self.snapshot_path if self.loaded_from_snapshot else self.kb_file_path
+            logger.info(f"Loaded knowledge base with {len(self.knowledge_base)} plants from {source}")
             
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse knowledge base JSON: {str(e)}")
@@ -104,12 +287,233 @@ class PlantKnowledgeBase:
             logger.error(f"Failed to load knowledge base: {str(e)}")
             raise
     
+    def _load_snapshot(self, source_stat: os.stat_result) -> bool:
+        """
+        Load the knowledge base and its indexes from the snapshot if it matches the JSON file.
+        
+        The snapshot is memory-mapped and unpickled straight from the mapping.
+        A size and mtime match is trusted; otherwise the JSON file is hashed,
+        so fresh checkouts and deployments (which reset mtimes) still hit, and
+        the header is updated with the new mtime.
+        
+        Args:
+            source_stat (os.stat_result): Current stat of the JSON file
+            
+        Returns:
+            bool: True if the snapshot was loaded, False if it is missing or stale
+        """
+        try:
+            with open(self.snapshot_path, 'rb') as file, \
+                    mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if len(mapped) < _SNAPSHOT_HEADER.size:
+                    return False
+                magic, version, size, mtime_ns, digest, fingerprint = _SNAPSHOT_HEADER.unpack_from(mapped)
+                if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or fingerprint != _INDEX_FINGERPRINT:
+                    logger.info(f"Knowledge base snapshot {self.snapshot_path} was built by another version")
+                    return False
+                if size != source_stat.st_size:
+                    return False
+                if mtime_ns != source_stat.st_mtime_ns and \
+                        hashlib.sha256(self.kb_file_path.read_bytes()).digest() != digest:
+                    logger.info(f"Knowledge base snapshot {self.snapshot_path} is stale")
+                    return False
+                with memoryview(mapped) as view, view[_SNAPSHOT_HEADER.size:] as payload:
+                    state = pickle.loads(payload)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable knowledge base snapshot {self.snapshot_path}: {str(e)}")
+            return False
+        
+        for name in _SNAPSHOT_ATTRIBUTES:
+            setattr(self, name, state[name])
+        if mtime_ns != source_stat.st_mtime_ns:
+            self._refresh_snapshot_header(source_stat, digest)
+        self._source_signature = (size, source_stat.st_mtime_ns, digest)
+        return True
+    
+    def save_snapshot(self) -> Path:
+        """
+        Write the knowledge base and its indexes to the snapshot file.
+        
+        The file is written under a temporary name and renamed into place, so
+        concurrent workers never read a partial snapshot.
+        
+        Returns:
+            Path: The snapshot file
+            
+        Raises:
+            OSError: If the snapshot cannot be written
+        """
+        snapshot_path = self.snapshot_path or self.kb_file_path.with_suffix(SNAPSHOT_SUFFIX)
+        size, mtime_ns, digest = self._source_signature
+        header = _SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, size, mtime_ns, digest, _INDEX_FINGERPRINT)
+        
+        # Open the file before serializing, so read-only filesystems fail fast
+        temp_path = snapshot_path.with_name(f"{snapshot_path.name}.{os.getpid()}.tmp")
+        try:
+            with open(temp_path, 'wb') as file:
+                file.write(header)
+                pickle.dump({name: getattr(self, name) for name in _SNAPSHOT_ATTRIBUTES}, file,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+                snapshot_size = file.tell()
+            os.replace(temp_path, snapshot_path)
+        except OSError:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        logger.info(f"Wrote knowledge base snapshot {snapshot_path} ({snapshot_size} bytes)")
+        return snapshot_path
+    
+    def _refresh_snapshot_header(self, source_stat: os.stat_result, digest: bytes) -> None:
+        """
+        Record the JSON file's current mtime in the snapshot header.
+        
+        Called after the snapshot matched by hash only (e.g. after a checkout
+        reset the mtime), so later starts match on size and mtime again
+        instead of hashing the JSON. The payload is left untouched.
+        """
+        header = _SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, source_stat.st_size,
+                                       source_stat.st_mtime_ns, digest, _INDEX_FINGERPRINT)
+        try:
+            with open(self.snapshot_path, 'r+b') as file:
+                file.write(header)
+        except OSError as e:
+            logger.debug(f"Could not refresh knowledge base snapshot header {self.snapshot_path}: {str(e)}")
+    
+    def _build_index(self) -> None:
+        """
+        Precompute the name lookups used by search_plant.
+        
+        Plants are numbered in knowledge base order, and every posting list
+        holds plant IDs in ascending order, so lookups can return the first
+        matching plant without scanning the others:
+        - lowercase and normalized names mapped to the first plant with that name
+        - word -> plants whose lowercase key contains the word (substring matching)
+        - normalized token -> plants whose normalized name contains it (fuzzy matching)
+        - rarest word of each key -> plants (finds keys contained in a query)
+        """
+        self._plant_keys = list(self.knowledge_base.keys())
+        self._lower_names = [plant_key.lower() for plant_key in self._plant_keys]
+        self._lower_ids: Dict[str, int] = {}
+        self._normalized_ids: Dict[str, int] = {}
+        self._word_index: Dict[str, Dict[int, None]] = {}
+        self._token_index: Dict[str, Dict[int, None]] = {}
+        key_words = []
+        
+        for plant_id, plant_key in enumerate(self._plant_keys):
+            self._lower_ids.setdefault(self._lower_names[plant_id], plant_id)
+            key_norm = _normalize_plant_name(plant_key)
+            if key_norm:
+                self._normalized_ids.setdefault(key_norm, plant_id)
+            for token in set(key_norm.split()):
+                self._token_index.setdefault(token, {})[plant_id] = None
+            words = set(_WORD_RE.findall(self._lower_names[plant_id]))
+            for word in words:
+                self._word_index.setdefault(word, {})[plant_id] = None
+            key_words.append(words)
+        
+        self._anchor_index: Dict[str, Dict[int, None]] = {}
+        for plant_id, words in enumerate(key_words):
+            if words:
+                anchor = min(sorted(words), key=lambda word: len(self._word_index[word]))
+                self._anchor_index.setdefault(anchor, {})[plant_id] = None
+        
+        self._build_issue_index()
+    
+    def _build_issue_index(self) -> None:
+        """
+        Precompute the issue lookups used to match disease names.
+        
+        Tokens are weighted by inverse document frequency over every issue in
+        the knowledge base, so generic words such as "leaf" count for less than
+        specific ones such as "mildew". Tokens never seen in an issue name get
+        the highest weight.
+        """
+        issue_tokens = {
+            plant_key: [_issue_tokens(issue_name) for issue_name in plant_data]
+            for plant_key, plant_data in self.knowledge_base.items()
+        }
+        document_frequency: Dict[str, int] = {}
+        total_issues = 0
+        for token_sets in issue_tokens.values():
+            for tokens in token_sets:
+                total_issues += 1
+                for token in tokens:
+                    document_frequency[token] = document_frequency.get(token, 0) + 1
+        
+        self._unknown_issue_weight = math.log(1 + max(total_issues, 1))
+        self._issue_weights: Dict[str, float] = {
+            token: math.log(1 + total_issues / count) for token, count in document_frequency.items()
+        }
+        self._issue_index: Dict[str, _IssueIndex] = {
+            plant_key: _IssueIndex(
+                list(self.knowledge_base[plant_key]),
+                token_sets,
+                [self._token_weight(tokens) for tokens in token_sets]
+            )
+            for plant_key, token_sets in issue_tokens.items()
+        }
+    
+    def _token_weight(self, tokens: Iterable[str]) -> float:
+        """Sum of the issue-matching weights of some tokens."""
+        return sum(self._issue_weights.get(token, self._unknown_issue_weight) for token in tokens)
+    
+    def _direct_match(self, plant_name_lower: str) -> Optional[str]:
+        """
+        Find the first plant whose lowercase key equals, contains or is contained in the query.
+        
+        Only keys sharing a whole word with the query are compared, so a query
+        that ends mid-word (e.g. "potho") falls through to fuzzy matching.
+        
+        Args:
+            plant_name_lower (str): Lowercased, stripped query
+            
+        Returns:
+            Optional[str]: Matching knowledge base key, or None
+        """
+        matches = []
+        exact_id = self._lower_ids.get(plant_name_lower)
+        if exact_id is not None:
+            matches.append(exact_id)
+        
+        words = set(_WORD_RE.findall(plant_name_lower))
+        if words:
+            # Query inside a key: the key has every query word
+            postings = [self._word_index.get(word, {}) for word in words]
+            for plant_id in min(postings, key=len):
+                if (all(plant_id in posting for posting in postings)
+                        and plant_name_lower in self._lower_names[plant_id]):
+                    matches.append(plant_id)
+                    break
+            # Key inside the query: the key's rarest word is a query word
+            for word in words:
+                for plant_id in self._anchor_index.get(word, ()):
+                    if self._lower_names[plant_id] in plant_name_lower:
+                        matches.append(plant_id)
+                        break
+        
+        return self._plant_keys[min(matches)] if matches else None
+    
     def _best_fuzzy_match(self, plant_name: str) -> Tuple[Optional[str], float]:
         """
         Find the best fuzzy match for a plant name in the knowledge base.
         
+        Only plants sharing a normalized token with the query are considered.
+        The score is the larger of the token Jaccard similarity and the share of
+        query tokens the plant contains; as a plant's token set always covers the
+        shared tokens, the second never falls below the first, so the best match
+        is the first plant (in knowledge base order) sharing the most tokens.
+        
+        Shared tokens are counted in one pass over the query tokens' posting
+        lists, so the cost grows with the postings read, not with the number
+        of query tokens.
+        
         Returns:
-            (best_key, score) where score is between 0 and 1
+            (best_key, score) where score is between 0 and 1, or (None, 0.0)
+            when no plant reaches FUZZY_MATCH_THRESHOLD
         """
         if not plant_name or not isinstance(plant_name, str):
             return None, 0.0
@@ -118,40 +522,105 @@ class PlantKnowledgeBase:
         if not target_norm:
             return None, 0.0
 
-        target_tokens = set(target_norm.split())
-        best_key = None
-        best_score = 0.0
-
-        for plant_key in self.knowledge_base.keys():
-            key_norm = _normalize_plant_name(plant_key)
-            if not key_norm:
-                continue
+        # Exact normalized match
+        exact_id = self._normalized_ids.get(target_norm)
+        if exact_id is not None:
+            return self._plant_keys[exact_id], 1.0
 
-            key_tokens = set(key_norm.split())
-            if not key_tokens:
-                continue
-
-            # Exact normalized match
-            if target_norm == key_norm:
-                return plant_key, 1.0
+        target_tokens = set(target_norm.split())
+        postings = sorted((self._token_index[token] for token in target_tokens if token in self._token_index),
+                          key=len)
 
-            # Token-based Jaccard similarity
-            intersection = target_tokens & key_tokens
-            union = target_tokens | key_tokens
-            if not union:
-                continue
-            jaccard = len(intersection) / len(union)
+        # Count shared tokens per plant, rarest tokens first; stop once even the
+        # leading plant could not reach the threshold with every remaining token
+        shared_counts = Counter()
+        best_count = 0
+        for position, posting in enumerate(postings):
+            if (best_count + len(postings) - position) / len(target_tokens) < FUZZY_MATCH_THRESHOLD:
+                return None, 0.0
+            shared_counts.update(posting.keys())
+            best_count = max(best_count, max(shared_counts[plant_id] for plant_id in posting))
 
-            # Boost score if any token matches strongly (e.g., "pothos")
-            token_overlap = len(intersection) / max(len(target_tokens), 1)
-            score = max(jaccard, token_overlap)
+        if best_count / len(target_tokens) >= FUZZY_MATCH_THRESHOLD:
+            # Ties go to the earliest plant
+            best_id = min(plant_id for plant_id, count in shared_counts.items() if count == best_count)
+            return self._plant_keys[best_id], best_count / len(target_tokens)
 
-            if score > best_score:
-                best_score = score
-                best_key = plant_key
+        return None, 0.0
 
-        return best_key, best_score
+    def _resolve(self, plant_name: str) -> Optional[Tuple[str, float]]:
+        """
+        Match a plant name against the knowledge base keys.
+        
+        Args:
+            plant_name (str): Name of the plant to resolve
+            
+        Returns:
+            Optional[Tuple[str, float]]: Matching key and match confidence, or None
+        """
+        # First try simple exact / substring match through the word index
+        plant_name_lower = plant_name.lower().strip()
+        plant_key = self._direct_match(plant_name_lower)
+        if plant_key is not None:
+            logger.info(f"Found direct plant match: {plant_key}")
+            return plant_key, 1.0
 
+        # Fuzzy match using normalized names (handles aliases like Golden Pothos vs Pothos)
+        best_key, score = self._best_fuzzy_match(plant_name)
+        if best_key and score >= FUZZY_MATCH_THRESHOLD:  # threshold to avoid bad matches
+            logger.info(f"Found fuzzy plant match: '{plant_name}' -> '{best_key}' (score: {score:.2f})")
+            return best_key, float(score)
+        
+        logger.warning(f"No plant found matching: {plant_name}")
+        return None
+    
+    def resolve_plant_name(self, plant_name: str) -> Optional[Tuple[str, float]]:
+        """
+        Resolve a plant name to its knowledge base key, using the resolution cache.
+        
+        Matching only depends on the lowercased, stripped name, so that is the
+        cache key. Names that match nothing are cached as well.
+        
+        Args:
+            plant_name (str): Name of the plant (typically a classifier label)
+            
+        Returns:
+            Optional[Tuple[str, float]]: Matching key and match confidence, or None
+        """
+        if self.resolution_cache_size <= 0:
+            return self._resolve(plant_name)
+        
+        cache_key = plant_name.lower().strip()
+        with self._resolution_lock:
+            if cache_key in self._resolutions:
+                self._resolutions.move_to_end(cache_key)
+                self.resolution_hits += 1
+                return self._resolutions[cache_key]
+            self.resolution_misses += 1
+        
+        resolution = self._resolve(plant_name)
+        with self._resolution_lock:
+            self._resolutions[cache_key] = resolution
+            self._resolutions.move_to_end(cache_key)
+            while len(self._resolutions) > self.resolution_cache_size:
+                self._resolutions.popitem(last=False)
+        return resolution
+    
+    def prewarm(self, plant_names: Iterable[str]) -> int:
+        """
+        Resolve plant names ahead of time so their first lookups are cache hits.
+        
+        Args:
+            plant_names (Iterable[str]): Names to resolve, e.g. the classifier's class labels
+            
+        Returns:
+            int: How many of the names matched a knowledge base plant
+        """
+        plant_names = [name for name in plant_names if name and isinstance(name, str)]
+        found = sum(1 for name in plant_names if self.resolve_plant_name(name) is not None)
+        logger.info(f"Pre-resolved {len(plant_names)} plant names ({found} found in knowledge base)")
+        return found
+    
     def search_plant(self, plant_name: str) -> Optional[Dict[str, Any]]:
         """
         Search for plant information by name (case-insensitive partial matching).
@@ -165,63 +634,77 @@ class PlantKnowledgeBase:
         if not plant_name or not isinstance(plant_name, str):
             return None
         
-        # First try simple exact / substring match for speed
-        plant_name_lower = plant_name.lower().strip()
-        
-        for plant_key, plant_data in self.knowledge_base.items():
-            plant_key_lower = plant_key.lower()
-            
-            if (plant_name_lower == plant_key_lower or 
-                plant_name_lower in plant_key_lower or
-                plant_key_lower in plant_name_lower):
-                
-                logger.info(f"Found direct plant match: {plant_key}")
-                return {
-                    "plant_name": plant_key,
-                    "plant_data": plant_data,
-                    "match_confidence": 1.0
-                }
-
-        # Fuzzy match using normalized names (handles aliases like Golden Pothos vs Pothos)
-        best_key, score = self._best_fuzzy_match(plant_name)
-        if best_key and score >= 0.4:  # threshold to avoid bad matches
-            logger.info(f"Found fuzzy plant match: '{plant_name}' -> '{best_key}' (score: {score:.2f})")
-            return {
-                "plant_name": best_key,
-                "plant_data": self.knowledge_base[best_key],
-                "match_confidence": float(score)
-            }
+        resolution = self.resolve_plant_name(plant_name)
+        if resolution is None:
+            return None
         
-        logger.warning(f"No plant found matching: {plant_name}")
-        return None
+        plant_key, match_confidence = resolution
+        return {
+            "plant_name": plant_key,
+            "plant_data": self.knowledge_base[plant_key],
+            "match_confidence": match_confidence
+        }
     
-    def get_plant_care_info(self, plant_name: str) -> Dict[str, Any]:
+    def _match_issue(self, plant_key: str, disease_name: str) -> Optional[str]:
         """
-        Get comprehensive care information for a specific plant.
+        Find the knowledge base issue describing a disease.
+        
+        Only issues sharing a token with the disease name are scored. The score
+        is the weighted share of the disease name found in the issue name, or
+        of the issue name found in the disease name, whichever is larger (the
+        token counterpart of the old two-way substring test). Ties go to the
+        closer overall match (weighted Dice), then to the first issue in
+        knowledge base order.
         
         Args:
-            plant_name (str): Name of the plant
+            plant_key (str): Knowledge base key of the plant
+            disease_name (str): Disease name reported by the detector
             
         Returns:
-            Dict[str, Any]: Plant care information including:
-                - plant_name: The matched plant name
-                - common_issues: List of common issues and their details
-                - general_care: General care recommendations
-                - found: Boolean indicating if plant was found
+            Optional[str]: The best matching issue name, or None if none scores
+                           at least ISSUE_MATCH_THRESHOLD
         """
-        plant_info = self.search_plant(plant_name)
+        query = _issue_tokens(disease_name)
+        if not query:
+            return None
         
-        if not plant_info:
-            return {
-                "plant_name": plant_name,
-                "common_issues": [],
-                "general_care": "No specific care information available for this plant.",
-                "found": False,
-                "confidence": 0.0
-            }
+        index = self._issue_index[plant_key]
+        exact = index.exact.get(query)
+        if exact is not None:
+            return index.names[exact]
+        
+        query_weight = self._token_weight(query)
+        candidates = sorted({position for token in query for position in index.postings.get(token, ())})
+        best_position, best_rank = None, None
+        for position in candidates:
+            shared = self._token_weight(query & index.tokens[position])
+            issue_weight = index.weights[position]
+            containment = max(shared / query_weight, shared / issue_weight)
+            if containment < ISSUE_MATCH_THRESHOLD:
+                continue
+            rank = (containment, 2 * shared / (query_weight + issue_weight))
+            if best_rank is None or rank > best_rank:
+                best_position, best_rank = position, rank
+        
+        if best_position is None:
+            return None
+        logger.debug(f"Issue match for '{disease_name}': '{index.names[best_position]}' (score: {best_rank[0]:.2f})")
+        return index.names[best_position]
+    
+    def _build_advice(self, plant_key: str, match_confidence: float,
+                      disease_name: Optional[str]) -> Dict[str, Any]:
+        """
+        Assemble care info, treatments and prevention tips for a resolved plant.
         
-        plant_data = plant_info["plant_data"]
-        match_confidence = float(plant_info.get("match_confidence", 1.0))
+        Args:
+            plant_key (str): Knowledge base key of the plant
+            match_confidence (float): How well the queried name matched the key
+            disease_name (Optional[str]): Disease to select treatments and prevention tips for
+            
+        Returns:
+            Dict[str, Any]: Advice in the format documented on get_advice
+        """
+        plant_data = self.knowledge_base[plant_key]
         common_issues = []
         
         # Extract common issues and their details
@@ -240,12 +723,115 @@ class PlantKnowledgeBase:
             if len(common_issues) > 3:
                 general_care += f" and {len(common_issues) - 3} more."
         
+        matched_issue = None
+        if disease_name:
+            # Only the specific disease/issue - never treatments for other issues like pests
+            matched_issue = self._match_issue(plant_key, disease_name)
+            if matched_issue is None:
+                logger.warning(f"No specific advice found for disease '{disease_name}' in plant '{plant_key}'")
+                treatments = [f"No specific treatment information available for '{disease_name}' in the knowledge base."]
+                prevention_tips = [f"No specific prevention information available for '{disease_name}' in the knowledge base."]
+            else:
+                logger.info(f"Found specific advice for '{disease_name}' in issue '{matched_issue}'")
+                issue_details = plant_data[matched_issue]
+                treatments = _unique(issue_details.get("treatment", []), "No specific treatments available.")
+                prevention_tips = _unique(issue_details.get("prevention", []), "No specific prevention tips available.")
+        else:
+            # No specific disease requested: collect advice for every issue
+            treatments = _unique(
+                [tip for issue in common_issues for tip in issue["treatment"]], "No specific treatments available.")
+            prevention_tips = _unique(
+                [tip for issue in common_issues for tip in issue["prevention"]], "No specific prevention tips available.")
+        
         return {
-            "plant_name": plant_info["plant_name"],
-            "common_issues": common_issues,
-            "general_care": general_care,
+            "plant_name": plant_key,
             "found": True,
-            "confidence": match_confidence
+            "confidence": match_confidence,
+            "general_care": general_care,
+            "common_issues": common_issues,
+            "matched_issue": matched_issue,
+            "treatments": treatments,
+            "prevention_tips": prevention_tips
+        }
+    
+    def get_advice(self, plant_name: str, disease_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get everything the knowledge base knows for a diagnosis in one call.
+        
+        The plant is resolved once and the disease matched to one of its issues
+        once. Advice for found plants is memoized per (plant, disease) pair, so
+        the returned dict is shared between callers and must not be modified.
+        
+        Args:
+            plant_name (str): Name of the plant (typically a classifier label)
+            disease_name (Optional[str]): Detected disease; None for advice covering every issue
+            
+        Returns:
+            Dict[str, Any]: Advice including:
+                - plant_name: The matched plant name (the queried name if not found)
+                - found: Boolean indicating if plant was found
+                - confidence: How well the plant name matched (0.0 if not found)
+                - general_care: General care recommendations
+                - common_issues: List of common issues and their details
+                - matched_issue: Issue matching disease_name, or None
+                - treatments: Treatments for the matched issue (all issues without disease_name)
+                - prevention_tips: Prevention tips for the matched issue (all issues without disease_name)
+        """
+        resolution = self.resolve_plant_name(plant_name) if plant_name and isinstance(plant_name, str) else None
+        if resolution is None:
+            return {
+                "plant_name": plant_name,
+                "found": False,
+                "confidence": 0.0,
+                "general_care": "No specific care information available for this plant.",
+                "common_issues": [],
+                "matched_issue": None,
+                "treatments": ["No specific treatment information available for this plant."],
+                "prevention_tips": ["No specific prevention information available for this plant."]
+            }
+        
+        plant_key, match_confidence = resolution
+        if self.advice_cache_size <= 0:
+            return self._build_advice(plant_key, match_confidence, disease_name)
+        
+        cache_key = (plant_key, match_confidence, disease_name or "")
+        with self._resolution_lock:
+            advice = self._advice.get(cache_key)
+            if advice is not None:
+                self._advice.move_to_end(cache_key)
+                self.advice_hits += 1
+                return advice
+            self.advice_misses += 1
+        
+        advice = self._build_advice(plant_key, match_confidence, disease_name)
+        with self._resolution_lock:
+            self._advice[cache_key] = advice
+            self._advice.move_to_end(cache_key)
+            while len(self._advice) > self.advice_cache_size:
+                self._advice.popitem(last=False)
+        return advice
+    
+    def get_plant_care_info(self, plant_name: str) -> Dict[str, Any]:
+        """
+        Get comprehensive care information for a specific plant.
+        
+        Args:
+            plant_name (str): Name of the plant
+            
+        Returns:
+            Dict[str, Any]: Plant care information including:
+                - plant_name: The matched plant name
+                - common_issues: List of common issues and their details
+                - general_care: General care recommendations
+                - found: Boolean indicating if plant was found
+        """
+        advice = self.get_advice(plant_name)
+        return {
+            "plant_name": advice["plant_name"],
+            "common_issues": list(advice["common_issues"]),
+            "general_care": advice["general_care"],
+            "found": advice["found"],
+            "confidence": advice["confidence"]
         }
     
     def get_treatment_recommendations(self, plant_name: str, disease_name: str = None) -> List[str]:
@@ -262,37 +848,7 @@ class PlantKnowledgeBase:
         Returns:
             List[str]: List of treatment recommendations (filtered by disease if specified)
         """
-        plant_info = self.search_plant(plant_name)
-        
-        if not plant_info:
-            return ["No specific treatment information available for this plant."]
-        
-        plant_data = plant_info["plant_data"]
-        treatments = []
-        
-        if disease_name:
-            # Look for ONLY the specific disease/issue - do NOT return general treatments
-            disease_lower = disease_name.lower()
-            matched = False
-            
-            for issue_name, issue_details in plant_data.items():
-                if disease_lower in issue_name.lower() or issue_name.lower() in disease_lower:
-                    treatments.extend(issue_details.get("treatment", []))
-                    matched = True
-                    logger.info(f"Found specific treatment for '{disease_name}' in issue '{issue_name}'")
-                    break  # Only get treatments for THIS specific issue
-            
-            if not matched:
-                logger.warning(f"No specific treatment found for disease '{disease_name}' in plant '{plant_name}'")
-                return [f"No specific treatment information available for '{disease_name}' in the knowledge base."]
-        else:
-            # If no specific disease requested, collect all available treatments
-            for issue_name, issue_details in plant_data.items():
-                treatments.extend(issue_details.get("treatment", []))
-        
-        # Remove duplicates and return unique treatments
-        unique_treatments = list(dict.fromkeys(treatments))  # Preserves order while removing duplicates
-        return unique_treatments if unique_treatments else ["No specific treatments available."]
+        return list(self.get_advice(plant_name, disease_name)["treatments"])
     
     def get_prevention_tips(self, plant_name: str, disease_name: str = None) -> List[str]:
         """
@@ -305,37 +861,7 @@ class PlantKnowledgeBase:
         Returns:
             List[str]: List of prevention tips (filtered by disease if specified)
         """
-        plant_info = self.search_plant(plant_name)
-        
-        if not plant_info:
-            return ["No specific prevention information available for this plant."]
-        
-        plant_data = plant_info["plant_data"]
-        prevention_tips = []
-        
-        if disease_name:
-            # Look for ONLY the specific disease/issue
-            disease_lower = disease_name.lower()
-            matched = False
-            
-            for issue_name, issue_details in plant_data.items():
-                if disease_lower in issue_name.lower() or issue_name.lower() in disease_lower:
-                    prevention_tips.extend(issue_details.get("prevention", []))
-                    matched = True
-                    logger.info(f"Found specific prevention tips for '{disease_name}' in issue '{issue_name}'")
-                    break
-            
-            if not matched:
-                logger.warning(f"No specific prevention tips found for disease '{disease_name}' in plant '{plant_name}'")
-                return [f"No specific prevention information available for '{disease_name}' in the knowledge base."]
-        else:
-            # Collect all prevention tips
-            for issue_name, issue_details in plant_data.items():
-                prevention_tips.extend(issue_details.get("prevention", []))
-        
-        # Remove duplicates and return unique tips
-        unique_tips = list(dict.fromkeys(prevention_tips))  # Preserves order while removing duplicates
-        return unique_tips if unique_tips else ["No specific prevention tips available."]
+        return list(self.get_advice(plant_name, disease_name)["prevention_tips"])
     
     def list_all_plants(self) -> List[str]:
         """
@@ -356,14 +882,47 @@ class PlantKnowledgeBase:
         total_plants = len(self.knowledge_base)
         total_issues = sum(len(plant_data) for plant_data in self.knowledge_base.values())
         
+        with self._resolution_lock:
+            resolution_cache = {
+                "size": len(self._resolutions),
+                "max_entries": self.resolution_cache_size,
+                "hits": self.resolution_hits,
+                "misses": self.resolution_misses
+            }
+            advice_cache = {
+                "size": len(self._advice),
+                "max_entries": self.advice_cache_size,
+                "hits": self.advice_hits,
+                "misses": self.advice_misses
+            }
+        
         return {
             "total_plants": total_plants,
             "total_issues": total_issues,
             "kb_file_path": str(self.kb_file_path),
-            "loaded": True
+            "loaded": True,
+            "loaded_from_snapshot": self.loaded_from_snapshot,
+            "resolution_cache": resolution_cache,
+            "advice_cache": advice_cache
         }
 
 
+def compile_snapshot(kb_file_path: Optional[str] = None, snapshot_path: Optional[str] = None) -> Path:
+    """
+    Parse the knowledge base JSON and write its snapshot, e.g. as a deployment build step.
+    
+    Args:
+        kb_file_path (Optional[str]): Path to the knowledge base JSON file (default path if None)
+        snapshot_path (Optional[str]): Snapshot file (JSON path with a .kbsnap suffix if None)
+        
+    Returns:
+        Path: The snapshot file
+    """
+    kb = PlantKnowledgeBase(kb_file_path, use_snapshot=False)
+    kb.snapshot_path = Path(snapshot_path) if snapshot_path else None
+    return kb.save_snapshot()
+
+
 def main():
     """Test function for the knowledge base utilities."""
     try:
@@ -388,10 +947,25 @@ def main():
         
         treatments = kb.get_treatment_recommendations("Pothos", "overwatering")
         print(f"Pothos - Overwatering treatments: {treatments}")
-        
+
+        # Test single-call advice lookup
+        print("\n--- Testing Single-Call Advice ---")
+        advice = kb.get_advice("Pothos", "root rot")
+        print(f"Pothos - Root Rot: matched issue '{advice['matched_issue']}' "
+              f"(confidence: {advice['confidence']:.2f}), {len(advice['prevention_tips'])} prevention tips")
+        advice = kb.get_advice("Holy Basil", "fungal leaf spot")
+        print(f"Holy Basil - fungal leaf spot: matched issue '{advice['matched_issue']}'")
+
     except Exception as e:
         print(f"Error testing knowledge base: {str(e)}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Plant knowledge base utilities")
+    parser.add_argument("--compile", action="store_true", help="Write the binary knowledge base snapshot and exit")
+    parser.add_argument("--kb", help="Knowledge base JSON file (default: data/Plants_KB_Plant_Doc.json)")
+    args = parser.parse_args()
+    if args.compile:
+        print(f"Knowledge base snapshot written to {compile_snapshot(args.kb)}")
+    else:
+        main()
\ No newline at end of file
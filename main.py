@@ -1,5 +1,6 @@
 import streamlit as st
 import requests
+import json
 from datetime import datetime
 
 # Set page config
@@ -789,6 +790,65 @@ def display_disease_detection(result):
     st.markdown('</div>', unsafe_allow_html=True)
 
 
+def iter_sse_events(response):
+    """Parse a Server-Sent Events response into (event, data) pairs"""
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line:
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data_lines.append(line[len("data:"):].strip())
+            continue
+        # A blank line ends the event
+        if data_lines:
+            yield event, json.loads("\n".join(data_lines))
+        event, data_lines = "message", []
+
+
+def display_diagnosis_progress(sections):
+    """Display the diagnosis sections received so far from /diagnose/stream"""
+    
+    plant = sections.get('plant')
+    plant_name = plant.get('plant_name', 'Your Plant') if plant else '🔎 Identifying your plant...'
+    progress_html = f'<div class="result-box"><div class="plant-name">🌿 {plant_name}</div>'
+    
+    # Care advice is ready as soon as the plant is known
+    care = sections.get('care')
+    if care and care.get('kb_advice', {}).get('general_care'):
+        progress_html += f'<div class="section-header">🌱 Care basics</div><div class="info-box"><p>{care["kb_advice"]["general_care"]}</p></div>'
+    
+    # Disease analysis usually arrives last
+    disease = sections.get('disease')
+    if disease is None:
+        progress_html += '<div style="text-align: center;"><span class="status info">⏳ Checking plant health...</span></div>'
+    elif disease.get('health_status') == 'healthy':
+        progress_html += '<div style="text-align: center;"><span class="status healthy">✅ Healthy Plant</span></div>'
+    elif disease.get('health_status') == 'unhealthy':
+        disease_name = disease.get('disease_info', {}).get('disease_name') or 'Unknown issue'
+        progress_html += f'<div style="text-align: center;"><span class="status sick">⚠️ {disease_name}</span></div>'
+    
+    progress_html += '</div>'
+    st.markdown(progress_html, unsafe_allow_html=True)
+
+
+def stream_complete_diagnosis(url, files, placeholder):
+    """Run /diagnose/stream, rendering each section into placeholder as it arrives; returns the final result or None"""
+    sections = {}
+    with requests.post(f"{url}/diagnose/stream", files=files, stream=True, timeout=30) as response:
+        if response.status_code != 200:
+            return None
+        for event, data in iter_sse_events(response):
+            if event == "result":
+                return data
+            if event == "error":
+                return None
+            sections[event] = data
+            with placeholder.container():
+                display_diagnosis_progress(sections)
+    return None
+
+
 # Mode selection
 st.markdown('<div class="mode-card">', unsafe_allow_html=True)
 st.markdown("<h3>🔬 Select Analysis Mode</h3>", unsafe_allow_html=True)
@@ -834,15 +894,23 @@ with col2:
             with st.spinner(spinner_text):
                 success = False
                 result = None
+                progress = st.empty()
                 
                 # Try local API first, then fallback
                 for url in [api_url, fallback_url]:
                     try:
                         files = {"file": (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
-                        response = requests.post(f"{url}{endpoint}", files=files, timeout=30)
                         
-                        if response.status_code == 200:
-                            result = response.json()
+                        # Full diagnosis renders each section as soon as it is ready;
+                        # servers without the stream endpoint fall back to /diagnose
+                        if "Full Diagnosis" in mode:
+                            result = stream_complete_diagnosis(url, files, progress)
+                        if result is None:
+                            response = requests.post(f"{url}{endpoint}", files=files, timeout=30)
+                            if response.status_code == 200:
+                                result = response.json()
+                        
+                        if result is not None:
                             success = True
                             if url == api_url:
                                 st.markdown("""
@@ -864,6 +932,7 @@ with col2:
                         continue
                 
                 # Display results ONLY if successful
+                progress.empty()
                 if success and result:
                     
                     st.markdown('</div>', unsafe_allow_html=True)  # Close upload section
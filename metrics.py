@@ -0,0 +1,222 @@
+"""
+Prometheus Metrics for the Diagnosis Pipeline
+=============================================
+
+This module defines the process-wide Prometheus metrics exposed at /metrics:
+1. HTTP request totals, latency and in-flight requests per endpoint
+2. Per-stage latency (preprocessing, Roboflow, Groq, knowledge base) and
+   stages cut off by the diagnosis deadline
+3. Upstream in-flight calls, errors by type (401, 404, timeout, ...),
+   retries, circuit breaker rejections and hedged requests
+4. Upload and upstream payload size distributions
+5. Admission queue wait and requests shed under overload
+
+Metrics are per process; scrape every worker when running several.
+"""
+
+import re
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Covers in-memory KB lookups (ms) through slow upstream calls (tens of seconds)
+STAGE_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30)
+# 16 KiB to 16 MiB in powers of four
+PAYLOAD_SIZE_BUCKETS = tuple(16 * 1024 * 4 ** i for i in range(6))
+# Credential query parameters (Roboflow's api_key) as they appear in error messages
+SECRET_QUERY_PARAM = re.compile(r"([?&][\w.-]*(?:key|token)=)[^&#\s'\"]*", re.IGNORECASE)
+
+REQUESTS_TOTAL = Counter(
+    "plant_doctor_requests_total",
+    "HTTP requests handled",
+    ["endpoint", "method", "status"]
+)
+REQUEST_DURATION = Histogram(
+    "plant_doctor_request_duration_seconds",
+    "Time until the response headers were sent",
+    ["endpoint"],
+    buckets=STAGE_LATENCY_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "plant_doctor_requests_in_flight",
+    "HTTP requests currently being handled"
+)
+STAGE_DURATION = Histogram(
+    "plant_doctor_stage_duration_seconds",
+    "Pipeline stage latency",
+    ["stage"],
+    buckets=STAGE_LATENCY_BUCKETS
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "plant_doctor_upstream_in_flight",
+    "Upstream API calls currently in flight",
+    ["upstream"]
+)
+UPSTREAM_ERRORS = Counter(
+    "plant_doctor_upstream_errors_total",
+    "Failed upstream API calls by error type",
+    ["upstream", "error_type"]
+)
+UPSTREAM_RETRIES = Counter(
+    "plant_doctor_upstream_retries_total",
+    "Upstream requests retried after a retryable error",
+    ["upstream", "error_type"]
+)
+UPSTREAM_CIRCUIT_REJECTIONS = Counter(
+    "plant_doctor_upstream_circuit_rejections_total",
+    "Upstream calls failed fast because the circuit was open",
+    ["upstream"]
+)
+UPSTREAM_HEDGES = Counter(
+    "plant_doctor_upstream_hedged_requests_total",
+    "Duplicate upstream requests sent after the first exceeded the observed p95",
+    ["upstream"]
+)
+STAGE_DEADLINE_EXCEEDED = Counter(
+    "plant_doctor_stage_deadline_exceeded_total",
+    "Upstream stages cut off when the diagnosis deadline expired",
+    ["stage"]
+)
+STAGE_ABANDONED = Counter(
+    "plant_doctor_stage_abandoned_total",
+    "Upstream stages still running on a worker thread when the diagnosis deadline expired",
+    ["stage"]
+)
+ADMISSION_QUEUE_WAIT = Histogram(
+    "plant_doctor_admission_queue_wait_seconds",
+    "Time diagnosis requests waited for an admission slot",
+    buckets=STAGE_LATENCY_BUCKETS
+)
+ADMISSION_REJECTED = Counter(
+    "plant_doctor_admission_rejected_total",
+    "Diagnosis requests shed with 503 by admission control",
+    ["reason"]
+)
+UPLOAD_BYTES = Histogram(
+    "plant_doctor_upload_bytes",
+    "Size of accepted image uploads",
+    buckets=PAYLOAD_SIZE_BUCKETS
+)
+UPSTREAM_PAYLOAD_BYTES = Histogram(
+    "plant_doctor_upstream_payload_bytes",
+    "Size of the base64 image payload sent upstream",
+    ["upstream"],
+    buckets=PAYLOAD_SIZE_BUCKETS
+)
+
+
+def classify_upstream_error(error: Exception) -> str:
+    """
+    Map an upstream exception to a low-cardinality error type.
+
+    Args:
+        error (Exception): Exception raised by an httpx, Groq or inference SDK call
+
+    Returns:
+        str: "unauthorized", "not_found", "rate_limited", "server_error",
+             "client_error", "timeout", "connection", "other", or the error's
+             own error_type (e.g. "queue_timeout" for local rate limit waits)
+    """
+    # Errors raised before a request is sent name their own type
+    error_type = getattr(error, "error_type", None)
+    if isinstance(error_type, str):
+        return error_type
+
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if isinstance(status, int):
+        if status in (401, 403):
+            return "unauthorized"
+        if status == 404:
+            return "not_found"
+        if status == 429:
+            return "rate_limited"
+        if status >= 500:
+            return "server_error"
+        return "client_error"
+
+    # Fall back to the message checks used for inference error hints
+    name = type(error).__name__.lower()
+    message = str(error).lower()
+    if "timeout" in name or "timeout" in message or "timed out" in message:
+        return "timeout"
+    if "401" in message or "unauthorized" in message:
+        return "unauthorized"
+    if "404" in message or "not found" in message:
+        return "not_found"
+    if "connect" in name or "connection" in message:
+        return "connection"
+    return "other"
+
+
+def redact_secrets(text: str) -> str:
+    """
+    Mask credential query parameter values in text holding upstream URLs.
+
+    Args:
+        text (str): Log or error message
+
+    Returns:
+        str: The text with key and token query parameter values replaced
+    """
+    return SECRET_QUERY_PARAM.sub(r"\1[REDACTED]", text)
+
+
+def redact_upstream_error(error: Exception) -> str:
+    """
+    Render an upstream exception's message with credentials masked.
+
+    httpx puts the full request URL, query string included, into
+    HTTPStatusError messages; Roboflow authenticates with ?api_key=.
+
+    Args:
+        error (Exception): Exception raised by an upstream call
+
+    Returns:
+        str: str(error) with key and token query parameter values replaced
+    """
+    return redact_secrets(str(error))
+
+
+@contextmanager
+def observe_stage(stage: str) -> Iterator[None]:
+    """
+    Record the duration of a pipeline stage.
+
+    Args:
+        stage (str): Stage label (e.g. "preprocess", "kb")
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def track_upstream(upstream: str, payload_bytes: int = 0) -> Iterator[None]:
+    """
+    Record latency, in-flight count, payload size and errors of an upstream call.
+
+    Works around both sync and awaited calls; exceptions are counted by type
+    and re-raised.
+
+    Args:
+        upstream (str): Upstream label ("roboflow" or "groq")
+        payload_bytes (int): Size of the image payload being sent
+    """
+    if payload_bytes:
+        UPSTREAM_PAYLOAD_BYTES.labels(upstream=upstream).observe(payload_bytes)
+    in_flight = UPSTREAM_IN_FLIGHT.labels(upstream=upstream)
+    in_flight.inc()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        UPSTREAM_ERRORS.labels(upstream=upstream, error_type=classify_upstream_error(e)).inc()
+        raise
+    finally:
+        in_flight.dec()
+        STAGE_DURATION.labels(stage=upstream).observe(time.perf_counter() - start)
@@ -0,0 +1,516 @@
+"""
+Upstream Resilience
+===================
+
+This module keeps diagnosis latency stable while Roboflow or Groq degrades:
+1. A per-upstream circuit breaker fails calls fast after repeated upstream
+   failures, then half-opens to let a single probe test recovery
+2. A rolling latency window tracks each upstream's observed p95
+3. Optional hedging sends a duplicate async request once the first has been
+   running longer than the p95; the first successful answer wins
+4. Rate-limit and server errors are retried with exponential backoff and
+   jitter (or the upstream's Retry-After), within the stage's time budget
+
+Each client owns one UpstreamGuard; the shared clients in the component
+registry make the guards process-wide. Their state is served at /upstreams.
+"""
+
+import asyncio
+import functools
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+
+from metrics import (UPSTREAM_CIRCUIT_REJECTIONS, UPSTREAM_HEDGES, UPSTREAM_RETRIES, classify_upstream_error,
+                     redact_upstream_error)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Error types (see classify_upstream_error) meaning the upstream itself is unhealthy;
+# anything else (e.g. 401, 404, bad input) is an answer and keeps the circuit closed
+UNHEALTHY_ERROR_TYPES = frozenset({"server_error", "rate_limited", "timeout", "connection"})
+
+# Error types worth retrying. Timeouts are not: they already used up the stage budget
+RETRYABLE_ERROR_TYPES = frozenset({"server_error", "rate_limited", "connection"})
+
+# A retry is only made if at least this much of the stage budget is left after the wait
+MIN_RETRY_ATTEMPT_SECONDS = 0.5
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling an upstream whose circuit is open.
+
+    Attributes:
+        upstream (str): Upstream name ("roboflow" or "groq")
+        retry_after (float): Seconds until the circuit half-opens
+    """
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(
+            f"{upstream} circuit open after repeated failures; retrying in {retry_after:.1f}s"
+        )
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Thread-safe consecutive-failure circuit breaker.
+
+    States: "closed" (calls pass), "open" (calls fail fast with
+    CircuitOpenError) and "half_open" (one probe call passes; its outcome
+    closes or re-opens the circuit).
+
+    Example:
+        >>> breaker = CircuitBreaker("groq", failure_threshold=5, reset_seconds=30)
+        >>> probe = breaker.before_call()
+        >>> breaker.after_call(error, probe)  # error is None on success
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        """
+        Initialize a closed circuit.
+
+        Args:
+            name (str): Upstream name used in errors, logs and metrics
+            failure_threshold (int): Consecutive unhealthy failures that open the circuit
+            reset_seconds (float): Seconds the circuit stays open before a probe
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """
+        Admit a call or fail fast.
+
+        Returns:
+            bool: Whether the call is the half-open probe
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with its probe in flight
+        """
+        with self._lock:
+            if self.state == "closed":
+                return False
+            if self.state == "open":
+                retry_after = self.opened_at + self.reset_seconds - time.monotonic()
+                if retry_after > 0:
+                    UPSTREAM_CIRCUIT_REJECTIONS.labels(upstream=self.name).inc()
+                    raise CircuitOpenError(self.name, retry_after)
+                logger.info(f"{self.name} circuit half-open, probing upstream")
+                self.state = "half_open"
+            if self._probe_in_flight:
+                UPSTREAM_CIRCUIT_REJECTIONS.labels(upstream=self.name).inc()
+                raise CircuitOpenError(self.name, 0.0)
+            self._probe_in_flight = True
+            return True
+
+    def after_call(self, error: Optional[BaseException] = None, probe: bool = False) -> None:
+        """
+        Record the outcome of an admitted call.
+
+        Args:
+            error (Optional[BaseException]): Exception raised by the call, or None on success.
+                Cancellation is neither a success nor a failure.
+            probe (bool): The value before_call returned for this call
+        """
+        with self._lock:
+            if probe:
+                self._probe_in_flight = False
+            if error is not None and not isinstance(error, Exception):
+                return
+            if error is not None and classify_upstream_error(error) in UNHEALTHY_ERROR_TYPES:
+                self.consecutive_failures += 1
+                if probe or self.consecutive_failures >= self.failure_threshold:
+                    if self.state != "open":
+                        logger.warning(
+                            f"{self.name} circuit opened after {self.consecutive_failures} "
+                            f"consecutive failures: {redact_upstream_error(error)}"
+                        )
+                    self.state = "open"
+                    self.opened_at = time.monotonic()
+                return
+            if self.state != "closed":
+                logger.info(f"{self.name} circuit closed, upstream recovered")
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self.opened_at = None
+
+    def get_state(self) -> Dict[str, Any]:
+        """
+        Get the breaker state.
+
+        Returns:
+            Dict[str, Any]: State, consecutive failures and seconds until the next probe
+        """
+        with self._lock:
+            retry_after = None
+            if self.state == "open":
+                retry_after = round(max(0.0, self.opened_at + self.reset_seconds - time.monotonic()), 3)
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "retry_after_seconds": retry_after
+            }
+
+
+class LatencyWindow:
+    """
+    Rolling window of recent successful call latencies.
+
+    Attributes:
+        size (int): Latencies kept
+    """
+
+    def __init__(self, size: int = 200):
+        """
+        Initialize an empty window.
+
+        Args:
+            size (int): Number of most recent latencies kept
+        """
+        self.size = size
+        self._samples: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """Add a latency in seconds."""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        Get a latency percentile.
+
+        Args:
+            fraction (float): Percentile as a fraction (0.95 for p95)
+
+        Returns:
+            Optional[float]: Latency in seconds, or None if no samples yet
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Read the wait an upstream asked for in its Retry-After header.
+
+    Args:
+        error (Exception): httpx or Groq error carrying the HTTP response
+
+    Returns:
+        Optional[float]: Seconds to wait (from "retry-after-ms" or "Retry-After"
+                         as seconds or an HTTP date), or None if absent
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after-ms")
+        if value is not None:
+            return max(0.0, float(value) / 1000)
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter for retryable upstream errors.
+
+    Example:
+        >>> policy = RetryPolicy(max_retries=2, base_delay=0.25, max_delay=4.0)
+        >>> policy.next_delay(1, rate_limit_error, remaining=3.2)
+        0.17
+    """
+
+    def __init__(self, max_retries: int = 2, base_delay: float = 0.25, max_delay: float = 4.0):
+        """
+        Initialize the policy.
+
+        Args:
+            max_retries (int): Retries after the first attempt (0 disables retrying)
+            base_delay (float): Backoff ceiling in seconds for the first retry, doubled per retry
+            max_delay (float): Longest wait in seconds, including a requested Retry-After
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def next_delay(self, retry: int, error: Exception, remaining: Optional[float]) -> Optional[float]:
+        """
+        Decide whether and when to retry a failed attempt.
+
+        Args:
+            retry (int): Number of the retry being considered (1 for the first)
+            error (Exception): Error raised by the failed attempt
+            remaining (Optional[float]): Seconds left in the stage budget (None if unbounded)
+
+        Returns:
+            Optional[float]: Seconds to wait before retrying, or None to give up
+        """
+        if retry > self.max_retries or classify_upstream_error(error) not in RETRYABLE_ERROR_TYPES:
+            return None
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+        elif delay > self.max_delay:
+            return None
+        if remaining is not None and remaining - delay < MIN_RETRY_ATTEMPT_SECONDS:
+            return None
+        return delay
+
+
+class UpstreamGuard:
+    """
+    Circuit breaker, retries, latency tracking and optional hedging for one upstream.
+
+    The send callables make one request attempt and receive that attempt's
+    timeout: what is left of the stage budget, or None if it is unbounded.
+
+    Example:
+        >>> guard = UpstreamGuard("roboflow", hedge=True)
+        >>> result = guard.call(lambda timeout: http.post(..., timeout=timeout), timeout=5.0)
+        >>> result = await guard.call_async(send, timeout=5.0)  # also hedges
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0,
+        hedge: bool = False,
+        hedge_min_samples: int = 20,
+        retry_policy: Optional[RetryPolicy] = None
+    ):
+        """
+        Initialize the guard.
+
+        Args:
+            name (str): Upstream name ("roboflow" or "groq")
+            failure_threshold (int): Consecutive unhealthy failures that open the circuit
+            reset_seconds (float): Seconds the circuit stays open before a probe
+            hedge (bool): Send a duplicate async request once the first exceeds the p95
+            hedge_min_samples (int): Latencies observed before hedging starts
+            retry_policy (Optional[RetryPolicy]): Backoff for retryable errors
+                                                  (default RetryPolicy() if None)
+        """
+        self.name = name
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_seconds)
+        self.latency = LatencyWindow()
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.retries = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Get how long to wait before hedging a call.
+
+        Returns:
+            Optional[float]: The observed p95 in seconds, or None if hedging is off,
+                             the circuit is not closed or too few latencies were seen
+        """
+        if not self.hedge or self.breaker.state != "closed" or len(self.latency) < self.hedge_min_samples:
+            return None
+        return self.latency.percentile(0.95)
+
+    def call(self, send: Callable[[Optional[float]], T], timeout: Optional[float] = None) -> T:
+        """
+        Make a synchronous upstream call, retrying retryable errors within the budget.
+
+        Args:
+            send (Callable[[Optional[float]], T]): Makes one request attempt
+            timeout (Optional[float]): Stage budget in seconds for all attempts and waits
+
+        Returns:
+            T: The successful attempt's result
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+            Exception: The last attempt's error if it was not retried
+        """
+        expires_at = time.monotonic() + timeout if timeout is not None else None
+        retry = 0
+        while True:
+            try:
+                with self.guard():
+                    return send(_time_left(expires_at))
+            except Exception as e:
+                retry += 1
+                delay = self._retry_delay(retry, e, expires_at)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def call_async(self, send: Callable[[Optional[float]], Awaitable[T]],
+                         timeout: Optional[float] = None) -> T:
+        """
+        Make an async upstream call, hedging slow attempts and retrying retryable errors.
+
+        Args:
+            send (Callable[[Optional[float]], Awaitable[T]]): Starts one request attempt;
+                                                             called twice when hedged
+            timeout (Optional[float]): Stage budget in seconds for all attempts and waits
+
+        Returns:
+            T: The first successful attempt's result
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+            Exception: The last attempt's error if it was not retried
+        """
+        expires_at = time.monotonic() + timeout if timeout is not None else None
+        retry = 0
+        while True:
+            try:
+                return await self._attempt_async(functools.partial(send, _time_left(expires_at)))
+            except Exception as e:
+                retry += 1
+                delay = self._retry_delay(retry, e, expires_at)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    def _retry_delay(self, retry: int, error: Exception, expires_at: Optional[float]) -> Optional[float]:
+        """Ask the retry policy for the wait before the next attempt and count the retry."""
+        delay = self.retry_policy.next_delay(retry, error, _time_left(expires_at))
+        if delay is not None:
+            error_type = classify_upstream_error(error)
+            logger.warning(
+                f"Retrying {self.name} request in {delay * 1000:.0f}ms "
+                f"(retry {retry}/{self.retry_policy.max_retries}, {error_type}): {redact_upstream_error(error)}"
+            )
+            self.retries += 1
+            UPSTREAM_RETRIES.labels(upstream=self.name, error_type=error_type).inc()
+        return delay
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """
+        Guard one synchronous upstream attempt with the circuit breaker.
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        probe = self.breaker.before_call()
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.breaker.after_call(e, probe)
+            raise
+        self.breaker.after_call(None, probe)
+        self.latency.record(time.perf_counter() - start)
+
+    async def _attempt_async(self, send: Callable[[], Awaitable[T]]) -> T:
+        """Make one breaker-guarded async attempt, hedging it when it runs longer than the p95."""
+        probe = self.breaker.before_call()
+        start = time.perf_counter()
+        try:
+            delay = self.hedge_delay()
+            result = await (send() if delay is None else self._hedged(send, delay))
+        except BaseException as e:
+            self.breaker.after_call(e, probe)
+            raise
+        self.breaker.after_call(None, probe)
+        self.latency.record(time.perf_counter() - start)
+        return result
+
+    async def _hedged(self, send: Callable[[], Awaitable[T]], delay: float) -> T:
+        """Race the first attempt against a duplicate started after delay seconds."""
+        primary = asyncio.ensure_future(send())
+        attempts = {primary}
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if done:
+                return primary.result()
+
+            logger.info(f"Hedging {self.name} request after {delay * 1000:.0f}ms")
+            self.hedges_sent += 1
+            UPSTREAM_HEDGES.labels(upstream=self.name).inc()
+            hedge = asyncio.ensure_future(send())
+            attempts.add(hedge)
+
+            pending = set(attempts)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        if attempt is hedge:
+                            self.hedges_won += 1
+                        return attempt.result()
+                    error = attempt.exception()
+            raise error
+        finally:
+            for attempt in attempts:
+                if not attempt.done():
+                    attempt.cancel()
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get breaker, latency and hedging state.
+
+        Returns:
+            Dict[str, Any]: Circuit state, observed p50/p95 latency, hedge and retry counters
+        """
+        p50 = self.latency.percentile(0.5)
+        p95 = self.latency.percentile(0.95)
+        hedge_delay = self.hedge_delay()
+        return {
+            "circuit": self.breaker.get_state(),
+            "latency": {
+                "samples": len(self.latency),
+                "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None
+            },
+            "hedging": {
+                "enabled": self.hedge,
+                "active": hedge_delay is not None,
+                "delay_ms": round(hedge_delay * 1000, 1) if hedge_delay is not None else None,
+                "hedges_sent": self.hedges_sent,
+                "hedges_won": self.hedges_won
+            },
+            "retries": {
+                "max_retries": self.retry_policy.max_retries,
+                "retries_sent": self.retries
+            }
+        }
+
+
+def _time_left(expires_at: Optional[float]) -> Optional[float]:
+    """Seconds until a monotonic expiry time (never negative), or None if unbounded."""
+    if expires_at is None:
+        return None
+    return max(0.0, expires_at - time.monotonic())
@@ -0,0 +1,105 @@
+"""
+Test Configuration
+==================
+
+Shared setup for the unit tests:
+1. Put the project root and the "Leaf Disease" package directory on sys.path,
+   the same way app.py does, so modules import by their plain names, and
+   load the pipeline's main module before the root Streamlit main.py can
+   shadow it
+2. Provide the upstream API keys the pipeline configuration requires, and
+   keep tests from writing a snapshot next to the bundled knowledge base
+3. An "api" fixture serving app.py through a TestClient (settings are read
+   from the environment at startup, so set them with monkeypatch first)
+4. A "stub_upstreams" fixture replacing a registry's Roboflow and Groq calls
+   with canned results, so no test reaches the network
+"""
+
+import asyncio
+import base64
+import io
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+for path in (ROOT_DIR, ROOT_DIR / "Leaf Disease"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+os.environ.setdefault("GROQ_API_KEY", "test-groq-key")
+os.environ.setdefault("ROBOFLOW_API_KEY", "test-roboflow-key")
+os.environ.setdefault("KB_SNAPSHOT", "false")
+
+import main  # noqa: E402,F401  (Leaf Disease/main.py)
+
+
+@pytest.fixture
+def api():
+    from fastapi.testclient import TestClient
+    import app
+
+    with TestClient(app.app) as client:
+        yield client
+
+
+CLASSIFICATION = {"success": True, "plant_name": "Pothos", "confidence": 0.9, "predictions": []}
+DISEASE = {"disease_detected": True, "disease_name": "root rot", "disease_type": "fungal", "severity": "mild",
+           "confidence": 80, "symptoms": ["yellow leaves"], "possible_causes": [], "treatment": []}
+
+
+def jpeg_bytes(color=(0, 128, 0)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+class StubUpstreams:
+    """Sync and async Roboflow/Groq stand-ins with configurable latency."""
+
+    def __init__(self, classify_delay: float = 0.0, detect_delay: float = 0.0):
+        self.classify_delay = classify_delay
+        self.detect_delay = detect_delay
+        self.timeouts = {}
+        self.calls = 0
+
+    def classify(self, image_base64, timeout=None):
+        self.calls += 1
+        self.timeouts["classify"] = timeout
+        time.sleep(self.classify_delay)
+        return dict(CLASSIFICATION)
+
+    def detect(self, image_base64, timeout=None):
+        self.timeouts["detect"] = timeout
+        time.sleep(self.detect_delay)
+        return dict(DISEASE)
+
+    async def classify_async(self, image_base64, timeout=None):
+        self.calls += 1
+        self.timeouts["classify"] = timeout
+        await asyncio.sleep(self.classify_delay)
+        return dict(CLASSIFICATION)
+
+    async def detect_async(self, image_base64, timeout=None):
+        self.timeouts["detect"] = timeout
+        await asyncio.sleep(self.detect_delay)
+        return dict(DISEASE)
+
+
+@pytest.fixture
+def stub_upstreams(monkeypatch):
+    """Call with a registry (and optional delays) to stub its upstream clients."""
+    def stub(registry, **delays) -> StubUpstreams:
+        stubs = StubUpstreams(**delays)
+        roboflow, groq = registry.roboflow_client, registry.disease_detector
+        monkeypatch.setattr(roboflow, "classify_plant_from_base64", stubs.classify)
+        monkeypatch.setattr(roboflow, "classify_plant_from_base64_async", stubs.classify_async)
+        monkeypatch.setattr(groq, "analyze_leaf_image_base64", stubs.detect)
+        monkeypatch.setattr(groq, "analyze_leaf_image_base64_async", stubs.detect_async)
+        return stubs
+
+    return stub
@@ -0,0 +1,148 @@
+"""
+Admission Control Tests
+=======================
+
+admission.AdmissionController and the API's admission middleware:
+1. Requests beyond max_in_flight queue in FIFO order and are handed freed slots
+2. A full queue or an expired queue wait is rejected with a Retry-After estimate
+3. A waiter cancelled after being handed a slot passes it on instead of leaking it
+4. Shed diagnosis requests get 503 with Retry-After; admitted ones report their queue wait
+"""
+
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+from conftest import jpeg_bytes
+
+
+async def queued(controller: AdmissionController, count: int):
+    """Start count acquire tasks and let them join the queue."""
+    tasks = [asyncio.ensure_future(controller.acquire()) for _ in range(count)]
+    await asyncio.sleep(0)
+    return tasks
+
+
+def test_waiters_get_slots_in_fifo_order():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queued=2, queue_timeout=None)
+        first = await controller.acquire()
+        second, third = await queued(controller, 2)
+        assert controller.get_stats()["queued"] == 2
+
+        controller.release(first)
+        slot = await second
+        assert not third.done()
+        assert slot.queue_wait >= 0
+
+        controller.release(slot)
+        controller.release(slot)  # releasing twice is a no-op
+        controller.release(await third)
+        return controller.get_stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["in_flight"] == 0
+    assert stats["queued"] == 0
+    assert stats["admitted"] == 3
+
+
+def test_full_queue_is_rejected():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queued=1, queue_timeout=None)
+        await controller.acquire()
+        waiting, = await queued(controller, 1)
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await controller.acquire()
+        waiting.cancel()
+        return controller, excinfo.value
+
+    controller, rejection = asyncio.run(scenario())
+    assert rejection.reason == "queue_full"
+    assert rejection.retry_after >= 1
+    assert controller.get_stats()["rejected"] == 1
+
+
+def test_queue_wait_times_out():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queued=4, queue_timeout=0.05)
+        await controller.acquire()
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await controller.acquire()
+        return controller, excinfo.value
+
+    controller, rejection = asyncio.run(scenario())
+    assert rejection.reason == "queue_timeout"
+    assert controller.get_stats()["timed_out"] == 1
+    assert controller.get_stats()["queued"] == 0
+
+
+def test_cancelled_waiter_hands_its_slot_on():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queued=2, queue_timeout=None)
+        first = await controller.acquire()
+        second, third = await queued(controller, 2)
+
+        # The slot is handed to second, whose client goes away before it resumes
+        controller.release(first)
+        second.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await second
+
+        slot = await asyncio.wait_for(third, 1.0)
+        assert controller.in_flight == 1
+        controller.release(slot)
+        return controller
+
+    assert asyncio.run(scenario()).in_flight == 0
+
+
+def test_cancelled_queued_waiter_is_skipped():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queued=2, queue_timeout=None)
+        first = await controller.acquire()
+        second, third = await queued(controller, 2)
+
+        second.cancel()
+        await asyncio.sleep(0)
+        assert controller.get_stats()["queued"] == 1
+
+        controller.release(first)
+        controller.release(await asyncio.wait_for(third, 1.0))
+        return controller
+
+    assert asyncio.run(scenario()).in_flight == 0
+
+
+def test_retry_after_grows_with_backlog():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queued=8, queue_timeout=None)
+        controller.service_seconds = 1.5
+        await controller.acquire()
+        empty = controller.retry_after()
+        tasks = await queued(controller, 3)
+        backlog = controller.retry_after()
+        for task in tasks:
+            task.cancel()
+        return empty, backlog
+
+    assert asyncio.run(scenario()) == (2, 6)
+
+
+def test_api_sheds_with_503(api, stub_upstreams, monkeypatch):
+    registry = api.app.state.registry
+    stub_upstreams(registry)
+    image = {"file": ("leaf.jpg", jpeg_bytes(), "image/jpeg")}
+
+    response = api.post("/diagnose", files=image)
+    assert response.status_code == 200
+    assert float(response.headers["X-Queue-Wait-Ms"]) >= 0
+
+    monkeypatch.setattr(registry.admission, "max_in_flight", 0)
+    monkeypatch.setattr(registry.admission, "max_queued", 0)
+    response = api.post("/diagnose", files=image)
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    assert "Server busy" in response.json()["detail"]
+    # Status endpoints stay reachable while diagnoses are shed
+    assert api.get("/admission").json()["rejected"] == 1
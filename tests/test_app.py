@@ -0,0 +1,120 @@
+"""
+API Endpoint Tests
+==================
+
+app.py endpoints with stubbed upstream clients:
+1. Diagnosis endpoints await the async upstream clients and decode images on
+   the blocking executor, so no blocking call runs on the event loop; with
+   PIPELINE_ASYNC_CLIENTS=false the sync clients run on the executor instead
+2. /diagnose/batch streams one newline-terminated JSON object per upload, in
+   completion order, tagged with the upload's index and filename
+"""
+
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+import main
+from conftest import jpeg_bytes
+
+
+def on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+@pytest.fixture
+def blocking_calls(monkeypatch):
+    """Record whether each blocking pipeline call ran on the event loop thread."""
+    calls = []
+    prepare_image = main.prepare_image
+
+    def recording_prepare_image(*args, **kwargs):
+        calls.append(("prepare_image", on_event_loop()))
+        return prepare_image(*args, **kwargs)
+
+    monkeypatch.setattr(main, "prepare_image", recording_prepare_image)
+    return calls
+
+
+def record_sync_upstreams(monkeypatch, registry, stubs, calls) -> None:
+    def recording(name, func):
+        def call(*args, **kwargs):
+            calls.append((name, on_event_loop()))
+            return func(*args, **kwargs)
+        return call
+
+    monkeypatch.setattr(registry.roboflow_client, "classify_plant_from_base64", recording("classify", stubs.classify))
+    monkeypatch.setattr(registry.disease_detector, "analyze_leaf_image_base64", recording("detect", stubs.detect))
+
+
+@pytest.mark.parametrize("endpoint", ["/diagnose", "/plant-diagnosis"])
+def test_async_clients_keep_blocking_work_off_the_loop(api, stub_upstreams, blocking_calls, monkeypatch, endpoint):
+    registry = api.app.state.registry
+    stubs = stub_upstreams(registry)
+    record_sync_upstreams(monkeypatch, registry, stubs, blocking_calls)
+
+    response = api.post(endpoint, files={"file": ("leaf.jpg", jpeg_bytes(), "image/jpeg")})
+
+    assert response.status_code == 200
+    # Only the image decode ran synchronously; the upstream calls went through the async clients
+    assert blocking_calls == [("prepare_image", False)]
+    assert set(stubs.timeouts) == {"classify", "detect"}
+
+
+@pytest.mark.parametrize("endpoint", ["/diagnose", "/plant-diagnosis"])
+def test_sync_clients_run_on_the_blocking_executor(stub_upstreams, blocking_calls, monkeypatch, endpoint):
+    monkeypatch.setenv("PIPELINE_ASYNC_CLIENTS", "false")
+    with TestClient(app.app) as client:
+        registry = client.app.state.registry
+        stubs = stub_upstreams(registry)
+        record_sync_upstreams(monkeypatch, registry, stubs, blocking_calls)
+
+        response = client.post(endpoint, files={"file": ("leaf.jpg", jpeg_bytes(), "image/jpeg")})
+
+    assert response.status_code == 200
+    assert {name for name, _ in blocking_calls} == {"prepare_image", "classify", "detect"}
+    assert not any(loop for _, loop in blocking_calls)
+
+
+def test_batch_streams_one_ndjson_line_per_upload(api, stub_upstreams):
+    stub_upstreams(api.app.state.registry)
+    files = [
+        ("files", ("first.jpg", jpeg_bytes((0, 120, 0)), "image/jpeg")),
+        ("files", ("second.jpg", jpeg_bytes((120, 120, 0)), "image/jpeg")),
+        ("files", ("notes.txt", b"not an image", "text/plain")),
+    ]
+
+    response = api.post("/diagnose/batch", files=files)
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "application/x-ndjson"
+    assert response.content.endswith(b"\n")
+    lines = [json.loads(line) for line in response.content.split(b"\n")[:-1]]
+    assert len(lines) == 3
+    # The rejected upload needs no diagnosis, so its line is written first
+    assert lines[0] == {"index": 2, "filename": "notes.txt", "error": "File must be an image"}
+    by_index = {line["index"]: line for line in lines}
+    assert sorted(by_index) == [0, 1, 2]
+    for index, filename in ((0, "first.jpg"), (1, "second.jpg")):
+        assert by_index[index]["filename"] == filename
+        assert by_index[index]["cache_status"] == "MISS"
+        assert by_index[index]["result"]["plant_name"] == "Pothos"
+
+
+def test_batch_rejects_too_many_files(api, stub_upstreams, monkeypatch):
+    stubs = stub_upstreams(api.app.state.registry)
+    monkeypatch.setattr(api.app.state.registry.config, "batch_max_files", 1)
+    image = jpeg_bytes()
+
+    response = api.post("/diagnose/batch", files=[("files", ("a.jpg", image, "image/jpeg"))] * 2)
+
+    assert response.status_code == 400
+    assert "Too many files: 2 (maximum 1)" in response.json()["detail"]
+    assert stubs.calls == 0
@@ -0,0 +1,104 @@
+"""
+Diagnosis Cache Tests
+=====================
+
+cache.DiagnosisCache:
+1. Keys are content-addressed and namespaced
+2. Least recently used entries are evicted first
+3. Entries expire after their time-to-live
+4. Callers get copies, never the cached object
+"""
+
+import pytest
+
+import cache
+from cache import DiagnosisCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+def test_make_key_is_content_addressed():
+    key = DiagnosisCache.make_key(b"image", "diagnose", "model/1")
+    assert key == DiagnosisCache.make_key(b"image", "diagnose", "model/1")
+    assert key != DiagnosisCache.make_key(b"other image", "diagnose", "model/1")
+    assert key != DiagnosisCache.make_key(b"image", "plant-diagnosis", "model/1")
+    assert key != DiagnosisCache.make_key(b"image", "diagnose", "model/2")
+
+
+def test_lru_eviction():
+    diagnosis_cache = DiagnosisCache(max_entries=2)
+    diagnosis_cache.set("a", {"n": 1})
+    diagnosis_cache.set("b", {"n": 2})
+    assert diagnosis_cache.get("a") == {"n": 1}  # "b" is now least recently used
+
+    diagnosis_cache.set("c", {"n": 3})
+
+    assert diagnosis_cache.get("b") is None
+    assert diagnosis_cache.get("a") == {"n": 1}
+    assert diagnosis_cache.get("c") == {"n": 3}
+    assert diagnosis_cache.get_stats()["size"] == 2
+
+
+def test_ttl_expiry(clock):
+    diagnosis_cache = DiagnosisCache(ttl_seconds=60)
+    diagnosis_cache.set("a", {"n": 1})
+
+    clock.now += 59
+    assert diagnosis_cache.get("a") == {"n": 1}
+    clock.now += 1
+    assert diagnosis_cache.get("a") is None
+    assert diagnosis_cache.get_stats()["size"] == 0
+
+
+def test_overwrite_restarts_ttl(clock):
+    diagnosis_cache = DiagnosisCache(ttl_seconds=60)
+    diagnosis_cache.set("a", {"n": 1})
+    clock.now += 50
+    diagnosis_cache.set("a", {"n": 2})
+    clock.now += 50
+
+    assert diagnosis_cache.get("a") == {"n": 2}
+
+
+def test_results_are_copied():
+    diagnosis_cache = DiagnosisCache()
+    result = {"treatments": ["prune"]}
+    diagnosis_cache.set("a", result)
+    result["treatments"].append("mutated after caching")
+
+    cached = diagnosis_cache.get("a")
+    cached["treatments"].append("mutated by a caller")
+
+    assert diagnosis_cache.get("a") == {"treatments": ["prune"]}
+
+
+def test_zero_size_disables_caching():
+    diagnosis_cache = DiagnosisCache(max_entries=0)
+    diagnosis_cache.set("a", {"n": 1})
+    assert diagnosis_cache.get("a") is None
+
+
+def test_stats_count_hits_and_misses(clock):
+    diagnosis_cache = DiagnosisCache(ttl_seconds=10)
+    diagnosis_cache.set("a", {"n": 1})
+    diagnosis_cache.get("a")
+    diagnosis_cache.get("b")
+    clock.now += 10
+    diagnosis_cache.get("a")
+
+    stats = diagnosis_cache.get_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    assert stats["hit_ratio"] == pytest.approx(1 / 3)
@@ -0,0 +1,42 @@
+"""
+Diagnosis Deadline Tests
+========================
+
+deadline.Deadline:
+1. Time left counts down and never goes negative
+2. Stage budgets are capped by the time left
+3. A missing or zero deadline never expires
+"""
+
+import time
+
+import pytest
+
+from deadline import Deadline
+
+
+def test_remaining_counts_down():
+    deadline = Deadline(0.2)
+    assert 0.1 < deadline.remaining() <= 0.2
+    assert not deadline.expired
+
+    time.sleep(0.25)
+    assert deadline.remaining() == 0.0
+    assert deadline.expired
+
+
+def test_budget_is_capped_by_time_left():
+    deadline = Deadline(1.0)
+    assert deadline.budget(5.0) == pytest.approx(1.0, abs=0.05)
+    assert deadline.budget(0.5) == 0.5
+    assert deadline.budget(None) == pytest.approx(1.0, abs=0.05)
+
+
+@pytest.mark.parametrize("seconds", [None, 0])
+def test_disabled_deadline(seconds):
+    deadline = Deadline(seconds)
+    assert deadline.seconds is None
+    assert deadline.remaining() is None
+    assert deadline.budget(5.0) == 5.0
+    assert deadline.budget(None) is None
+    assert not deadline.expired
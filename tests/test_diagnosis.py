@@ -0,0 +1,85 @@
+"""
+Diagnosis Pipeline Tests
+========================
+
+PlantDiagnosisPipeline with stubbed upstream clients:
+1. A successful diagnosis combines classification, detection and knowledge base advice
+2. A failed classification does not leave disease detection running
+"""
+
+import base64
+import io
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+from config import PipelineConfig
+from diagnosis import PlantDiagnosisPipeline
+from registry import ComponentRegistry
+
+
+def jpeg_base64() -> str:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (0, 128, 0)).save(buffer, "JPEG")
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+class StubClassifier:
+    def __init__(self, error: Exception = None, after: threading.Event = None):
+        self.error = error
+        self.after = after
+
+    def classify_plant_from_base64(self, image_base64, timeout=None):
+        if self.after is not None:
+            self.after.wait(5)
+        if self.error is not None:
+            raise self.error
+        return {"success": True, "plant_name": "Pothos", "confidence": 0.9}
+
+
+class StubDetector:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.started = threading.Event()
+        self.finished = threading.Event()
+
+    def analyze_leaf_image_base64(self, image_base64, timeout=None):
+        self.started.set()
+        time.sleep(self.delay)
+        self.finished.set()
+        return {"disease_detected": True, "disease_name": "root rot", "disease_type": "fungal",
+                "severity": "mild", "confidence": 80, "symptoms": [], "possible_causes": [], "treatment": []}
+
+
+@pytest.fixture
+def pipeline():
+    registry = ComponentRegistry(PipelineConfig.from_env())
+    pipeline = PlantDiagnosisPipeline(registry=registry)
+    yield pipeline
+    registry.close()
+
+
+def test_diagnosis_combines_stages(pipeline):
+    pipeline.roboflow_client = StubClassifier()
+    pipeline.disease_detector = StubDetector()
+
+    result = pipeline.diagnose_plant(jpeg_base64())
+
+    assert result["plant_name"] == "Pothos"
+    assert result["health_status"] == "unhealthy"
+    assert result["kb_advice"]["plant_found_in_kb"]
+    assert result["treatments"]["kb_treatments"]
+
+
+def test_failed_classification_waits_for_disease_detection(pipeline):
+    detector = StubDetector(delay=0.2)
+    # Fail once detection is under way, so it can no longer be cancelled
+    pipeline.roboflow_client = StubClassifier(error=RuntimeError("classifier down"), after=detector.started)
+    pipeline.disease_detector = detector
+
+    result = pipeline.diagnose_plant(jpeg_base64())
+
+    assert "classifier down" in result["error"]
+    assert detector.finished.is_set()
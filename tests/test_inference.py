@@ -0,0 +1,106 @@
+"""
+Roboflow Client Tests
+=====================
+
+RoboflowInferenceClient's pooled HTTP clients:
+1. Threads racing on first use share one client of each kind
+2. Closing releases the clients so later calls build new ones
+3. The API key in the request URL never reaches error results or logs
+"""
+
+import asyncio
+import logging
+import threading
+import time
+
+import httpx
+import pytest
+
+import inference
+from inference import RoboflowInferenceClient
+from resilience import RetryPolicy, UpstreamGuard
+
+SECRET_KEY = "rf-secret-key-123"
+
+
+@pytest.fixture
+def slow_clients(monkeypatch):
+    """Count client constructions, slowed down to widen the first-use race."""
+    created = []
+
+    def slow(cls):
+        def factory(*args, **kwargs):
+            time.sleep(0.01)
+            client = cls(*args, **kwargs)
+            created.append(client)
+            return client
+        return factory
+
+    monkeypatch.setattr(inference.httpx, "Client", slow(httpx.Client))
+    monkeypatch.setattr(inference.httpx, "AsyncClient", slow(httpx.AsyncClient))
+    return created
+
+
+@pytest.mark.parametrize("getter", ["_get_http", "_get_async_http"])
+def test_concurrent_first_use_creates_one_client(slow_clients, getter):
+    client = RoboflowInferenceClient(api_key="test-key")
+    barrier = threading.Barrier(16)
+    results = []
+
+    def first_use():
+        barrier.wait()
+        results.append(getattr(client, getter)())
+
+    threads = [threading.Thread(target=first_use) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(slow_clients) == 1
+    assert all(result is slow_clients[0] for result in results)
+    client.close()
+    asyncio.run(client.aclose())
+
+
+def test_close_releases_clients(slow_clients):
+    client = RoboflowInferenceClient(api_key="test-key")
+    http = client._get_http()
+    async_http = client._get_async_http()
+
+    client.close()
+    asyncio.run(client.aclose())
+
+    assert http.is_closed and async_http.is_closed
+    assert client._get_http() is not http
+    client.close()
+
+
+def failing_client(status: int) -> RoboflowInferenceClient:
+    """A client whose upstream answers every request with the given status."""
+    transport = httpx.MockTransport(lambda request: httpx.Response(status, request=request))
+    client = RoboflowInferenceClient(
+        api_key=SECRET_KEY, upstream_guard=UpstreamGuard("roboflow", retry_policy=RetryPolicy(max_retries=0))
+    )
+    client._http = httpx.Client(base_url=client.API_URL, transport=transport)
+    client._async_http = httpx.AsyncClient(base_url=client.API_URL, transport=transport)
+    return client
+
+
+@pytest.mark.parametrize("status", [401, 404, 500])
+def test_api_key_never_in_errors_or_logs(caplog, status):
+    client = failing_client(status)
+    caplog.set_level(logging.DEBUG)
+
+    results = [client.classify_plant_from_base64("aGVsbG8="),
+               asyncio.run(client.classify_plant_from_base64_async("aGVsbG8="))]
+
+    for result in results:
+        assert not result["success"]
+        assert f"'{status}" in result["error"]
+        assert "api_key=[REDACTED]" in result["error"]
+        assert SECRET_KEY not in str(result)
+    assert caplog.records
+    assert SECRET_KEY not in caplog.text
+    client.close()
+    asyncio.run(client.aclose())
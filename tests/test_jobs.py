@@ -0,0 +1,128 @@
+"""
+Diagnosis Job Queue Tests
+=========================
+
+jobs.JobQueue and the /jobs API:
+1. Submitted jobs run on the workers and report their result or error
+2. A full queue refuses submissions (503 with Retry-After through the API)
+3. Finished jobs expire after their TTL
+"""
+
+import asyncio
+import time
+
+import pytest
+
+import jobs
+from conftest import jpeg_bytes
+from jobs import JobQueue, JobQueueFull
+
+
+async def wait_finished(queue: JobQueue, job_id: str):
+    for _ in range(200):
+        job = queue.get(job_id)
+        if job.finished_at is not None:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_jobs_complete_or_fail():
+    async def handler(payload):
+        if payload == "bad":
+            raise ValueError("cannot diagnose")
+        return {"echo": payload}
+
+    async def scenario():
+        queue = JobQueue(workers=2)
+        queue.start(handler)
+        good, bad = queue.submit("leaf"), queue.submit("bad")
+        assert good.status == "queued"
+        results = await wait_finished(queue, good.job_id), await wait_finished(queue, bad.job_id)
+        stats = queue.get_stats()
+        await queue.stop()
+        return results, stats
+
+    (good, bad), stats = asyncio.run(scenario())
+
+    assert good.to_dict()["result"] == {"echo": "leaf"}
+    assert good.status == "completed" and good.payload is None
+    assert bad.status == "failed"
+    assert bad.to_dict()["error"] == "cannot diagnose"
+    assert "result" not in bad.to_dict()
+    assert (stats["completed"], stats["failed"]) == (1, 1)
+
+
+def test_full_queue_refuses_jobs():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def handler(payload):
+            await release.wait()
+
+        queue = JobQueue(workers=1, max_queued=1)
+        queue.start(handler)
+        queue.submit("running")
+        await asyncio.sleep(0)  # the worker takes the first job
+        queue.submit("waiting")
+        with pytest.raises(JobQueueFull):
+            queue.submit("refused")
+        release.set()
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_submit_before_start():
+    with pytest.raises(RuntimeError):
+        JobQueue().submit("leaf")
+
+
+def test_finished_jobs_expire(monkeypatch):
+    async def scenario():
+        async def handler(payload):
+            return {}
+
+        queue = JobQueue(ttl_seconds=60)
+        queue.start(handler)
+        job = queue.submit("leaf")
+        await wait_finished(queue, job.job_id)
+        await queue.stop()
+        return queue, job
+
+    queue, job = asyncio.run(scenario())
+    now = time.time()
+    monkeypatch.setattr(jobs.time, "time", lambda: now + 59)
+    assert queue.get(job.job_id) is job
+    monkeypatch.setattr(jobs.time, "time", lambda: now + 61)
+    assert queue.get(job.job_id) is None
+
+
+def test_job_api(api, stub_upstreams):
+    stub_upstreams(api.app.state.registry)
+
+    response = api.post("/jobs", files={"file": ("leaf.jpg", jpeg_bytes(), "image/jpeg")})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert response.json()["status_url"] == f"/jobs/{job_id}"
+
+    for _ in range(200):
+        job = api.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("completed", "failed"):
+            break
+        time.sleep(0.01)
+    assert job["status"] == "completed"
+    assert job["result"]["plant_name"] == "Pothos"
+
+    assert api.get("/jobs/unknown").status_code == 404
+
+
+def test_job_api_full_queue(api, monkeypatch):
+    def refuse(payload):
+        raise JobQueueFull("Job queue is full (0 jobs waiting)")
+
+    monkeypatch.setattr(api.app.state.registry.job_queue, "submit", refuse)
+    response = api.post("/jobs", files={"file": ("leaf.jpg", jpeg_bytes(), "image/jpeg")})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
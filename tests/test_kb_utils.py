@@ -0,0 +1,319 @@
+"""
+Knowledge Base Tests
+====================
+
+Plant lookup in kb_utils.PlantKnowledgeBase:
+1. Fuzzy matching agrees with a full scan of every plant name
+2. Long multi-token queries stay cheap
+3. Disease names match the same issues as the original substring test,
+   plus reworded ones, without matching on fragments or misleading words
+4. The binary snapshot is reused only while it matches the JSON file
+5. Plant name resolutions are kept in a bounded LRU cache that a reload clears
+"""
+
+import json
+import os
+import random
+import time
+
+import pytest
+
+import kb_utils
+from kb_utils import (FUZZY_MATCH_THRESHOLD, SNAPSHOT_SUFFIX, PlantKnowledgeBase, _issue_tokens,
+                      _normalize_plant_name, compile_snapshot)
+
+ALOE_VERA = "Aloe Vera (Aloe barbadensis miller)"
+BEGONIA = "Begonia (Rex Begonia) (Begonia rex-cultorum)"
+SNAKE_PLANT = "Snake Plant (Sansevieria trifasciata / Dracaena trifasciata)"
+
+
+def reference_fuzzy_match(knowledge_base: dict, plant_name: str):
+    """Score every plant the way the original search_plant did; returns the matching key or None."""
+    target_norm = _normalize_plant_name(plant_name)
+    if not target_norm:
+        return None
+    target_tokens = set(target_norm.split())
+    best_key, best_score = None, 0.0
+    for plant_key in knowledge_base:
+        key_norm = _normalize_plant_name(plant_key)
+        if not key_norm:
+            continue
+        if target_norm == key_norm:
+            return plant_key
+        key_tokens = set(key_norm.split())
+        intersection = target_tokens & key_tokens
+        score = max(len(intersection) / len(target_tokens | key_tokens),
+                    len(intersection) / len(target_tokens))
+        if score > best_score:
+            best_key, best_score = plant_key, score
+    return best_key if best_score >= FUZZY_MATCH_THRESHOLD else None
+
+
+def reference_issue_match(plant_data: dict, disease_name: str):
+    """The original two-way substring test; returns the first matching issue or None."""
+    disease_lower = disease_name.lower()
+    for issue_name in plant_data:
+        if disease_lower in issue_name.lower() or issue_name.lower() in disease_lower:
+            return issue_name
+    return None
+
+
+@pytest.fixture(scope="module")
+def kb():
+    return PlantKnowledgeBase(use_snapshot=False)
+
+
+@pytest.fixture(scope="module")
+def vocabulary(kb):
+    return sorted({token for plant_key in kb.knowledge_base for token in _normalize_plant_name(plant_key).split()})
+
+
+def write_kb(path, plants):
+    """Write a knowledge base JSON file holding the given plant names (or name -> data dict)."""
+    if not isinstance(plants, dict):
+        plants = {plant_key: {} for plant_key in plants}
+    path.write_text(json.dumps([plants]), encoding="utf-8")
+    return path
+
+
+def test_fuzzy_match_agrees_with_full_scan(kb, vocabulary):
+    rng = random.Random(1)
+    queries = [" ".join(rng.sample(vocabulary, rng.randint(1, 4))) for _ in range(1500)]
+    queries += [plant_key.split("(")[0] + " plant" for plant_key in kb.knowledge_base]
+
+    for query in queries:
+        best_key, score = kb._best_fuzzy_match(query)
+        assert best_key == reference_fuzzy_match(kb.knowledge_base, query), query
+        assert best_key is None or score >= FUZZY_MATCH_THRESHOLD
+
+
+def test_fuzzy_match_prefers_most_shared_tokens_then_earliest_plant(tmp_path):
+    kb = PlantKnowledgeBase(write_kb(tmp_path / "kb.json", [
+        "Red Star Fern", "Blue Star Fern", "Red Star Palm Fern"
+    ]), use_snapshot=False)
+
+    assert kb._best_fuzzy_match("star fern cutting") == ("Red Star Fern", pytest.approx(2 / 3))
+    assert kb._best_fuzzy_match("palm fern red") == ("Red Star Palm Fern", 1.0)
+    assert kb._best_fuzzy_match("fern cutting pot") == (None, 0.0)
+
+
+def test_long_query_is_linear_in_query_tokens(kb, vocabulary):
+    # Every token is in the index; enumerating subsets of 40 posting lists would never finish
+    query = " ".join(vocabulary[:40])
+    started = time.perf_counter()
+    best_key, score = kb._best_fuzzy_match(query)
+    assert time.perf_counter() - started < 0.5
+    assert best_key == reference_fuzzy_match(kb.knowledge_base, query)
+
+    # A long query that still matches: one plant's tokens padded with words from other plants
+    plant_key = "Money Plant / Golden Pothos (Epipremnum aureum)"
+    tokens = _normalize_plant_name(plant_key).split()
+    padding = [token for token in vocabulary if token not in tokens][:len(tokens)]
+    query = " ".join(tokens + padding)
+    assert kb._best_fuzzy_match(query) == (plant_key, pytest.approx(len(tokens) / (2 * len(tokens))))
+    assert reference_fuzzy_match(kb.knowledge_base, query) == plant_key
+
+
+def test_issue_match_keeps_substring_matches(kb):
+    issue_names = {issue_name for plant_data in kb.knowledge_base.values() for issue_name in plant_data}
+    queries = issue_names | {"Root Rot", "Powdery mildew", "spider mites", "Overwatering", "Leaf Spot", "Rust"}
+
+    for plant_key, plant_data in kb.knowledge_base.items():
+        for query in queries:
+            expected = reference_issue_match(plant_data, query)
+            if expected is not None:
+                assert kb._match_issue(plant_key, query) == expected, (plant_key, query)
+
+
+@pytest.mark.parametrize("disease_name, issue_name", [
+    ("fungal leaf spots", "Leaf Spot (Fungal)"),
+    ("Leaf spot fungus", "Leaf Spot (Fungal)"),
+    ("Spotted leaves", "Leaf Spot (Fungal)"),
+])
+def test_issue_match_ignores_wording(kb, disease_name, issue_name):
+    assert kb._match_issue("Holy Basil (Ocimum tenuiflorum)", disease_name) == issue_name
+
+
+@pytest.mark.parametrize("disease_name", ["Fungus gnats", "fungus gnat", "Pests (Spider Mites, Mealybugs, Fungus Gnats)"])
+def test_fungus_gnats_are_pests_not_fungal_infections(kb, disease_name):
+    assert _issue_tokens(disease_name) >= {"gnat", "pest"}
+    assert "fungal" not in _issue_tokens(disease_name)
+    assert kb._match_issue(ALOE_VERA, disease_name) != "Fungal Infections"
+    assert kb._match_issue(BEGONIA, disease_name) == "Pests (Spider Mites, Mealybugs, Fungus Gnats)"
+
+
+def test_fungus_still_matches_fungal_issues(kb):
+    assert kb._match_issue(ALOE_VERA, "fungus infection") == "Fungal Infections"
+
+
+@pytest.mark.parametrize("plant_key, fragment, issue_name", [
+    (ALOE_VERA, "in", None),
+    (ALOE_VERA, "water", None),
+    (SNAKE_PLANT, "water", None),
+    (ALOE_VERA, "low", None),
+    (SNAKE_PLANT, "low", "Low Light Stress"),
+])
+def test_issue_match_on_fragments(kb, plant_key, fragment, issue_name):
+    # Only whole words count: "in" is not matched inside "Infections", nor "water" inside "Overwatering"
+    assert kb._match_issue(plant_key, fragment) == issue_name
+
+
+def test_snapshot_round_trip(tmp_path):
+    kb_path = write_kb(tmp_path / "kb.json", {ALOE_VERA: {"Fungal Infections": {"treatment": ["apply fungicide"]}}})
+
+    first = PlantKnowledgeBase(kb_path)
+    assert not first.loaded_from_snapshot
+    assert kb_path.with_suffix(SNAPSHOT_SUFFIX).exists()
+
+    second = PlantKnowledgeBase(kb_path)
+    assert second.loaded_from_snapshot
+    assert second.knowledge_base == first.knowledge_base
+    assert second.search_plant("aloe vera")["plant_name"] == ALOE_VERA
+    assert second.get_advice("Aloe Vera", "fungus infection")["matched_issue"] == "Fungal Infections"
+
+
+def test_snapshot_invalidated_when_json_changes(tmp_path):
+    kb_path = write_kb(tmp_path / "kb.json", ["Aloe Vera"])
+    PlantKnowledgeBase(kb_path)
+
+    # Same size, so only the content hash tells the files apart
+    write_kb(kb_path, ["Aloe Vira"])
+    kb = PlantKnowledgeBase(kb_path)
+    assert not kb.loaded_from_snapshot
+    assert kb.list_all_plants() == ["Aloe Vira"]
+
+    write_kb(kb_path, ["Aloe Vera", "Jade Plant"])
+    kb = PlantKnowledgeBase(kb_path)
+    assert not kb.loaded_from_snapshot
+    assert kb.list_all_plants() == ["Aloe Vera", "Jade Plant"]
+    assert PlantKnowledgeBase(kb_path).loaded_from_snapshot
+
+
+def test_snapshot_invalidated_when_matching_tables_change(tmp_path, monkeypatch):
+    kb_path = write_kb(tmp_path / "kb.json", ["Aloe Vera"])
+    PlantKnowledgeBase(kb_path)
+
+    monkeypatch.setattr(kb_utils, "_INDEX_FINGERPRINT", b"\0" * 32)
+    assert not PlantKnowledgeBase(kb_path).loaded_from_snapshot
+
+
+def test_snapshot_header_refreshed_after_hash_match(tmp_path, monkeypatch):
+    kb_path = write_kb(tmp_path / "kb.json", ["Aloe Vera"])
+    PlantKnowledgeBase(kb_path)
+    # A checkout or deployment resets the mtime but not the content
+    os.utime(kb_path, ns=(0, 1_000_000_000))
+
+    assert PlantKnowledgeBase(kb_path).loaded_from_snapshot
+
+    def fail_hash(*args, **kwargs):
+        raise AssertionError("JSON file hashed again")
+
+    monkeypatch.setattr(kb_utils.hashlib, "sha256", fail_hash)
+    assert PlantKnowledgeBase(kb_path).loaded_from_snapshot
+
+
+def test_corrupt_snapshot_is_rebuilt(tmp_path):
+    kb_path = write_kb(tmp_path / "kb.json", ["Aloe Vera"])
+    snapshot_path = PlantKnowledgeBase(kb_path).snapshot_path
+    snapshot_path.write_bytes(snapshot_path.read_bytes()[:-10])
+
+    kb = PlantKnowledgeBase(kb_path)
+    assert not kb.loaded_from_snapshot
+    assert kb.list_all_plants() == ["Aloe Vera"]
+    assert PlantKnowledgeBase(kb_path).loaded_from_snapshot
+
+
+def test_unwritable_snapshot_is_skipped_before_serializing(tmp_path, monkeypatch):
+    kb_path = write_kb(tmp_path / "kb.json", ["Aloe Vera"])
+
+    def fail_dump(*args, **kwargs):
+        raise AssertionError("knowledge base serialized for an unwritable snapshot")
+
+    monkeypatch.setattr(kb_utils.pickle, "dump", fail_dump)
+    monkeypatch.setattr(kb_utils.pickle, "dumps", fail_dump)
+    kb = PlantKnowledgeBase(kb_path, snapshot_path=tmp_path / "missing" / "kb.kbsnap")
+    assert kb.list_all_plants() == ["Aloe Vera"]
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+def test_compile_snapshot(tmp_path):
+    kb_path = write_kb(tmp_path / "kb.json", ["Aloe Vera"])
+    snapshot_path = compile_snapshot(kb_path, tmp_path / "compiled.kbsnap")
+
+    assert snapshot_path.exists()
+    assert PlantKnowledgeBase(kb_path, snapshot_path=snapshot_path).loaded_from_snapshot
+    assert not kb_path.with_suffix(SNAPSHOT_SUFFIX).exists()
+
+
+def counting_resolves(kb: PlantKnowledgeBase, monkeypatch) -> list:
+    """Record the names the knowledge base actually matches (cache misses)."""
+    resolved = []
+    resolve = kb._resolve
+
+    def counting(plant_name):
+        resolved.append(plant_name)
+        return resolve(plant_name)
+
+    monkeypatch.setattr(kb, "_resolve", counting)
+    return resolved
+
+
+def test_resolution_cache_hit(tmp_path, monkeypatch):
+    kb = PlantKnowledgeBase(write_kb(tmp_path / "kb.json", [ALOE_VERA, BEGONIA]), use_snapshot=False)
+    resolved = counting_resolves(kb, monkeypatch)
+
+    first = kb.resolve_plant_name("Aloe Vera")
+    assert kb.resolve_plant_name("  aloe vera ") == first
+    assert kb.resolve_plant_name("Cactus") is None
+    assert kb.resolve_plant_name("cactus") is None
+
+    assert first == (ALOE_VERA, 1.0)
+    # Names that match nothing are cached too
+    assert resolved == ["Aloe Vera", "Cactus"]
+    assert kb.get_kb_stats()["resolution_cache"] == {"size": 2, "max_entries": kb.resolution_cache_size,
+                                                     "hits": 2, "misses": 2}
+
+
+def test_resolution_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    kb = PlantKnowledgeBase(write_kb(tmp_path / "kb.json", [ALOE_VERA, BEGONIA, SNAKE_PLANT]),
+                            resolution_cache_size=2, use_snapshot=False)
+    resolved = counting_resolves(kb, monkeypatch)
+
+    kb.resolve_plant_name("aloe vera")
+    kb.resolve_plant_name("begonia")
+    kb.resolve_plant_name("aloe vera")
+    kb.resolve_plant_name("snake plant")
+    assert resolved == ["aloe vera", "begonia", "snake plant"]
+
+    kb.resolve_plant_name("aloe vera")
+    kb.resolve_plant_name("begonia")
+    assert resolved == ["aloe vera", "begonia", "snake plant", "begonia"]
+    assert kb.get_kb_stats()["resolution_cache"]["size"] == 2
+
+
+def test_resolution_cache_can_be_disabled(tmp_path, monkeypatch):
+    kb = PlantKnowledgeBase(write_kb(tmp_path / "kb.json", [ALOE_VERA]), resolution_cache_size=0, use_snapshot=False)
+    resolved = counting_resolves(kb, monkeypatch)
+
+    kb.resolve_plant_name("aloe vera")
+    kb.resolve_plant_name("aloe vera")
+
+    assert resolved == ["aloe vera", "aloe vera"]
+    assert kb.get_kb_stats()["resolution_cache"]["size"] == 0
+
+
+def test_reload_clears_resolutions_and_advice(tmp_path):
+    kb_path = write_kb(tmp_path / "kb.json", [ALOE_VERA])
+    kb = PlantKnowledgeBase(kb_path, use_snapshot=False)
+    assert kb.resolve_plant_name("aloe vera") == (ALOE_VERA, 1.0)
+    assert kb.get_advice("aloe vera")["found"]
+
+    write_kb(kb_path, [BEGONIA])
+    kb.load_knowledge_base()
+
+    stats = kb.get_kb_stats()
+    assert stats["resolution_cache"]["size"] == 0
+    assert stats["advice_cache"]["size"] == 0
+    assert kb.resolve_plant_name("aloe vera") is None
+    assert not kb.get_advice("aloe vera")["found"]
+    assert kb.resolve_plant_name("begonia") == (BEGONIA, 1.0)
@@ -0,0 +1,92 @@
+"""
+Metrics Tests
+=============
+
+metrics.classify_upstream_error, track_upstream and the /metrics endpoint:
+1. Upstream exceptions map to a small fixed set of error types
+2. track_upstream counts failed calls by type and re-raises them
+3. /metrics serves the Prometheus text format, labelling requests by route
+   template so path parameters do not multiply series
+"""
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from conftest import jpeg_bytes
+from metrics import classify_upstream_error, track_upstream
+from ratelimit import RateLimitTimeout
+
+
+class StatusError(Exception):
+    """SDK-style error carrying its status code directly (as the Groq SDK's do)."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+
+
+def http_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://upstream.test/infer")
+    return httpx.HTTPStatusError(f"HTTP {status}", request=request, response=httpx.Response(status, request=request))
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.parametrize("error, error_type", [
+    (http_error(401), "unauthorized"),
+    (http_error(403), "unauthorized"),
+    (http_error(404), "not_found"),
+    (http_error(429), "rate_limited"),
+    (http_error(503), "server_error"),
+    (http_error(422), "client_error"),
+    (StatusError(500), "server_error"),
+    (StatusError(429), "rate_limited"),
+    (httpx.ReadTimeout("read timed out"), "timeout"),
+    (TimeoutError("The read operation timed out"), "timeout"),
+    (httpx.ConnectError("connection refused"), "connection"),
+    (Exception("Roboflow returned 401 Unauthorized"), "unauthorized"),
+    (Exception("Model not found"), "not_found"),
+    (RateLimitTimeout("Not admitted within 1.0s"), "queue_timeout"),
+    (ValueError("bad image"), "other"),
+])
+def test_classify_upstream_error(error, error_type):
+    assert classify_upstream_error(error) == error_type
+
+
+def test_track_upstream_counts_errors_by_type():
+    before = sample("plant_doctor_upstream_errors_total", upstream="test", error_type="rate_limited")
+
+    with pytest.raises(httpx.HTTPStatusError):
+        with track_upstream("test", payload_bytes=2048):
+            raise http_error(429)
+    with track_upstream("test"):
+        pass
+
+    assert sample("plant_doctor_upstream_errors_total", upstream="test", error_type="rate_limited") == before + 1
+    assert sample("plant_doctor_upstream_in_flight", upstream="test") == 0
+    assert sample("plant_doctor_upstream_payload_bytes_count", upstream="test") >= 1
+
+
+def test_metrics_endpoint_exposes_request_series(api, stub_upstreams):
+    stub_upstreams(api.app.state.registry)
+    diagnosed = dict(endpoint="/diagnose", method="POST", status="200")
+    missing_job = dict(endpoint="/jobs/{job_id}", method="GET", status="404")
+    before = {key: sample("plant_doctor_requests_total", **labels)
+              for key, labels in (("diagnosed", diagnosed), ("missing_job", missing_job))}
+
+    assert api.post("/diagnose", files={"file": ("leaf.jpg", jpeg_bytes(), "image/jpeg")}).status_code == 200
+    assert api.get("/jobs/abc123").status_code == 404
+    response = api.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain")
+    body = response.text
+    assert "# TYPE plant_doctor_requests_total counter" in body
+    assert 'plant_doctor_requests_total{endpoint="/diagnose",method="POST",status="200"}' in body
+    assert 'plant_doctor_stage_duration_seconds_bucket{le="0.001",stage="kb"}' in body
+    assert "abc123" not in body
+    assert sample("plant_doctor_requests_total", **diagnosed) == before["diagnosed"] + 1
+    assert sample("plant_doctor_requests_total", **missing_job) == before["missing_job"] + 1
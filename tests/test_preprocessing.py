@@ -0,0 +1,79 @@
+"""
+Image Preprocessing Tests
+=========================
+
+preprocessing.prepare_image:
+1. EXIF orientation is applied, metadata is dropped and each consumer gets its size
+2. Both consumers share one encoding when the image fits both targets
+3. Uploads that cannot be decoded are passed through unchanged
+"""
+
+import base64
+import io
+
+from PIL import Image
+
+from conftest import jpeg_bytes
+from preprocessing import prepare_image
+
+EXIF_ORIENTATION = 0x0112
+
+
+def rotated_jpeg(size=(2000, 1500)) -> bytes:
+    """A landscape JPEG whose EXIF orientation says to display it rotated 90 degrees clockwise."""
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION] = 6
+    exif[0x010F] = "Test Camera"
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (40, 140, 40)).save(buffer, "JPEG", exif=exif)
+    return buffer.getvalue()
+
+
+def decode(base64_image: str) -> Image.Image:
+    image = Image.open(io.BytesIO(base64.b64decode(base64_image)))
+    image.load()
+    return image
+
+
+def test_rotated_photo_is_oriented_stripped_and_resized():
+    upload = rotated_jpeg()
+
+    prepared = prepare_image(upload, classification_max_side=640, detection_max_side=1024)
+
+    assert prepared.normalized
+    assert prepared.original_size == (2000, 1500)
+    assert prepared.original_bytes == len(upload)
+    classification, detection = decode(prepared.classification_base64), decode(prepared.detection_base64)
+    # Portrait once the orientation is applied
+    assert classification.size == (480, 640)
+    assert detection.size == (768, 1024)
+    for image in (classification, detection):
+        assert image.format == "JPEG"
+        assert not image.getexif()
+        assert "exif" not in image.info
+
+
+def test_small_image_shares_one_encoding():
+    prepared = prepare_image(jpeg_bytes(), classification_max_side=640, detection_max_side=1024)
+
+    assert prepared.classification_base64 is prepared.detection_base64
+    assert decode(prepared.classification_base64).size == (64, 64)
+
+
+def test_shared_encoding_when_detection_target_is_smaller():
+    prepared = prepare_image(rotated_jpeg(), classification_max_side=1024, detection_max_side=640)
+
+    assert decode(prepared.classification_base64).size == (768, 1024)
+    assert decode(prepared.detection_base64).size == (480, 640)
+    prepared = prepare_image(rotated_jpeg((600, 400)), classification_max_side=1024, detection_max_side=640)
+    assert prepared.classification_base64 is prepared.detection_base64
+
+
+def test_undecodable_upload_is_passed_through():
+    upload = b"definitely not an image"
+
+    prepared = prepare_image(upload)
+
+    assert not prepared.normalized
+    assert prepared.original_size is None
+    assert prepared.classification_base64 == prepared.detection_base64 == base64.b64encode(upload).decode("ascii")
@@ -0,0 +1,122 @@
+"""
+Field Projection Tests
+======================
+
+projection.FieldSelection and the fields= / view= query parameters:
+1. Sections and section.key paths are parsed, validated and canonicalized
+2. Projection keeps only the selected parts (plus passthrough keys such as timings)
+3. Stages no selected section depends on are skipped
+4. Unknown fields or views are answered with 400 before the upload is read
+"""
+
+import pytest
+
+from conftest import jpeg_bytes
+from main import selected_stages
+from projection import (DIAGNOSE_SCHEMA, DIAGNOSE_VIEWS, PLANT_DIAGNOSIS_SCHEMA, PLANT_DIAGNOSIS_VIEWS,
+                        FieldSelection, FieldSelectionError)
+
+RESULT = {
+    "plant_name": "Pothos",
+    "disease_info": {"disease_name": "root rot", "severity": "moderate", "symptoms": ["yellowing"]},
+    "kb_advice": {"general_care": {"water": "weekly"}, "common_issues": ["root rot"]},
+    "timings": {"total_ms": 12.0}
+}
+
+
+def parse(fields=None, view=None) -> FieldSelection:
+    return FieldSelection.parse(DIAGNOSE_SCHEMA, DIAGNOSE_VIEWS, fields, view)
+
+
+def test_full_view_returns_result_unchanged():
+    for selection in (parse(), parse(view="full")):
+        assert selection.is_full
+        assert selection.key == "full"
+        assert selection.project(RESULT) is RESULT
+
+
+def test_fields_select_sections_and_keys():
+    selection = parse(" kb_advice.general_care, plant_name,disease_info.severity ,")
+
+    assert selection.key == "disease_info.severity,kb_advice.general_care,plant_name"
+    assert selection.wants("disease_info")
+    assert not selection.wants("treatments", "confidence")
+    assert selection.project(RESULT) == {
+        "plant_name": "Pothos",
+        "disease_info": {"severity": "moderate"},
+        "kb_advice": {"general_care": {"water": "weekly"}},
+        "timings": {"total_ms": 12.0}
+    }
+
+
+def test_whole_section_wins_over_its_keys():
+    selection = parse("disease_info.severity,disease_info,disease_info.symptoms")
+
+    assert selection.key == "disease_info"
+    assert selection.project(RESULT)["disease_info"] is RESULT["disease_info"]
+
+
+def test_missing_sections_are_left_out():
+    assert parse("treatments,plant_name").project(RESULT) == {"plant_name": "Pothos", "timings": {"total_ms": 12.0}}
+
+
+@pytest.mark.parametrize("schema, views", [
+    (DIAGNOSE_SCHEMA, DIAGNOSE_VIEWS), (PLANT_DIAGNOSIS_SCHEMA, PLANT_DIAGNOSIS_VIEWS)
+])
+def test_views_name_known_fields(schema, views):
+    for view in views:
+        FieldSelection.parse(schema, views, view=view)
+
+
+@pytest.mark.parametrize("fields, view, message", [
+    ("bogus", None, "Unknown field 'bogus'"),
+    ("disease_info.bogus", None, "Unknown field 'disease_info.bogus'"),
+    ("plant_name.first", None, "Unknown field 'plant_name.first'"),
+    (" , ", None, "at least one field"),
+    (None, "tiny", "Unknown view 'tiny'"),
+    ("plant_name", "compact", "either fields or view"),
+])
+def test_invalid_selection(fields, view, message):
+    with pytest.raises(FieldSelectionError, match=message):
+        parse(fields, view)
+
+
+@pytest.mark.parametrize("fields, stages", [
+    (None, ("classification", "detection", "kb_care", "kb_treatments")),
+    ("disease_info", ("detection",)),
+    ("plant_name,classification_info.error", ("classification",)),
+    ("kb_advice.general_care", ("classification", "kb_care")),
+])
+def test_selection_skips_unneeded_stages(fields, stages):
+    assert selected_stages(parse(fields) if fields else None) == stages
+
+
+def test_api_returns_selected_fields_only(api, stub_upstreams):
+    stubs = stub_upstreams(api.app.state.registry)
+
+    response = api.post("/diagnose?fields=disease_info.disease_name,health_status",
+                        files={"file": ("leaf.jpg", jpeg_bytes((10, 120, 10)), "image/jpeg")})
+
+    assert response.status_code == 200
+    assert set(response.json()) == {"disease_info", "health_status"}
+    assert response.json()["disease_info"] == {"disease_name": "root rot"}
+    # Classification feeds none of the selected sections
+    assert "classify" not in stubs.timeouts
+
+
+@pytest.mark.parametrize("endpoint, query", [
+    ("/diagnose", "fields=bogus"),
+    ("/diagnose", "fields=disease_info.bogus"),
+    ("/diagnose", "view=tiny"),
+    ("/diagnose", "fields=plant_name&view=compact"),
+    ("/plant-diagnosis", "fields=kb_advice"),
+    ("/plant-diagnosis", "view=tiny"),
+])
+def test_api_rejects_unknown_fields(api, stub_upstreams, endpoint, query):
+    stubs = stub_upstreams(api.app.state.registry)
+
+    response = api.post(f"{endpoint}?{query}", files={"file": ("leaf.jpg", jpeg_bytes(), "image/jpeg")})
+
+    assert response.status_code == 400
+    assert "Unknown" in response.json()["detail"] or "either" in response.json()["detail"]
+    assert stubs.timeouts == {}
@@ -0,0 +1,212 @@
+"""
+Groq Rate Limit Tests
+=====================
+
+ratelimit.TokenBudgetScheduler, with the one-minute window shortened:
+1. Calls beyond the request budget wait for the window and are admitted in FIFO order
+2. Calls beyond the token budget are admitted once settled usage frees tokens
+3. A call larger than the whole token budget still runs on an empty window
+4. Callers that time out or are cancelled leave the queue
+5. Settled usage updates the window and the per-call estimate
+6. Every Groq attempt, retries included, takes its own slot and settles its own
+   usage, and a queue timeout does not count against the circuit breaker
+"""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import ratelimit
+import resilience
+from conftest import jpeg_bytes
+from main import LeafDiseaseDetector
+from ratelimit import RateLimitTimeout, TokenBudgetScheduler
+from resilience import RetryPolicy, UpstreamGuard
+
+
+@pytest.fixture
+def window(monkeypatch):
+    monkeypatch.setattr(ratelimit, "WINDOW_SECONDS", 0.2)
+    return 0.2
+
+
+def wait_until_queued(scheduler: TokenBudgetScheduler, queued: int) -> None:
+    deadline = time.monotonic() + 2.0
+    while scheduler.get_stats()["queued"] < queued:
+        assert time.monotonic() < deadline, "waiter never queued"
+        time.sleep(0.001)
+
+
+def test_request_budget_admits_in_fifo_order(window):
+    scheduler = TokenBudgetScheduler(requests_per_minute=1)
+    scheduler.acquire()
+    admitted = []
+
+    def acquire(name):
+        reservation = scheduler.acquire(timeout=2.0)
+        admitted.append((name, reservation.waited))
+
+    threads = []
+    for number, name in enumerate(["first", "second", "third"], start=1):
+        threads.append(threading.Thread(target=acquire, args=(name,)))
+        threads[-1].start()
+        wait_until_queued(scheduler, number)
+    for thread in threads:
+        thread.join(5.0)
+
+    assert [name for name, _ in admitted] == ["first", "second", "third"]
+    # Each call waited for the previous one to leave the window
+    assert all(waited >= window * 0.8 * number for number, (_, waited) in enumerate(admitted, start=1))
+    assert scheduler.get_stats()["admitted"] == 4
+
+
+def test_timeout_leaves_queue():
+    scheduler = TokenBudgetScheduler(requests_per_minute=1)
+    scheduler.acquire()
+
+    with pytest.raises(RateLimitTimeout, match="1 RPM"):
+        scheduler.acquire(timeout=0.05)
+
+    stats = scheduler.get_stats()
+    assert stats["queued"] == 0
+    assert stats["timed_out"] == 1
+    assert stats["window_requests"] == 1
+
+
+def test_settled_usage_frees_token_budget():
+    scheduler = TokenBudgetScheduler(tokens_per_minute=1000, estimated_tokens=400)
+    first = scheduler.acquire()
+    scheduler.acquire()
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(reservation=scheduler.acquire(timeout=2.0)))
+    thread.start()
+    wait_until_queued(scheduler, 1)
+
+    # 400 + 400 + 400 does not fit; 100 + 400 + 400 does
+    scheduler.settle(first, SimpleNamespace(total_tokens=100))
+    thread.join(2.0)
+
+    assert result["reservation"].tokens == 400
+    assert scheduler.get_stats()["window_tokens"] == 900
+
+
+def test_oversized_call_runs_on_empty_window(window):
+    scheduler = TokenBudgetScheduler(tokens_per_minute=1000, estimated_tokens=5000)
+
+    reservation = scheduler.acquire(timeout=0.05)
+    assert reservation.tokens == 5000
+    with pytest.raises(RateLimitTimeout):
+        scheduler.acquire(timeout=0.05)
+    assert scheduler.acquire(timeout=2.0).waited > 0
+
+
+def test_cancelled_async_waiter_leaves_queue():
+    scheduler = TokenBudgetScheduler(requests_per_minute=1)
+    scheduler.acquire()
+
+    async def cancel_waiter():
+        task = asyncio.ensure_future(scheduler.acquire_async(timeout=5.0))
+        await asyncio.sleep(0.01)
+        assert scheduler.get_stats()["queued"] == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_waiter())
+    assert scheduler.get_stats()["queued"] == 0
+
+
+def test_async_waiter_times_out():
+    scheduler = TokenBudgetScheduler(requests_per_minute=1)
+    scheduler.acquire()
+
+    with pytest.raises(RateLimitTimeout):
+        asyncio.run(scheduler.acquire_async(timeout=0.05))
+    assert scheduler.get_stats()["timed_out"] == 1
+
+
+def test_async_waiter_admitted(window):
+    scheduler = TokenBudgetScheduler(requests_per_minute=1)
+    scheduler.acquire()
+
+    reservation = asyncio.run(scheduler.acquire_async(timeout=2.0))
+    assert reservation.waited > 0
+    assert reservation.remaining(2.0) == pytest.approx(2.0 - reservation.waited)
+    assert reservation.remaining(None) is None
+
+
+@pytest.mark.parametrize("usage, tokens", [
+    (SimpleNamespace(total_tokens=1200), 1200),
+    (SimpleNamespace(total_tokens=None, prompt_tokens=900, completion_tokens=300), 1200),
+    (SimpleNamespace(prompt_tokens=900), None),
+    (None, None),
+])
+def test_settle_records_usage(usage, tokens):
+    scheduler = TokenBudgetScheduler(tokens_per_minute=10000, estimated_tokens=2000)
+    reservation = scheduler.acquire()
+
+    scheduler.settle(reservation, usage)
+    scheduler.settle(reservation, SimpleNamespace(total_tokens=1))
+
+    stats = scheduler.get_stats()
+    if tokens is None:
+        # Failed calls keep their estimate
+        assert stats["window_tokens"] == 2000
+        assert stats["estimated_tokens_per_request"] == 2000
+    else:
+        assert stats["window_tokens"] == tokens
+        assert stats["estimated_tokens_per_request"] == 2000 + round(ratelimit.ESTIMATE_SMOOTHING * (tokens - 2000))
+
+
+def groq_detector(scheduler: TokenBudgetScheduler, outcomes: list, failure_threshold: int = 5) -> LeafDiseaseDetector:
+    """A detector whose Groq client raises or returns each of outcomes in turn."""
+    def create(**request):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    detector = LeafDiseaseDetector(
+        api_key="test-groq-key", scheduler=scheduler,
+        upstream_guard=UpstreamGuard("groq", failure_threshold=failure_threshold, retry_policy=RetryPolicy(max_retries=1))
+    )
+    detector.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return detector
+
+
+def completion(total_tokens: int) -> SimpleNamespace:
+    message = SimpleNamespace(content='{"disease_detected": false, "confidence": 0.9}')
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=SimpleNamespace(total_tokens=total_tokens))
+
+
+def test_retried_groq_call_takes_two_slots(monkeypatch):
+    monkeypatch.setattr(resilience.time, "sleep", lambda seconds: None)
+    request = httpx.Request("POST", "https://api.groq.test/chat/completions")
+    unavailable = httpx.HTTPStatusError("HTTP 503", request=request, response=httpx.Response(503, request=request))
+    scheduler = TokenBudgetScheduler(requests_per_minute=10, tokens_per_minute=100000, estimated_tokens=2000)
+    detector = groq_detector(scheduler, [unavailable, completion(1200)])
+
+    result = detector.analyze_leaf_image_bytes(jpeg_bytes(), timeout=5.0)
+
+    assert result["confidence"] == 0.9
+    stats = scheduler.get_stats()
+    assert stats["admitted"] == 2
+    assert stats["window_requests"] == 2
+    # The failed attempt keeps its estimate; the retry settles its actual usage
+    assert stats["window_tokens"] == 2000 + 1200
+
+
+def test_queue_timeout_leaves_circuit_closed():
+    scheduler = TokenBudgetScheduler(requests_per_minute=1)
+    scheduler.acquire()
+    detector = groq_detector(scheduler, [completion(1200)], failure_threshold=1)
+
+    with pytest.raises(RateLimitTimeout):
+        detector.analyze_leaf_image_bytes(jpeg_bytes(), timeout=0.05)
+
+    assert detector.upstream.breaker.state == "closed"
+    assert scheduler.get_stats()["admitted"] == 1
@@ -0,0 +1,82 @@
+"""
+Component Registry Tests
+========================
+
+registry.ComponentRegistry and the API lifespan hook:
+1. Each component is built once and shared, even when first requested concurrently
+2. A component that fails to build is not cached and is retried on next access
+3. warm_up builds the pipeline components and reports the ones that are unavailable
+4. The API builds and warms one registry at startup and releases it on shutdown
+"""
+
+import threading
+
+import pytest
+
+from config import PipelineConfig
+from registry import ComponentRegistry
+
+
+@pytest.fixture
+def registry():
+    registry = ComponentRegistry(PipelineConfig.from_env())
+    yield registry
+    registry.close()
+
+
+def test_component_is_built_once_under_concurrent_access(registry):
+    built = []
+    start = threading.Barrier(8)
+
+    def factory():
+        built.append(object())
+        return built[-1]
+
+    def access(results):
+        start.wait()
+        results.append(registry._get_or_create("component", factory))
+
+    results = []
+    threads = [threading.Thread(target=access, args=(results,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5.0)
+
+    assert len(built) == 1
+    assert all(component is built[0] for component in results)
+    assert registry.stage_executor is registry.stage_executor
+
+
+def test_failed_construction_is_retried(registry, monkeypatch):
+    monkeypatch.delenv("GROQ_API_KEY")
+    with pytest.raises(ValueError, match="GROQ_API_KEY"):
+        registry.disease_detector
+    assert not registry.get_status()["disease_detector"]
+
+    monkeypatch.setenv("GROQ_API_KEY", "test-groq-key")
+    assert registry.disease_detector is registry.disease_detector
+
+
+def test_warm_up_reports_unavailable_components(registry, monkeypatch):
+    monkeypatch.delenv("GROQ_API_KEY")
+
+    status = registry.warm_up()
+
+    assert status == {"knowledge_base": True, "roboflow_client": True, "disease_detector": False}
+    assert registry.get_status() == status
+
+
+def test_api_lifespan_owns_the_registry():
+    from fastapi.testclient import TestClient
+    import app
+
+    with TestClient(app.app) as client:
+        registry = client.app.state.registry
+        assert registry.get_status() == {"knowledge_base": True, "roboflow_client": True, "disease_detector": True}
+        detector = registry.disease_detector
+        # Requests reuse the warmed components
+        assert client.get("/cache/stats").status_code == 200
+        assert client.app.state.registry.disease_detector is detector
+
+    assert registry.get_status() == {"knowledge_base": False, "roboflow_client": False, "disease_detector": False}
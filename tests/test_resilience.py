@@ -0,0 +1,309 @@
+"""
+Upstream Resilience Tests
+=========================
+
+resilience.CircuitBreaker and UpstreamGuard:
+1. The circuit opens after consecutive unhealthy failures and fails fast
+2. After the reset period one probe is admitted while other calls are rejected;
+   its outcome closes or re-opens the circuit
+3. Answers such as 404 and cancellations leave the circuit closed, and the
+   warning logged when it opens never includes the API key
+4. Guarded calls fail fast while the circuit is open
+5. Slow async calls are hedged once enough latencies were seen
+6. Retry-After is read as milliseconds, seconds or an HTTP date
+7. Only rate-limit, server and connection errors are retried, with jittered
+   backoff, and only while the stage budget allows another attempt; retry
+   warnings never log the API key from the request URL
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, UpstreamGuard
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def http_error(status: int, headers: dict = None,
+               url: str = "https://upstream.test/infer") -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", url)
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError(f"HTTP {status} for url '{url}'", request=request, response=response)
+
+
+def fail(breaker: CircuitBreaker, error: Exception, times: int = 1) -> None:
+    for _ in range(times):
+        breaker.after_call(error, breaker.before_call())
+
+
+def test_circuit_opens_after_threshold(clock):
+    breaker = CircuitBreaker("groq", failure_threshold=3, reset_seconds=30.0)
+
+    fail(breaker, http_error(503), times=2)
+    assert breaker.get_state()["state"] == "closed"
+
+    fail(breaker, httpx.ConnectError("connection refused"))
+    assert breaker.get_state()["state"] == "open"
+
+    clock.now += 10.0
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.before_call()
+    assert excinfo.value.upstream == "groq"
+    assert excinfo.value.retry_after == pytest.approx(20.0)
+    assert breaker.get_state()["retry_after_seconds"] == pytest.approx(20.0)
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker("groq", failure_threshold=3)
+
+    fail(breaker, http_error(503), times=2)
+    breaker.after_call(None, breaker.before_call())
+    fail(breaker, http_error(503), times=2)
+
+    assert breaker.get_state()["state"] == "closed"
+    assert breaker.get_state()["consecutive_failures"] == 2
+
+
+def test_half_open_admits_one_probe_that_closes_circuit(clock):
+    breaker = CircuitBreaker("roboflow", failure_threshold=1, reset_seconds=30.0)
+    fail(breaker, http_error(503))
+
+    clock.now += 30.0
+    assert breaker.before_call() is True
+    assert breaker.get_state()["state"] == "half_open"
+    # Concurrent calls are rejected while the probe is in flight
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.after_call(None, probe=True)
+    assert breaker.get_state() == {
+        "state": "closed", "consecutive_failures": 0, "failure_threshold": 1, "retry_after_seconds": None
+    }
+    assert breaker.before_call() is False
+
+
+def test_failed_probe_reopens_circuit(clock):
+    breaker = CircuitBreaker("roboflow", failure_threshold=5, reset_seconds=30.0)
+    fail(breaker, http_error(429), times=5)
+
+    clock.now += 30.0
+    breaker.after_call(http_error(500), breaker.before_call())
+
+    # One failed probe is enough, whatever the threshold
+    assert breaker.get_state()["state"] == "open"
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.before_call()
+    assert excinfo.value.retry_after == pytest.approx(30.0)
+
+
+def test_cancelled_probe_frees_the_probe_slot(clock):
+    breaker = CircuitBreaker("roboflow", failure_threshold=1, reset_seconds=30.0)
+    fail(breaker, http_error(503))
+
+    clock.now += 30.0
+    breaker.after_call(asyncio.CancelledError(), breaker.before_call())
+
+    assert breaker.get_state()["state"] == "half_open"
+    assert breaker.before_call() is True
+
+
+@pytest.mark.parametrize("error", [http_error(404), http_error(401), http_error(400), ValueError("bad image")])
+def test_answers_keep_circuit_closed(clock, error):
+    breaker = CircuitBreaker("roboflow", failure_threshold=1)
+
+    fail(breaker, error, times=3)
+
+    assert breaker.get_state()["state"] == "closed"
+    assert breaker.get_state()["consecutive_failures"] == 0
+
+
+def test_guard_fails_fast_while_open(clock):
+    guard = UpstreamGuard("groq", failure_threshold=2, reset_seconds=30.0,
+                          retry_policy=RetryPolicy(max_retries=0))
+    calls = []
+
+    def send(timeout):
+        calls.append(timeout)
+        raise http_error(503)
+
+    for _ in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            guard.call(send, timeout=5.0)
+    with pytest.raises(CircuitOpenError):
+        guard.call(send, timeout=5.0)
+    assert len(calls) == 2
+
+    clock.now += 30.0
+    assert guard.call(lambda timeout: "recovered", timeout=5.0) == "recovered"
+    assert guard.get_status()["circuit"]["state"] == "closed"
+
+
+def test_slow_async_call_is_hedged():
+    guard = UpstreamGuard("roboflow", hedge=True, hedge_min_samples=3)
+    for _ in range(3):
+        guard.latency.record(0.02)
+    attempts = []
+
+    async def send(timeout):
+        attempts.append(timeout)
+        # The first attempt hangs; the hedge answers
+        await asyncio.sleep(10.0 if len(attempts) == 1 else 0.0)
+        return len(attempts)
+
+    result = asyncio.run(asyncio.wait_for(guard.call_async(send, timeout=5.0), 2.0))
+
+    assert result == 2
+    assert guard.hedges_sent == guard.hedges_won == 1
+
+
+def test_no_hedging_before_enough_samples():
+    guard = UpstreamGuard("roboflow", hedge=True, hedge_min_samples=3)
+    guard.latency.record(0.02)
+
+    assert guard.hedge_delay() is None
+    assert asyncio.run(guard.call_async(lambda timeout: asyncio.sleep(0.05, "done"))) == "done"
+    assert guard.hedges_sent == 0
+
+
+@pytest.mark.parametrize("headers, seconds", [
+    ({"retry-after-ms": "1500"}, 1.5),
+    ({"retry-after-ms": "250", "retry-after": "9"}, 0.25),
+    ({"retry-after": "3"}, 3.0),
+    ({"retry-after": "-2"}, 0.0),
+    ({"retry-after": "soon"}, None),
+    ({"retry-after-ms": "soon"}, None),
+    ({}, None),
+])
+def test_retry_after_seconds(headers, seconds):
+    assert resilience.retry_after_seconds(http_error(429, headers)) == seconds
+
+
+def test_retry_after_http_date():
+    when = datetime.now(timezone.utc) + timedelta(seconds=30)
+    error = http_error(503, {"retry-after": format_datetime(when, usegmt=True)})
+
+    assert resilience.retry_after_seconds(error) == pytest.approx(30.0, abs=1.5)
+    assert resilience.retry_after_seconds(ValueError("no response")) is None
+
+
+@pytest.mark.parametrize("error", [http_error(503), http_error(429), httpx.ConnectError("connection refused")])
+def test_retry_policy_backs_off_with_jitter(error):
+    policy = RetryPolicy(max_retries=3, base_delay=0.25, max_delay=0.8)
+
+    for retry, ceiling in [(1, 0.25), (2, 0.5), (3, 0.8)]:
+        delays = [policy.next_delay(retry, error, remaining=None) for _ in range(200)]
+        assert all(0 <= delay <= ceiling for delay in delays)
+        assert max(delays) > ceiling / 2
+    assert policy.next_delay(4, error, remaining=None) is None
+
+
+@pytest.mark.parametrize("error", [
+    http_error(400), http_error(401), http_error(404), httpx.ReadTimeout("timed out"), ValueError("bad image")
+])
+def test_retry_policy_skips_non_retryable_errors(error):
+    assert RetryPolicy().next_delay(1, error, remaining=None) is None
+
+
+def test_retry_policy_honours_retry_after():
+    policy = RetryPolicy(max_delay=4.0)
+
+    assert policy.next_delay(1, http_error(429, {"retry-after": "2"}), remaining=None) == 2.0
+    # The upstream asked for a longer wait than we are willing to make
+    assert policy.next_delay(1, http_error(429, {"retry-after": "5"}), remaining=None) is None
+
+
+def test_retry_policy_keeps_time_for_the_next_attempt():
+    policy = RetryPolicy()
+    error = http_error(429, {"retry-after": "1"})
+
+    assert policy.next_delay(1, error, remaining=1.5) == 1.0
+    assert policy.next_delay(1, error, remaining=1.4) is None
+
+
+def test_guard_retries_until_success(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(resilience.time, "sleep", sleeps.append)
+    guard = UpstreamGuard("groq", retry_policy=RetryPolicy(max_retries=2))
+    errors = [http_error(503), http_error(429, {"retry-after-ms": "100"})]
+    timeouts = []
+
+    def send(timeout):
+        timeouts.append(timeout)
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    assert guard.call(send, timeout=5.0) == "ok"
+    assert len(timeouts) == 3
+    assert all(0 < timeout <= 5.0 for timeout in timeouts)
+    assert len(sleeps) == 2 and sleeps[1] == 0.1
+    assert guard.get_status()["retries"] == {"max_retries": 2, "retries_sent": 2}
+
+
+def test_guard_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr(resilience.time, "sleep", lambda seconds: None)
+    guard = UpstreamGuard("groq", retry_policy=RetryPolicy(max_retries=2))
+    calls = []
+
+    def send(timeout):
+        calls.append(timeout)
+        raise http_error(502)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        guard.call(send)
+    assert len(calls) == 3
+
+
+def test_retry_log_masks_api_key(monkeypatch, caplog):
+    monkeypatch.setattr(resilience.time, "sleep", lambda seconds: None)
+    guard = UpstreamGuard("roboflow", retry_policy=RetryPolicy(max_retries=1))
+    error = http_error(503, url="https://upstream.test/infer?api_key=secret-key")
+
+    def send(timeout):
+        raise error
+
+    with pytest.raises(httpx.HTTPStatusError):
+        guard.call(send)
+    assert "Retrying roboflow request" in caplog.text
+    assert "api_key=[REDACTED]" in caplog.text
+    assert "secret-key" not in caplog.text
+
+
+def test_async_guard_retries():
+    guard = UpstreamGuard("roboflow", retry_policy=RetryPolicy(base_delay=0.01))
+    errors = [httpx.ConnectError("connection refused")]
+
+    async def send(timeout):
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    assert asyncio.run(guard.call_async(send, timeout=5.0)) == "ok"
+    assert guard.retries == 1
+
+
+def test_circuit_open_log_masks_api_key(clock, caplog):
+    breaker = CircuitBreaker("roboflow", failure_threshold=1)
+
+    fail(breaker, http_error(500, url="https://upstream.test/infer?api_key=secret-key"))
+
+    assert "circuit opened" in caplog.text
+    assert "secret-key" not in caplog.text
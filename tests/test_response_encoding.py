@@ -0,0 +1,161 @@
+"""
+Response Encoding Tests
+=======================
+
+response_encoding on a small Starlette app and the API:
+1. Accept-Encoding negotiation honours q-values, wildcards and refusals
+2. Complete bodies above the size threshold are compressed and marked with Vary
+3. Small, streamed and already-encoded bodies pass through untouched
+4. JSON is rendered compactly with orjson
+"""
+
+import gzip
+from types import SimpleNamespace
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import response_encoding
+from conftest import jpeg_bytes
+from response_encoding import CompressionMiddleware, OrjsonResponse, dumps_json, negotiate_encoding
+
+LARGE = {"symptoms": ["yellowing leaves with brown edges"] * 100}
+
+
+@pytest.fixture
+def with_brotli(monkeypatch):
+    monkeypatch.setattr(response_encoding, "SUPPORTED_ENCODINGS", ("br", "gzip"))
+
+
+@pytest.mark.parametrize("accept_encoding, encoding", [
+    ("gzip, deflate", "gzip"),
+    ("GZIP", "gzip"),
+    ("deflate, identity", None),
+    ("", None),
+    ("gzip;q=0", None),
+    ("*", "gzip"),
+    ("*;q=0.5, gzip;q=0", None),
+    ("gzip;q=bogus", None),
+])
+def test_negotiate_gzip(accept_encoding, encoding):
+    assert negotiate_encoding(accept_encoding) == encoding
+
+
+@pytest.mark.parametrize("accept_encoding, encoding", [
+    ("gzip, deflate, br", "br"),
+    ("gzip, br;q=0.9", "gzip"),
+    ("br;q=0, *", "gzip"),
+    ("br;q=0.1, gzip;q=0.05", "br"),
+])
+def test_negotiate_prefers_brotli(with_brotli, accept_encoding, encoding):
+    assert negotiate_encoding(accept_encoding) == encoding
+
+
+def test_brotli_only_offered_when_installed():
+    assert ("br" in response_encoding.SUPPORTED_ENCODINGS) == (response_encoding.brotli is not None)
+
+
+def test_brotli_body_round_trip():
+    brotli = pytest.importorskip("brotli")
+    body = dumps_json(LARGE)
+
+    assert brotli.decompress(response_encoding.compress_body(body, "br", 6, 4)) == body
+
+
+@pytest.fixture
+def config():
+    return SimpleNamespace(compress_responses=True, compression_min_bytes=1024, gzip_level=6, brotli_quality=4)
+
+
+@pytest.fixture
+def client(config):
+    async def large(request):
+        return OrjsonResponse(LARGE)
+
+    async def small(request):
+        return OrjsonResponse({"plant_name": "Pothos"})
+
+    async def stream(request):
+        async def chunks():
+            for _ in range(3):
+                yield b"x" * 2048
+
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    async def encoded(request):
+        return Response(gzip.compress(b"x" * 2048), headers={"Content-Encoding": "gzip"})
+
+    app = Starlette(routes=[
+        Route("/large", large), Route("/small", small), Route("/stream", stream), Route("/encoded", encoded)
+    ])
+    app.add_middleware(CompressionMiddleware, get_config=lambda: config)
+    return TestClient(app)
+
+
+def test_large_body_is_gzipped(client):
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert int(response.headers["Content-Length"]) < len(dumps_json(LARGE)) // 10
+    assert response.json() == LARGE
+
+
+def test_uncompressed_for_clients_without_gzip(client):
+    response = client.get("/large", headers={"Accept-Encoding": "identity"})
+
+    assert "Content-Encoding" not in response.headers
+    # Caches must still key on Accept-Encoding
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.content == dumps_json(LARGE)
+
+
+def test_small_body_is_not_compressed(client):
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in response.headers
+    assert response.json() == {"plant_name": "Pothos"}
+
+
+def test_threshold_comes_from_config(client, config):
+    config.compression_min_bytes = 1
+    assert client.get("/small", headers={"Accept-Encoding": "gzip"}).headers["Content-Encoding"] == "gzip"
+
+    config.compress_responses = False
+    assert "Content-Encoding" not in client.get("/large", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_streamed_body_passes_through(client):
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in response.headers
+    assert response.content == b"x" * 6144
+
+
+def test_encoded_body_is_not_compressed_twice(client):
+    response = client.get("/encoded", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.content == b"x" * 2048
+
+
+def test_dumps_json_is_compact():
+    assert dumps_json({"plant_name": "Pothos", 1: [0.5, None]}) == b'{"plant_name":"Pothos","1":[0.5,null]}'
+    assert OrjsonResponse({"ok": True}).body == b'{"ok":true}'
+
+
+def test_api_compresses_diagnosis(api, stub_upstreams):
+    stub_upstreams(api.app.state.registry)
+    image = {"file": ("leaf.jpg", jpeg_bytes((0, 100, 0)), "image/jpeg")}
+
+    response = api.post("/diagnose", files=image, headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.json()["plant_name"] == "Pothos"
+    # The SSE stream stays uncompressed so each section is delivered as it is written
+    response = api.post("/diagnose/stream", files=image, headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
@@ -0,0 +1,135 @@
+"""
+Safe Diagnosis Tests
+====================
+
+safe_diagnose, safe_diagnose_async and safe_diagnose_stream with stubbed
+upstream clients:
+1. All three entry points assemble the same result
+2. Streamed sections are yielded as stages finish; the non-streaming async
+   entry point builds no section copies
+3. The deadline caps each upstream call's timeout and returns partial results,
+   counting stages left running on a worker thread as abandoned
+4. Editing a result's advice lists leaves later diagnoses untouched
+"""
+
+import asyncio
+import base64
+import time
+
+import pytest
+from prometheus_client import REGISTRY
+
+import main
+from config import PipelineConfig
+from conftest import jpeg_bytes
+from registry import ComponentRegistry
+
+
+def jpeg_base64() -> str:
+    return base64.b64encode(jpeg_bytes()).decode("utf-8")
+
+
+@pytest.fixture
+def registry():
+    registry = ComponentRegistry(PipelineConfig.from_env())
+    yield registry
+    registry.close()
+
+
+def test_entry_points_agree(registry, stub_upstreams):
+    stub_upstreams(registry)
+    image = jpeg_base64()
+
+    sync_result = main.safe_diagnose(image, registry)
+    async_result = asyncio.run(main.safe_diagnose_async(image, registry))
+
+    async def last_streamed():
+        async for section, data in main.safe_diagnose_stream(image, registry):
+            if section == "result":
+                return data
+
+    streamed_result = asyncio.run(last_streamed())
+    for result in (sync_result, async_result, streamed_result):
+        result.pop("timestamp", None)
+    assert sync_result == async_result == streamed_result
+    assert sync_result["plant_name"] == "Pothos"
+    assert sync_result["disease_info"]["disease_name"] == "root rot"
+
+
+def test_stream_yields_sections_as_stages_finish(registry, stub_upstreams):
+    stub_upstreams(registry, classify_delay=0.1)
+
+    async def sections():
+        return [section async for section, _ in main.safe_diagnose_stream(jpeg_base64(), registry)]
+
+    assert asyncio.run(sections()) == ["disease", "plant", "care", "result"]
+
+
+def test_async_diagnosis_builds_no_sections(monkeypatch, registry, stub_upstreams):
+    stub_upstreams(registry)
+
+    def fail(result, section):
+        raise AssertionError(f"section {section} copied without a stream consumer")
+
+    monkeypatch.setattr(main, "diagnosis_section", fail)
+    result = asyncio.run(main.safe_diagnose_async(jpeg_base64(), registry, timings=True))
+
+    assert result["plant_name"] == "Pothos"
+    assert "timings" in result
+
+
+def abandoned_count(stage: str) -> float:
+    return REGISTRY.get_sample_value("plant_doctor_stage_abandoned_total", {"stage": stage}) or 0.0
+
+
+def test_deadline_caps_upstream_timeouts(registry, stub_upstreams):
+    stubs = stub_upstreams(registry)
+
+    main.safe_diagnose(jpeg_base64(), registry, deadline_seconds=2.0)
+
+    assert 0 < stubs.timeouts["classify"] <= 2.0
+    assert 0 < stubs.timeouts["detect"] <= 2.0
+
+
+def test_deadline_returns_partial_result_and_counts_abandoned_stage(registry, stub_upstreams):
+    stub_upstreams(registry, detect_delay=0.5)
+    before = abandoned_count("groq")
+
+    started = time.perf_counter()
+    result = main.safe_diagnose(jpeg_base64(), registry, deadline_seconds=0.2)
+
+    assert time.perf_counter() - started < 0.45
+    assert result["deadline_exceeded"]
+    assert "deadline" in result["disease_info"]["error"]
+    assert result["plant_name"] == "Pothos"
+    # The Groq call was already running, so it could only be abandoned
+    assert abandoned_count("groq") == before + 1
+
+
+def test_async_deadline_cancels_stages(registry, stub_upstreams):
+    stub_upstreams(registry, detect_delay=0.5)
+    before = abandoned_count("groq")
+
+    result = asyncio.run(main.safe_diagnose_async(jpeg_base64(), registry, deadline_seconds=0.2))
+
+    assert result["deadline_exceeded"]
+    assert result["plant_name"] == "Pothos"
+    # Native async calls are cancelled, not abandoned
+    assert abandoned_count("groq") == before
+
+
+def test_results_do_not_share_memoized_advice(registry, stub_upstreams):
+    stub_upstreams(registry)
+    image = jpeg_base64()
+
+    first = main.safe_diagnose(image, registry)
+    advice_lists = (first["kb_advice"]["common_issues"], first["kb_advice"]["prevention_tips"],
+                    first["treatments"]["kb_treatments"])
+    assert all(advice_lists)
+    for advice in advice_lists:
+        advice.append("edited by a caller")
+
+    for later in (main.safe_diagnose(image, registry), asyncio.run(main.safe_diagnose_async(image, registry))):
+        assert "edited by a caller" not in later["kb_advice"]["common_issues"]
+        assert "edited by a caller" not in later["kb_advice"]["prevention_tips"]
+        assert "edited by a caller" not in later["treatments"]["kb_treatments"]
@@ -0,0 +1,102 @@
+"""
+Single-Flight Tests
+===================
+
+singleflight.SingleFlight:
+1. Concurrent calls with one key share a single execution
+2. Failures reach every waiter, and the next call starts afresh
+3. A cancelled leader does not cancel the shared work
+"""
+
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+class CountingWork:
+    def __init__(self, result=None, error: Exception = None, delay: float = 0.05):
+        self.result = result if result is not None else {"plant_name": "Pothos"}
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def test_concurrent_calls_are_coalesced():
+    flights = SingleFlight()
+    work = CountingWork()
+
+    async def scenario():
+        return await asyncio.gather(*(flights.run("image", work) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+
+    assert work.calls == 1
+    assert [coalesced for _, coalesced in results] == [False, True, True, True, True]
+    assert all(result == {"plant_name": "Pothos"} for result, _ in results)
+    # Each caller owns its copy
+    assert len({id(result) for result, _ in results}) == 5
+    assert flights.get_stats() == {"executed": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_different_keys_run_separately():
+    flights = SingleFlight()
+    work = CountingWork()
+
+    async def scenario():
+        await asyncio.gather(flights.run("a", work), flights.run("b", work))
+
+    asyncio.run(scenario())
+    assert work.calls == 2
+
+
+def test_exception_propagates_to_every_waiter():
+    flights = SingleFlight()
+    work = CountingWork(error=RuntimeError("upstream down"))
+
+    async def scenario():
+        return await asyncio.gather(*(flights.run("image", work) for _ in range(3)), return_exceptions=True)
+
+    errors = asyncio.run(scenario())
+
+    assert work.calls == 1
+    assert all(isinstance(error, RuntimeError) and str(error) == "upstream down" for error in errors)
+    assert flights.get_stats()["in_flight"] == 0
+
+
+def test_finished_call_is_not_reused():
+    flights = SingleFlight()
+    work = CountingWork(delay=0)
+
+    async def scenario():
+        await flights.run("image", work)
+        return await flights.run("image", work)
+
+    assert asyncio.run(scenario()) == ({"plant_name": "Pothos"}, False)
+    assert work.calls == 2
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    flights = SingleFlight()
+    work = CountingWork(delay=0.1)
+
+    async def scenario():
+        leader = asyncio.ensure_future(flights.run("image", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.run("image", work))
+        await asyncio.sleep(0.02)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == ({"plant_name": "Pothos"}, True)
+    assert work.calls == 1
@@ -0,0 +1,124 @@
+"""
+Diagnosis Tracing Tests
+=======================
+
+tracing.Trace, trace_stage, JsonlSpanExporter and the timings block:
+1. Spans are recorded only inside a trace, follow work onto executor threads,
+   and are summed per stage into "<stage>_ms" timings plus total_ms
+2. Nested diagnoses join the active trace instead of starting their own
+3. ?timings=true adds the block to the result and bypasses the cache
+4. Exported spans are written by the background writer thread, never on the
+   event loop, and closing the registry writes any spans still queued
+"""
+
+import asyncio
+import base64
+import builtins
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import main
+import tracing
+from config import PipelineConfig
+from conftest import jpeg_bytes
+from registry import ComponentRegistry
+from tracing import JsonlSpanExporter, current_trace, in_current_context, start_trace, trace_stage
+
+
+@pytest.fixture
+def registry_with_stubs(stub_upstreams):
+    registry = ComponentRegistry(PipelineConfig.from_env())
+    stub_upstreams(registry)
+    yield registry
+    registry.close()
+
+
+def record_stage(name: str) -> None:
+    with trace_stage(name):
+        pass
+
+
+def test_stages_are_recorded_only_inside_a_trace():
+    with trace_stage("kb_search"):
+        assert current_trace() is None
+
+    with start_trace() as trace:
+        with trace_stage("kb_search"):
+            pass
+        with trace_stage("kb_search"):
+            pass
+        with ThreadPoolExecutor(1, thread_name_prefix="stage") as executor:
+            executor.submit(in_current_context(record_stage, "groq_call")).result()
+
+    assert current_trace() is None
+    assert [span["name"] for span in trace.spans] == ["kb_search", "kb_search", "groq_call"]
+    assert trace.spans[-1]["thread"].startswith("stage")
+    timings = trace.get_timings()
+    assert set(timings) == {"kb_search_ms", "groq_call_ms", "total_ms"}
+    assert timings["kb_search_ms"] == round(sum(span["duration_ms"] for span in trace.spans[:2]), 3)
+    assert timings["total_ms"] >= timings["groq_call_ms"]
+
+
+def test_nested_trace_joins_the_active_one(tmp_path):
+    exporter = JsonlSpanExporter(str(tmp_path / "traces.jsonl"))
+
+    with start_trace(exporter) as outer:
+        with start_trace(exporter) as inner:
+            record_stage("json_parse")
+    exporter.close()
+
+    assert inner is outer
+    lines = (tmp_path / "traces.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["trace_id"] for line in lines] == [outer.trace_id]
+
+
+def test_timings_block(registry_with_stubs):
+    image = base64.b64encode(jpeg_bytes()).decode("utf-8")
+
+    assert "timings" not in main.safe_diagnose(image, registry_with_stubs)
+    for result in (main.safe_diagnose(image, registry_with_stubs, timings=True),
+                   asyncio.run(main.safe_diagnose_async(image, registry_with_stubs, timings=True))):
+        timings = result["timings"]
+        assert {"image_decode_ms", "image_encode_ms", "kb_search_ms", "confidence_aggregation_ms"} <= set(timings)
+        assert all(value >= 0 for value in timings.values())
+        assert timings["total_ms"] >= timings["image_decode_ms"]
+
+
+def test_api_timings_bypass_the_cache(api, stub_upstreams):
+    stubs = stub_upstreams(api.app.state.registry)
+    image = {"file": ("leaf.jpg", jpeg_bytes(), "image/jpeg")}
+
+    assert "timings" not in api.post("/diagnose", files=image).json()
+    response = api.post("/diagnose?timings=true", files=image)
+
+    assert response.headers["X-Cache"] == "BYPASS"
+    assert "total_ms" in response.json()["timings"]
+    assert stubs.calls == 2
+
+
+def test_async_diagnosis_exports_spans_off_the_event_loop(monkeypatch, tmp_path, stub_upstreams):
+    trace_file = tmp_path / "traces.jsonl"
+    monkeypatch.setenv("DIAGNOSIS_TRACE_FILE", str(trace_file))
+    registry = ComponentRegistry(PipelineConfig.from_env())
+    stub_upstreams(registry)
+    writers = []
+
+    def recording_open(*args, **kwargs):
+        writers.append(threading.current_thread().name)
+        return builtins.open(*args, **kwargs)
+
+    monkeypatch.setattr(tracing, "open", recording_open, raising=False)
+    image = base64.b64encode(jpeg_bytes()).decode("utf-8")
+    try:
+        asyncio.run(main.safe_diagnose_async(image, registry))
+        asyncio.run(main.safe_diagnose_async(image, registry))
+    finally:
+        registry.close()
+
+    spans = [json.loads(line) for line in trace_file.read_text(encoding="utf-8").splitlines()]
+    assert len({span["trace_id"] for span in spans}) == 2
+    assert {"kb_search", "confidence_aggregation"} <= {span["name"] for span in spans}
+    assert writers and set(writers) == {"span-exporter"}
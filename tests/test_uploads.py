@@ -0,0 +1,105 @@
+"""
+Upload Ingestion Tests
+======================
+
+uploads.read_image_upload and the API's handling of rejected uploads:
+1. Known image signatures are accepted and read completely
+2. Oversized uploads are refused with 413, by declared size or while streaming
+3. Empty and non-image uploads are refused with 400
+"""
+
+import asyncio
+import io
+
+import pytest
+from PIL import Image
+
+from uploads import UploadRejected, read_image_upload, sniff_image_type
+
+
+def image_bytes(image_format: str = "JPEG", size=(32, 32)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (0, 128, 0)).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+class FakeUpload:
+    """Chunked reader standing in for an UploadFile."""
+
+    def __init__(self, data: bytes, size=None):
+        self.stream = io.BytesIO(data)
+        self.size = size
+        self.filename = "leaf.jpg"
+        self.bytes_read = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        chunk = self.stream.read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def read(upload: FakeUpload, max_bytes: int, chunk_size: int = 1024) -> bytes:
+    return asyncio.run(read_image_upload(upload, max_bytes, chunk_size))
+
+
+@pytest.mark.parametrize("image_format, expected", [
+    ("JPEG", "jpeg"), ("PNG", "png"), ("GIF", "gif"), ("WEBP", "webp"), ("BMP", "bmp"), ("TIFF", "tiff")
+])
+def test_sniff_image_type(image_format, expected):
+    assert sniff_image_type(image_bytes(image_format)[:16]) == expected
+
+
+def test_sniff_heif_and_non_images():
+    assert sniff_image_type(b"\x00\x00\x00\x18ftypheic\x00\x00\x00\x00") == "heif"
+    assert sniff_image_type(b"\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00") is None
+    assert sniff_image_type(b"%PDF-1.7\n") is None
+
+
+def test_reads_whole_image_in_chunks():
+    data = image_bytes("BMP", size=(64, 64))
+    assert len(data) > 3 * 1024
+    assert read(FakeUpload(data), max_bytes=len(data)) == data
+
+
+def test_declared_size_over_cap_is_rejected_before_reading():
+    upload = FakeUpload(image_bytes(), size=5000)
+    with pytest.raises(UploadRejected) as rejected:
+        read(upload, max_bytes=4999)
+    assert rejected.value.status_code == 413
+    assert upload.bytes_read == 0
+
+
+def test_streamed_size_over_cap_is_rejected_early():
+    data = image_bytes() + b"\0" * 100_000
+    upload = FakeUpload(data)
+    with pytest.raises(UploadRejected) as rejected:
+        read(upload, max_bytes=4096)
+    assert rejected.value.status_code == 413
+    # Reading stops at the first chunk past the cap
+    assert upload.bytes_read <= 4096 + 1024
+
+
+@pytest.mark.parametrize("data", [b"", b"not an image at all"])
+def test_empty_and_non_image_uploads_are_rejected(data):
+    with pytest.raises(UploadRejected) as rejected:
+        read(FakeUpload(data), max_bytes=4096)
+    assert rejected.value.status_code == 400
+
+
+@pytest.fixture
+def small_upload_cap(monkeypatch):
+    monkeypatch.setenv("MAX_UPLOAD_BYTES", "4096")
+
+
+@pytest.mark.parametrize("endpoint", ["/diagnose", "/plant-diagnosis"])
+def test_api_rejects_oversized_upload_with_413(small_upload_cap, api, endpoint):
+    data = image_bytes() + b"\0" * 10_000
+    response = api.post(endpoint, files={"file": ("leaf.jpg", data, "image/jpeg")})
+    assert response.status_code == 413
+
+
+@pytest.mark.parametrize("endpoint", ["/diagnose", "/plant-diagnosis"])
+def test_api_rejects_non_image_with_400(api, endpoint):
+    # The declared content type is not trusted
+    response = api.post(endpoint, files={"file": ("leaf.jpg", b"<html></html>", "image/jpeg")})
+    assert response.status_code == 400
@@ -0,0 +1,242 @@
+"""
+Per-Request Diagnosis Tracing
+=============================
+
+This module records how long each stage of a single diagnosis took:
+1. A Trace collects spans for one diagnosis (propagated with a context variable,
+   including into executor threads started with in_current_context)
+2. trace_stage() times a stage when a trace is active and is free otherwise
+3. Trace.get_timings() summarizes spans into the optional "timings" result block
+4. JsonlSpanExporter appends every span to a local JSON Lines file from a
+   background writer thread
+
+Stage names used by the pipeline: image_decode, image_encode, base64_encode,
+roboflow_call, prediction_extraction, groq_queue, groq_call, json_parse,
+kb_search, confidence_aggregation.
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar(
+    "diagnosis_trace", default=None
+)
+
+
+class Trace:
+    """
+    Spans recorded for one diagnosis.
+
+    Stages may run concurrently on several threads, so spans are appended
+    under a lock. Durations use the monotonic clock.
+
+    Attributes:
+        trace_id (str): Unique identifier shared by all spans of the diagnosis
+        start_time (float): Wall-clock start (epoch seconds)
+        spans (List[Dict[str, Any]]): Recorded spans (name, offset_ms, duration_ms, thread)
+    """
+
+    def __init__(self):
+        """Start an empty trace."""
+        self.trace_id = uuid.uuid4().hex
+        self.start_time = time.time()
+        self.spans: List[Dict[str, Any]] = []
+        self._start = time.perf_counter()
+        self._end: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, start: float, duration: float) -> None:
+        """
+        Record a finished stage.
+
+        Args:
+            name (str): Stage name
+            start (float): time.perf_counter() value when the stage started
+            duration (float): Stage duration in seconds
+        """
+        span = {
+            "name": name,
+            "offset_ms": round((start - self._start) * 1000, 3),
+            "duration_ms": round(duration * 1000, 3),
+            "thread": threading.current_thread().name
+        }
+        with self._lock:
+            self.spans.append(span)
+
+    def finish(self) -> None:
+        """Mark the end of the diagnosis."""
+        if self._end is None:
+            self._end = time.perf_counter()
+
+    def get_timings(self) -> Dict[str, float]:
+        """
+        Summarize spans into per-stage durations.
+
+        Stages that ran more than once are summed. Roboflow and Groq run
+        concurrently, so stage durations can add up to more than total_ms.
+
+        Returns:
+            Dict[str, float]: "<stage>_ms" durations plus "total_ms"
+        """
+        timings: Dict[str, float] = {}
+        with self._lock:
+            for span in self.spans:
+                key = f"{span['name']}_ms"
+                timings[key] = round(timings.get(key, 0.0) + span["duration_ms"], 3)
+        end = self._end if self._end is not None else time.perf_counter()
+        timings["total_ms"] = round((end - self._start) * 1000, 3)
+        return timings
+
+
+class JsonlSpanExporter:
+    """
+    Append spans to a local JSON Lines file, one line per span.
+
+    All spans of a trace are written with a single write call by a background
+    writer thread, so exporting at the end of an async diagnosis never blocks
+    the event loop on file I/O.
+
+    Example:
+        >>> exporter = JsonlSpanExporter("traces.jsonl")
+        >>> with start_trace(exporter):
+        ...     safe_diagnose(base64_image)
+        >>> exporter.close()  # writes any spans still queued
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the exporter.
+
+        Args:
+            path (str): File the spans are appended to (created if missing)
+        """
+        self.path = path
+        self._queue: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace) -> None:
+        """
+        Queue a finished trace's spans for writing.
+
+        Args:
+            trace (Trace): Finished trace
+        """
+        lines = "".join(
+            json.dumps({"trace_id": trace.trace_id, "trace_start": trace.start_time, **span}) + "\n"
+            for span in trace.spans
+        )
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_queued, name="span-exporter", daemon=True)
+                self._writer.start()
+            self._queue.put(lines)
+
+    def close(self) -> None:
+        """Write the spans still queued and stop the writer thread."""
+        with self._lock:
+            writer, self._writer = self._writer, None
+            if writer is None:
+                return
+            self._queue.put(None)
+        writer.join()
+
+    def _write_queued(self) -> None:
+        """Writer thread: append queued traces until close() queues None."""
+        while True:
+            lines = self._queue.get()
+            if lines is None:
+                return
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+            except OSError as e:
+                logger.warning(f"Failed to export diagnosis spans to {self.path}: {str(e)}")
+
+
+def current_trace() -> Optional[Trace]:
+    """
+    Get the trace of the diagnosis running in this context.
+
+    Returns:
+        Optional[Trace]: The active trace, or None if tracing is off
+    """
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(exporter: Optional[JsonlSpanExporter] = None) -> Iterator[Trace]:
+    """
+    Trace a diagnosis, or join the trace already active in this context.
+
+    Args:
+        exporter (Optional[JsonlSpanExporter]): Receives the spans when a new
+                                                trace finishes
+
+    Yields:
+        Trace: The active trace
+    """
+    existing = _current_trace.get()
+    if existing is not None:
+        yield existing
+        return
+
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # An abandoned async generator finalized from another context
+            pass
+        trace.finish()
+        if exporter is not None:
+            exporter.export(trace)
+
+
+@contextmanager
+def trace_stage(name: str) -> Iterator[None]:
+    """
+    Record a span for a stage if a trace is active.
+
+    Args:
+        name (str): Stage name
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(name, start, time.perf_counter() - start)
+
+
+def in_current_context(func: Callable, *args: Any) -> Callable[[], Any]:
+    """
+    Bind a call to a copy of the current context for running on another thread.
+
+    Executor threads do not inherit context variables, so stages submitted to
+    an executor would otherwise record no spans.
+
+    Args:
+        func (Callable): Function to call
+        *args (Any): Positional arguments
+
+    Returns:
+        Callable[[], Any]: Zero-argument callable for executor.submit/run_in_executor
+    """
+    return functools.partial(contextvars.copy_context().run, func, *args)
@@ -7,7 +7,6 @@ This script demonstrates how to send base64 image data directly to the detector.
 
 import json
 import sys,os
-import base64
 from pathlib import Path
 
 # Add the Leaf Disease directory to Python path
@@ -20,15 +19,17 @@ except ImportError as e:
     sys.exit(1)
 
 
-def test_with_base64_data(base64_image_string: str):
+def test_with_base64_data(base64_image_string: str, detector: LeafDiseaseDetector = None):
     """
     Test disease detection with base64 image data
 
     Args:
         base64_image_string (str): Base64 encoded image data
+        detector (LeafDiseaseDetector, optional): Shared detector instance.
+            A new detector is created if None.
     """
     try:
-        detector = LeafDiseaseDetector()
+        detector = detector or LeafDiseaseDetector()
         result = detector.analyze_leaf_image_base64(base64_image_string)
         print(json.dumps(result, indent=2))
         return result
@@ -37,21 +38,24 @@ def test_with_base64_data(base64_image_string: str):
         return None
 
 
-def convert_image_to_base64_and_test(image_bytes: bytes):
+def convert_image_to_base64_and_test(image_bytes: bytes, detector: LeafDiseaseDetector = None):
     """
-    Convert image bytes to base64 and test it
+    Test disease detection with raw image bytes, base64 encoded once by the detector
 
     Args:
         image_bytes (bytes): Image data in bytes
+        detector (LeafDiseaseDetector, optional): Shared detector instance.
+            A new detector is created if None.
     """
     try:
         if not image_bytes:
             print('{"error": "No image bytes provided"}')
             return None
 
-        base64_string = base64.b64encode(image_bytes).decode('utf-8')
-        print(f"Converted image to base64 ({len(base64_string)} characters)")
-        return test_with_base64_data(base64_string)
+        detector = detector or LeafDiseaseDetector()
+        result = detector.analyze_leaf_image_bytes(image_bytes)
+        print(json.dumps(result, indent=2))
+        return result
     except Exception as e:
         print(f'{{"error": "{str(e)}"}}')
         return None